@@ -0,0 +1,241 @@
+"""
+Admission control for tool calls in the HTTP transports.
+
+FastMCP runs synchronous tools directly on the event loop, so under streamable HTTP one
+slow call (a log stream, a chaos object write against a struggling API server) blocks every
+other session. install() replaces each registered tool function with an async wrapper
+that runs the call in a worker thread behind a per-class gate (async tools such as
+sweep_fault run on their own event loop in that thread, so they are gated the same way):
+
+- at most `max_in_flight` calls of a class run at once;
+- up to `queue_size` more wait for a slot, further calls are rejected at once;
+- a call that has not finished `timeout` seconds after it arrived (queueing included)
+  returns a timeout error. The worker thread cannot be interrupted, so it keeps its
+  slot until it really finishes; the gate never runs more than max_in_flight calls.
+
+Rejections and timeouts are returned as {"error", "suggestion"} dicts for tools that
+can return a dict, and raised as tool errors (isError) for the others.
+
+Limits come from install() arguments, which default to the environment:
+
+    CHAOSMESH_MCP_MAX_IN_FLIGHT="inject=4,logs=8,read=16,load=1"   # or one number for all
+    CHAOSMESH_MCP_QUEUE_SIZE="32"
+    CHAOSMESH_MCP_CALL_TIMEOUT="inject=180,read=60"
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp.server.fastmcp.exceptions import ToolError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASS = "read"
+DEFAULT_MAX_IN_FLIGHT = {"inject": 4, "logs": 8, "read": 16, "load": 1}
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_TIMEOUT_SECONDS = 120.0
+
+_gates = {}
+_executor = None
+
+
+def parse_limits(value, default: dict, cast=int) -> dict:
+    """
+    Parse "inject=4,read=16" (per class) or "8" (every class) on top of `default`.
+    None or "" keeps the default.
+    """
+    limits = dict(default)
+    if value is None or value == "":
+        return limits
+    if isinstance(value, (int, float)):
+        return {name: cast(value) for name in limits}
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            name, number = part.split("=", 1)
+            limits[name.strip()] = cast(number)
+        else:
+            limits = {name: cast(part) for name in limits}
+    return limits
+
+
+class Busy(Exception):
+    """The class queue is full; the call was not started."""
+
+
+class CallTimeout(Exception):
+    """The call did not finish within the class timeout."""
+
+
+class Gate:
+    """Concurrency limit, bounded wait queue and timeout for one tool class."""
+
+    def __init__(self, name: str, max_in_flight: int, queue_size: int, timeout: float):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_ms_total = 0.0
+        self._semaphore = None
+
+    async def run(self, func, kwargs: dict):
+        if self.in_flight >= self.max_in_flight and self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise Busy(f"{self.in_flight} '{self.name}' calls running and {self.waiting} queued")
+
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        arrived = loop.time()
+        deadline = arrived + self.timeout if self.timeout else None
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(),
+                                   None if deadline is None else max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise CallTimeout(f"waited {self.timeout:g}s for a free '{self.name}' slot")
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        self.in_flight += 1
+        self.wait_ms_total += (loop.time() - arrived) * 1000.0
+
+        def release(future):
+            # 在事件循环线程中执行：工作线程真正结束时才归还名额
+            self.in_flight -= 1
+            self._semaphore.release()
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+        future = loop.run_in_executor(_executor, contextvars.copy_context().run, functools.partial(func, **kwargs))
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future),
+                                          None if deadline is None else max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise CallTimeout(f"did not finish within {self.timeout:g}s")
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "queue_size": self.queue_size,
+            "timeout_s": self.timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.wait_ms_total / self.admitted, 3) if self.admitted else 0.0,
+        }
+
+
+def _returns_dict(func) -> bool:
+    annotation = inspect.signature(func).return_annotation
+    return annotation is dict or dict in typing.get_args(annotation)
+
+
+def _in_own_loop(func):
+    """A sync function running the async tool `func` to completion on a new event loop."""
+    @functools.wraps(func)
+    def run(**kwargs):
+        return asyncio.run(func(**kwargs))
+
+    return run
+
+
+def _wrap(tool_name: str, func, gate: Gate):
+    returns_dict = _returns_dict(func)
+
+    def refuse(message: str, suggestion: str):
+        if returns_dict:
+            return {"error": message, "suggestion": suggestion}
+        raise ToolError(f"{message}. {suggestion}")
+
+    @functools.wraps(func)
+    async def wrapper(**kwargs):
+        try:
+            return await gate.run(func, kwargs)
+        except Busy as e:
+            logger.warning(f"Rejected {tool_name}: {e}")
+            return refuse(f"Server busy: {e}", "Retry in a few seconds or lower the request rate")
+        except CallTimeout as e:
+            logger.warning(f"{tool_name} timed out: {e}")
+            return refuse(f"{tool_name} {e}",
+                          "The Kubernetes API server may be slow; check the result (e.g. list experiments) "
+                          "before retrying an injection")
+
+    wrapper.admission_gate = gate
+    return wrapper
+
+
+def install(mcp, classes: dict, max_in_flight=None, queue_size=None, timeout=None) -> dict:
+    """
+    Put every tool registered on `mcp` behind its class gate.
+
+    Args:
+        mcp: The FastMCP server.
+        classes (dict): Tool name -> class name. Unlisted tools belong to DEFAULT_CLASS.
+        max_in_flight: "class=N,..." string, a number for every class, or None for the environment.
+        queue_size: Same format; calls allowed to wait per class.
+        timeout: Same format; seconds per call including queueing (0 disables).
+
+    Returns:
+        dict: The gates by class name.
+    """
+    global _executor
+    limits = parse_limits(max_in_flight if max_in_flight is not None
+                          else os.environ.get("CHAOSMESH_MCP_MAX_IN_FLIGHT"), DEFAULT_MAX_IN_FLIGHT)
+    names = set(limits) | set(classes.values()) | {DEFAULT_CLASS}
+    queues = parse_limits(queue_size if queue_size is not None else os.environ.get("CHAOSMESH_MCP_QUEUE_SIZE"),
+                          {name: DEFAULT_QUEUE_SIZE for name in names})
+    timeouts = parse_limits(timeout if timeout is not None else os.environ.get("CHAOSMESH_MCP_CALL_TIMEOUT"),
+                            {name: DEFAULT_TIMEOUT_SECONDS for name in names}, cast=float)
+
+    for name in sorted(names):
+        if name not in _gates:
+            _gates[name] = Gate(name, limits.get(name, limits[DEFAULT_CLASS]),
+                                queues.get(name, DEFAULT_QUEUE_SIZE), timeouts.get(name, DEFAULT_TIMEOUT_SECONDS))
+    # 名额之和就是最多同时运行的工具调用数，线程池不需要再排队
+    _executor = ThreadPoolExecutor(max_workers=sum(g.max_in_flight for g in _gates.values()),
+                                   thread_name_prefix="tool")
+
+    for tool in mcp._tool_manager.list_tools():
+        if hasattr(tool.fn, "admission_gate"):
+            continue  # 已经安装过
+        gate = _gates[classes.get(tool.name, DEFAULT_CLASS)]
+        func = _in_own_loop(tool.fn) if tool.is_async else tool.fn
+        tool.fn = _wrap(tool.name, func, gate)
+        tool.is_async = True
+    logger.info("Admission control: " + ", ".join(
+        f"{g.name} max_in_flight={g.max_in_flight} queue={g.queue_size} timeout={g.timeout:g}s"
+        for g in _gates.values()))
+    return dict(_gates)
+
+
+def installed() -> bool:
+    return bool(_gates)
+
+
+def stats() -> dict:
+    return {name: gate.stats() for name, gate in sorted(_gates.items())}
@@ -0,0 +1,637 @@
+"""
+Offline benchmark suite for the MCP tools in server.py.
+
+Starts fake_apiserver.FakeApiServer on a local port, points KUBECONFIG at it, imports
+server and calls every registered tool, reporting throughput and p50/p99 latency per
+tool. Results are compared with a stored baseline and the run fails (exit code 1)
+when a tool regresses past the allowed tolerance.
+
+Usage:
+    python benchmark.py                                   # compare with bench_baseline.json
+    python benchmark.py --update-baseline                 # record a new baseline
+    python benchmark.py --latency-ms 5 --services 200     # different cluster shape
+    python benchmark.py --tools pod_kill,get_logs -n 50   # subset of tools
+    python benchmark.py --record prod.jsonl.gz --service cartservice --namespace shop
+                                                          # read-only tools against the KUBECONFIG cluster, recorded
+    python benchmark.py --replay prod.jsonl.gz --read-only --service cartservice --namespace shop
+                                                          # against recorded traffic (see recorder.py)
+    python benchmark.py --pod-listing --services 500 --pods 4
+                                                          # V1Pod models vs pod_records listing
+    python benchmark.py --http-clients 64 --latency-ms 20 --http-max-in-flight read=8 --http-queue-size 16
+                                                          # many MCP clients against the HTTP server
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fake_apiserver import FakeApiServer
+
+logger = logging.getLogger("benchmark")
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+DEFAULT_SERVICE = "svc-0"
+DEFAULT_NAMESPACE = "default"
+
+
+@dataclass
+class Case:
+    """
+    How to call one tool. `kwargs` builds the arguments for iteration i; `setup` and
+    `teardown` run outside the timed section for every iteration; an AssertionError from
+    `teardown` counts the iteration as an error. `tool` is the tool to call when the case
+    is keyed by another name (a second case for the same tool). `read_only` cases neither
+    inject faults nor write objects, so they may run against a real cluster.
+    """
+    kwargs: Callable[[int], dict] = lambda i: {}
+    setup: Optional[Callable[[dict], None]] = None
+    teardown: Optional[Callable[[dict], None]] = None
+    read_only: bool = False
+    tool: Optional[str] = None
+
+
+@dataclass
+class Result:
+    tool: str
+    status: str = "ok"
+    calls: int = 0
+    errors: int = 0
+    latencies_ms: list = field(default_factory=list)
+    wall_s: float = 0.0
+    note: str = ""
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        index = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+        return round(ordered[index], 3)
+
+    @property
+    def throughput(self) -> float:
+        return round(self.calls / self.wall_s, 2) if self.wall_s else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "status": self.status,
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "throughput_per_s": self.throughput,
+            **({"note": self.note} if self.note else {}),
+        }
+
+
+def build_cases(server, service: str = DEFAULT_SERVICE, namespace: str = DEFAULT_NAMESPACE) -> dict:
+    """Benchmark cases keyed by tool name. `server` is the imported server module."""
+    fault_inject = server.fault_inject
+    kube = server.kube
+
+    def pod_args(i):
+        return {"service": service, "duration": "30s", "mode": "one", "value": "", "namespace": namespace}
+
+    def crd_args(i):
+        return {"service": service, "duration": "30s", "namespace": namespace}
+
+    def host_args(i):
+        return {"address": ["10.0.0.1:31767", "10.0.0.2:31767"], "duration": "30s"}
+
+    def create_pod_kill(kwargs):
+        r = fault_inject.pod_fault(service=service, type="POD_KILL", namespace=namespace,
+                                   duration="30s", mode="one", value="")
+        kwargs["name"] = r["metadata"]["name"]
+
+    def create_journaled_pod_kill(kwargs):
+        create_pod_kill(kwargs)
+        kwargs["experiment"] = kwargs.pop("name")
+
+    def delay_args(i):
+        return {"service": f"bench-delay-{i}", "delay": 1, "namespace": namespace}
+
+    def remove_delay(kwargs):
+        kube.remove_delay_fault(kwargs["service"], kwargs["namespace"])
+
+    def inject_delay(kwargs):
+        kube.inject_delay_fault(service_name=kwargs["service"], delay_seconds=1, namespace=kwargs["namespace"])
+
+    # 应用自己的 VirtualService：注入走 JSON patch，撤销后 spec 和 metadata 必须与注入前逐字节一致
+    originals = {}
+
+    def patch_args(i):
+        kwargs = {"service": f"bench-patch-{i}", "delay": 1, "namespace": namespace, "percentage": 50,
+                  "abort_code": 503, "abort_percentage": 5, "headers": {"x-chaos": "on"}}
+        if i % 2:
+            # 奇数次由到期回收撤销（teardown 把到期时间改到过去再触发）
+            kwargs["duration"] = "1h"
+        return kwargs
+
+    def seed_virtual_service(kwargs):
+        service_name = kwargs["service"]
+        metadata = {"name": f"{service_name}-routes", "namespace": kwargs["namespace"]}
+        if not service_name.endswith(("1", "3", "5", "7", "9")):
+            # 一半带有应用自己的标签和注解，另一半没有（撤销时整个字段删除）
+            metadata["labels"] = {"app": service_name}
+            metadata["annotations"] = {"owner": "bench"}
+        body = {"apiVersion": f"{kube.ISTIO_GROUP}/{kube.ISTIO_VERSION}", "kind": "VirtualService",
+                "metadata": metadata,
+                "spec": {"hosts": [service_name], "http": [
+                    {"name": "canary", "match": [{"headers": {"x-canary": {"exact": "1"}}}],
+                     "route": [{"destination": {"host": service_name, "subset": "v2"}}]},
+                    {"name": "default", "route": [{"destination": {"host": service_name, "subset": "v1"}}],
+                     "timeout": "2s"},
+                ]}}
+        created = kube.cluster_pool.custom_objects(kube.api).create_namespaced_custom_object(
+            kube.ISTIO_GROUP, kube.ISTIO_VERSION, kwargs["namespace"], kube.ISTIO_PLURAL, body)
+        originals[service_name] = created
+
+    def revert_and_compare(kwargs):
+        original = originals.pop(kwargs["service"])
+        name = original["metadata"]["name"]
+        injected = kube._get_virtual_service(kwargs["namespace"], name)
+        assert len(injected["spec"]["http"]) == 2 * len(original["spec"]["http"]), f"{name}: fault routes not patched in"
+        if kwargs.get("duration"):
+            expired = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 60))
+            kube.cluster_pool.custom_objects(kube.api).patch_namespaced_custom_object(
+                kube.ISTIO_GROUP, kube.ISTIO_VERSION, kwargs["namespace"], kube.ISTIO_PLURAL, name,
+                {"metadata": {"annotations": {kube.ISTIO_EXPIRES_ANNOTATION: expired}}})
+            kube._expire_delay_fault((kwargs["namespace"], name), time.time())
+        else:
+            kube.remove_delay_fault(kwargs["service"], kwargs["namespace"])
+        reverted = kube._get_virtual_service(kwargs["namespace"], name)
+        kube._delete_virtual_service(kwargs["namespace"], name)
+        volatile = ("resourceVersion", "generation")
+        for field in ("spec", "metadata"):
+            before = {k: v for k, v in original[field].items() if k not in volatile}
+            after = {k: v for k, v in reverted[field].items() if k not in volatile}
+            assert json.dumps(before, sort_keys=True) == json.dumps(after, sort_keys=True), \
+                f"{name}: {field} differs after revert"
+
+    return {
+        "health_check": Case(read_only=True),
+        "get_slow_traces": Case(kwargs=lambda i: {"limit": 10}, read_only=True),
+        "list_clusters": Case(read_only=True),
+        "blast_radius": Case(kwargs=lambda i: {"service": service, "namespace": namespace}, read_only=True),
+        "find_services": Case(kwargs=lambda i: {"query": service[:3]}, read_only=True),
+        "experiment_history": Case(kwargs=lambda i: {"since": "168h"}, setup=lambda kwargs: create_pod_kill({})),
+        "attach_load_test": Case(kwargs=lambda i: {"namespace": namespace, "p99_ms": 120.0, "baseline_p99_ms": 100.0},
+                                 setup=create_journaled_pod_kill),
+        "preview_targets": Case(kwargs=lambda i: {"service": service, "namespace": namespace,
+                                                  "mode": "fixed-percent", "value": "50"}, read_only=True),
+        "find_hosts": Case(kwargs=lambda i: {"zone": "us-east-2a"}, read_only=True),
+        "pod_kill": Case(kwargs=pod_args),
+        "container_kill": Case(kwargs=lambda i: {**pod_args(i), "container_names": ["server"]}),
+        "pod_failure": Case(kwargs=pod_args),
+        "pod_cpu_stress": Case(kwargs=lambda i: {**pod_args(i), "container_names": ["server"],
+                                                 "workers": 1, "load": 50}),
+        "pod_memory_stress": Case(kwargs=lambda i: {**pod_args(i), "container_names": ["server"],
+                                                    "size": "256MB"}),
+        "host_cpu_stress": Case(kwargs=lambda i: {**host_args(i), "workers": 1, "load": 50}),
+        "host_memory_stress": Case(kwargs=lambda i: {**host_args(i), "size": "256MB", "time": "10s"}),
+        "host_disk_fill": Case(kwargs=lambda i: {**host_args(i), "size": "1024K", "path": "/tmp",
+                                                 "payload_process_num": 1, "fill_by_fallocate": True}),
+        "host_read_payload": Case(kwargs=lambda i: {**host_args(i), "size": "1024K", "path": "/tmp",
+                                                    "payload_process_num": 1}),
+        "host_write_payload": Case(kwargs=lambda i: {**host_args(i), "size": "1024K", "path": "/tmp",
+                                                     "payload_process_num": 1}),
+        "network_bandwidth": Case(kwargs=lambda i: {"service": service, "mode": "all", "value": "",
+                                                    "direction": "to", "rate": "1mbps", "limit": 1024,
+                                                    "buffer": 1024, "external_targets": ["svc-1"],
+                                                    "namespace": namespace}),
+        "network_partition": Case(kwargs=lambda i: {"service": service, "mode": "all", "value": "",
+                                                    "direction": "both", "external_targets": ["svc-1"],
+                                                    "namespace": namespace}),
+        "get_logs": Case(kwargs=lambda i: {"service_name": service, "namespace": namespace,
+                                           "container_name": "server"}, read_only=True),
+        "search_logs": Case(kwargs=lambda i: {"service_name": service, "namespace": namespace,
+                                              "pattern": "connection refused", "context_lines": 1}, read_only=True),
+        "get_load_test_results": Case(read_only=True),
+        "delete_experiment": Case(kwargs=lambda i: {"type": "POD_KILL", "namespace": namespace},
+                                  setup=create_pod_kill),
+        "get_experiment": Case(kwargs=lambda i: {"namespace": namespace}, setup=create_pod_kill),
+        "list_experiments": Case(kwargs=lambda i: {"namespace": namespace}, read_only=True),
+        "load_generate": Case(kwargs=lambda i: {"rate": 10}),
+        "inject_delay_fault": Case(kwargs=delay_args, teardown=remove_delay),
+        "remove_delay_fault": Case(kwargs=lambda i: {"service": f"bench-delay-{i}", "namespace": namespace},
+                                   setup=inject_delay),
+        "inject_delay_fault_patch": Case(kwargs=patch_args, setup=seed_virtual_service, teardown=revert_and_compare,
+                                         tool="inject_delay_fault"),
+        "list_namespaces": Case(read_only=True),
+        "list_services_in_namespace": Case(kwargs=lambda i: {"namespace": namespace}, read_only=True),
+        # 只测基线一步（不注入故障）：扫描本身的开销加上 50ms 的探测
+        "sweep_fault": Case(kwargs=lambda i: {"fault": "network_delay", "service": service, "namespace": namespace,
+                                              "values": [0], "settle": 0, "hold": 0.05,
+                                              "probe_url": os.environ["LOAD_GENERATE_URL"] + "/version"}),
+        "network_delay": Case(kwargs=lambda i: {**crd_args(i), "latency": "100ms"}),
+        "network_loss": Case(kwargs=lambda i: {**crd_args(i), "loss": "10"}),
+        "network_corrupt": Case(kwargs=lambda i: {**crd_args(i), "corrupt": "10"}),
+        "network_duplicate": Case(kwargs=lambda i: {**crd_args(i), "duplicate": "10"}),
+        "dns_chaos": Case(kwargs=lambda i: {**crd_args(i), "patterns": ["example.com"]}),
+        "http_chaos": Case(kwargs=lambda i: {**crd_args(i), "port": 8080}),
+        "io_chaos": Case(kwargs=lambda i: {**crd_args(i), "volume_path": "/data"}),
+        "time_chaos": Case(kwargs=lambda i: {**crd_args(i), "time_offset": "-5m"}),
+        "kernel_chaos": Case(kwargs=crd_args),
+    }
+
+
+def call(fn: Callable, kwargs: dict):
+    """Call a tool; async tools (sweep_fault) run on their own event loop."""
+    r = fn(**kwargs)
+    return asyncio.run(r) if inspect.iscoroutine(r) else r
+
+
+def teardown(case: Case, kwargs: dict, result: Result) -> None:
+    """Run the case's teardown; a failed check counts as an error."""
+    try:
+        case.teardown(kwargs)
+    except AssertionError as e:
+        result.errors += 1
+        result.note = str(e)
+
+
+def run_case(name: str, fn: Callable, case: Case, iterations: int, concurrency: int) -> Result:
+    result = Result(tool=name)
+    # 预热一次，不计入统计
+    warmup = case.kwargs(-1)
+    if case.setup:
+        case.setup(warmup)
+    call(fn, warmup)
+    if case.teardown:
+        teardown(case, warmup, result)
+
+    calls = [case.kwargs(i) for i in range(iterations)]
+    if case.setup:
+        for kwargs in calls:
+            case.setup(kwargs)
+
+    def timed(kwargs):
+        start = time.perf_counter()
+        try:
+            r = call(fn, kwargs)
+            if isinstance(r, str) and r.startswith("{"):
+                # 带 verbosity 的工具返回紧凑 JSON 文本
+                r = json.loads(r)
+            failed = isinstance(r, dict) and "error" in r
+        except Exception as e:
+            logger.debug(f"{name} raised: {e}")
+            failed = True
+        return (time.perf_counter() - start) * 1000.0, failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, failed in executor.map(timed, calls):
+            result.latencies_ms.append(latency)
+            result.calls += 1
+            result.errors += int(failed)
+    result.wall_s = time.perf_counter() - start
+
+    if case.teardown:
+        for kwargs in calls:
+            teardown(case, kwargs, result)
+    if result.errors:
+        result.status = "error"
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float) -> list[str]:
+    """
+    Return human readable regressions of `results` against `baseline`. A tool that ran
+    but has no baseline entry is reported too, so a new tool cannot escape the gate.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("tools", {}).get(name)
+        if base is None and current["status"] == "ok":
+            regressions.append(f"{name}: no baseline entry (record one with --update-baseline)")
+            continue
+        if not base or current["status"] != "ok" or base.get("status") != "ok":
+            continue
+        p99_limit = base["p99_ms"] * tolerance + slack_ms
+        if current["p99_ms"] > p99_limit:
+            regressions.append(f"{name}: p99 {current['p99_ms']}ms > limit {p99_limit:.3f}ms "
+                               f"(baseline {base['p99_ms']}ms)")
+        throughput_limit = base["throughput_per_s"] / tolerance
+        if current["throughput_per_s"] < throughput_limit:
+            regressions.append(f"{name}: throughput {current['throughput_per_s']}/s < limit "
+                               f"{throughput_limit:.2f}/s (baseline {base['throughput_per_s']}/s)")
+    return regressions
+
+
+def run_pod_listing(args) -> int:
+    """
+    Compare listing one namespace's pods through V1Pod models (the old path) with
+    pod_records' raw JSON and metadata-only paths: latency and peak memory per call.
+    """
+    import tracemalloc
+    from kubernetes import client as k8s_client, config as k8s_config
+    import pod_records
+
+    fake = FakeApiServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, namespaces=1,
+                         services=args.services, pods_per_service=args.pods,
+                         annotation_bytes=args.annotation_bytes).start()
+    try:
+        cfg = k8s_client.Configuration()
+        k8s_config.load_kube_config(config_file=fake.write_kubeconfig(), client_configuration=cfg)
+        v1 = k8s_client.CoreV1Api(k8s_client.ApiClient(cfg))
+        variants = {
+            "V1Pod models": lambda: [(p.metadata.name, p.status.phase) for p in v1.list_namespaced_pod("default").items],
+            "raw JSON records": lambda: [(p.name, p.phase) for p in pod_records.list_pods("default", core_v1=v1)],
+            "metadata-only records": lambda: [p.name for p in
+                                              pod_records.list_pods("default", metadata_only=True, core_v1=v1)],
+        }
+        pods = len(variants["raw JSON records"]())
+        print(f"Listing {pods} pods, {args.iterations} calls per variant")
+        header = f"{'variant':24} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"
+        print(header)
+        print("-" * len(header))
+        for name, fn in variants.items():
+            result = Result(tool=name)
+            fn()
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                fn()
+                result.latencies_ms.append((time.perf_counter() - start) * 1000.0)
+            tracemalloc.start()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:24} {result.percentile(50):>10} {result.percentile(99):>10} {peak // 1024:>10}")
+    finally:
+        fake.stop()
+    return 0
+
+
+# --http-clients：每个客户端循环调用的工具及参数
+HTTP_MIX = {
+    "health_check": lambda service, namespace: {},
+    "find_services": lambda service, namespace: {"query": service[:3]},
+    "blast_radius": lambda service, namespace: {"service": service, "namespace": namespace},
+    "get_logs": lambda service, namespace: {"service_name": service, "namespace": namespace,
+                                            "container_name": "server"},
+    "search_logs": lambda service, namespace: {"service_name": service, "namespace": namespace,
+                                               "pattern": "connection refused"},
+    "pod_kill": lambda service, namespace: {"service": service, "duration": "30s", "mode": "one",
+                                            "value": "", "namespace": namespace},
+}
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_http_clients(args) -> int:
+    """
+    Start server.py with the streamable HTTP transport against the fake API server and
+    drive it with --http-clients concurrent MCP sessions, each calling the tools of
+    HTTP_MIX in turn. Reports latency and how many calls were rejected or timed out.
+    """
+    import asyncio
+    import subprocess
+    import urllib.request
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    fake = FakeApiServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, namespaces=args.namespaces,
+                         services=args.services, pods_per_service=args.pods, log_lines=args.log_lines).start()
+    port = _free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+               "--transport", "streamable-http", "--port", str(port), "--skip-env-check"]
+    for flag, value in (("--max-in-flight", args.http_max_in_flight), ("--queue-size", args.http_queue_size),
+                        ("--call-timeout", args.http_call_timeout)):
+        if value:
+            command += [flag, value]
+    env = dict(os.environ, KUBECONFIG=fake.write_kubeconfig(), LOAD_GENERATE_URL=fake.url)
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                               stderr=None if args.verbose else subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/mcp"
+    tools = args.tools.split(",") if args.tools else list(HTTP_MIX)
+    results = {name: Result(tool=name) for name in tools}
+    outcomes = {name: {"rejected": 0, "timed_out": 0} for name in tools}
+
+    async def client(index: int):
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for i in range(args.iterations):
+                    name = tools[(index + i) % len(tools)]
+                    start = time.perf_counter()
+                    try:
+                        response = await session.call_tool(name, HTTP_MIX[name](args.service, args.namespace))
+                        text = " ".join(getattr(c, "text", "") for c in response.content)
+                        payload = response.structuredContent
+                        if payload is None:
+                            try:
+                                payload = json.loads(text)
+                            except ValueError:
+                                payload = {}
+                        error = str(payload.get("error", "")) if isinstance(payload, dict) else ""
+                        failed = response.isError or bool(error)
+                        message = error or (text if response.isError else "")
+                    except Exception as e:
+                        failed, message = True, str(e)
+                    results[name].latencies_ms.append((time.perf_counter() - start) * 1000.0)
+                    results[name].calls += 1
+                    if "Server busy" in message:
+                        outcomes[name]["rejected"] += 1
+                    elif "did not finish within" in message or "for a free" in message:
+                        outcomes[name]["timed_out"] += 1
+                    elif failed:
+                        results[name].errors += 1
+
+    async def drive():
+        wall = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(args.http_clients)))
+        return time.perf_counter() - wall
+
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=0.5)
+            except urllib.error.HTTPError:
+                break
+            except OSError:
+                time.sleep(0.1)
+        wall = asyncio.run(drive())
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        fake.stop()
+
+    total = sum(r.calls for r in results.values())
+    print(f"{args.http_clients} clients x {args.iterations} calls, {total / wall:.1f} calls/s overall")
+    header = f"{'tool':16} {'calls':>6} {'errors':>6} {'rejected':>8} {'timeouts':>8} {'p50 ms':>10} {'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:16} {r.calls:>6} {r.errors:>6} {outcomes[name]['rejected']:>8} "
+              f"{outcomes[name]['timed_out']:>8} {r.percentile(50):>10} {r.percentile(99):>10}")
+    return 1 if any(r.errors for r in results.values()) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every MCP tool against a local fake API server.")
+    parser.add_argument("-n", "--iterations", type=int, default=50, help="Timed calls per tool.")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Concurrent callers per tool.")
+    parser.add_argument("--tools", type=str, help="Comma separated subset of tools to run.")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Latency added to every API request.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--namespaces", type=int, default=3)
+    parser.add_argument("--services", type=int, default=20, help="Services per namespace.")
+    parser.add_argument("--pods", type=int, default=3, help="Pods per service.")
+    parser.add_argument("--log-lines", type=int, default=200)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="Allowed ratio over the baseline p99 (and under its throughput).")
+    parser.add_argument("--slack-ms", type=float, default=5.0,
+                        help="Absolute p99 slack added on top of the ratio, to absorb timer noise.")
+    parser.add_argument("--output", type=str, help="Also write the results as JSON to this path.")
+    parser.add_argument("--strict", action="store_true", help="Fail when a registered tool has no benchmark case.")
+    parser.add_argument("--replay", type=str,
+                        help="Serve Kubernetes API calls from a recording instead of the fake server.")
+    parser.add_argument("--record", type=str,
+                        help="Run against the cluster of the current KUBECONFIG instead of the fake server and "
+                             "record its API traffic to this path. Implies --read-only.")
+    parser.add_argument("--read-only", action="store_true",
+                        help="Skip the cases that inject faults or write objects.")
+    parser.add_argument("--service", type=str, default=DEFAULT_SERVICE, help="Target service for the tool calls.")
+    parser.add_argument("--namespace", type=str, default=DEFAULT_NAMESPACE, help="Target namespace for the tool calls.")
+    parser.add_argument("--pod-listing", action="store_true",
+                        help="Only compare pod listing paths (V1Pod models vs pod_records) and exit.")
+    parser.add_argument("--annotation-bytes", type=int, default=0,
+                        help="Size of a filler annotation on every pod (--pod-listing only).")
+    parser.add_argument("--http-clients", type=int,
+                        help="Drive server.py over streamable HTTP with this many concurrent MCP clients and exit "
+                             "(-n calls per client, tools from HTTP_MIX or --tools).")
+    parser.add_argument("--http-max-in-flight", type=str, help="--max-in-flight for the HTTP server.")
+    parser.add_argument("--http-queue-size", type=str, help="--queue-size for the HTTP server.")
+    parser.add_argument("--http-call-timeout", type=str, help="--call-timeout for the HTTP server.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+    # 假集群上的实验写入临时日志库，不混入真实的实验历史
+    os.environ.setdefault("CHAOSMESH_MCP_JOURNAL", os.path.join(tempfile.mkdtemp(prefix="chaosmesh-bench-"),
+                                                                "journal.sqlite3"))
+    if args.pod_listing:
+        return run_pod_listing(args)
+    if args.http_clients:
+        if not args.verbose:
+            # httpx 每个请求一行 INFO 日志，mcp 客户端在会话关闭时也会报告断开
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            logging.getLogger("mcp").setLevel(logging.ERROR)
+        return run_http_clients(args)
+
+    config = {
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "namespaces": args.namespaces,
+        "services": args.services, "pods": args.pods, "log_lines": args.log_lines,
+        "iterations": args.iterations, "concurrency": args.concurrency,
+    }
+    if args.replay and args.record:
+        parser.error("--replay and --record are mutually exclusive")
+    if args.replay:
+        config["replay"] = os.path.basename(args.replay)
+    if args.record:
+        config["record"] = os.path.basename(args.record)
+    read_only = args.read_only or bool(args.record)
+    fake = FakeApiServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         namespaces=args.namespaces, services=args.services,
+                         pods_per_service=args.pods, log_lines=args.log_lines).start()
+    os.environ["LOAD_GENERATE_URL"] = fake.url
+    if args.replay:
+        os.environ["CHAOSMESH_MCP_REPLAY"] = args.replay
+        logger.info(f"Replaying Kubernetes API traffic from {args.replay}")
+    elif args.record:
+        # 真实集群：保留用户的 KUBECONFIG，只跑只读用例
+        os.environ["CHAOSMESH_MCP_RECORD"] = args.record
+        logger.info(f"Recording Kubernetes API traffic of the KUBECONFIG cluster to {args.record}")
+    else:
+        os.environ["KUBECONFIG"] = fake.write_kubeconfig()
+        logger.info(f"Fake API server on {fake.url}")
+
+    # 必须在 KUBECONFIG 指向假集群之后再导入，fault_inject/kube 在导入时初始化客户端
+    import server
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    tools = {tool.name: tool.fn for tool in server.mcp._tool_manager.list_tools()}
+    cases = build_cases(server, service=args.service, namespace=args.namespace)
+    selected = args.tools.split(",") if args.tools else list(tools) + [name for name, case in cases.items()
+                                                                        if case.tool]
+
+    missing = [name for name in tools if name not in cases]
+    results = {}
+    try:
+        for name in selected:
+            tool = cases[name].tool if name in cases and cases[name].tool else name
+            if tool not in tools:
+                logger.warning(f"Unknown tool: {name}")
+                continue
+            if name not in cases:
+                results[name] = Result(tool=name, status="missing", note="no benchmark case").summary()
+                continue
+            if read_only and not cases[name].read_only:
+                results[name] = Result(tool=name, status="skipped", note="writes to the cluster").summary()
+                continue
+            results[name] = run_case(name, tools[tool], cases[name], args.iterations, args.concurrency).summary()
+    finally:
+        logging.disable(logging.NOTSET)
+        fake.stop()
+
+    header = f"{'tool':32} {'status':8} {'calls':>6} {'errors':>6} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:32} {r['status']:8} {r['calls']:>6} {r['errors']:>6} {r['p50_ms']:>10} "
+              f"{r['p99_ms']:>10} {r['throughput_per_s']:>10}  {r.get('note', '')}")
+
+    report = {"config": config, "tools": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        logger.info(f"Baseline written to {args.baseline}")
+        return 0
+
+    failed = False
+    errored = [name for name, r in results.items() if r["status"] == "error"]
+    if errored:
+        logger.error(f"Tools returning errors: {', '.join(errored)}")
+        failed = True
+    if missing:
+        logger.warning(f"Tools without a benchmark case: {', '.join(missing)}")
+        failed = failed or args.strict
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            logger.warning("Benchmark configuration differs from the baseline; comparison may be meaningless")
+        regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+        for line in regressions:
+            logger.error(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    else:
+        logger.warning(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
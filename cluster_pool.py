@@ -0,0 +1,163 @@
+"""
+Kubernetes client pool keyed by kubeconfig context.
+
+One server process can talk to several clusters: each kubeconfig context gets one
+cached Configuration and ApiClient (so connections are reused), and the context of
+the current call is carried in a contextvar. While a context is active, every
+kubernetes client created without an explicit configuration — including the ones the
+chaosmesh client creates internally — is bound to that context.
+
+    with cluster_pool.use("prod-us-east-2"):
+        fault_inject.pod_fault(...)
+
+    cluster_pool.fan_out(fault_inject.pod_fault, ["prod-a", "prod-b"], service="cartservice", ...)
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from kubernetes import client as k8s_client, config as k8s_config
+
+logger = logging.getLogger(__name__)
+
+MAX_FAN_OUT_WORKERS = int(os.environ.get("CHAOSMESH_MCP_FAN_OUT_WORKERS", "8"))
+
+# 表示"所有 kubeconfig 上下文"的通配符
+ALL_CLUSTERS = "*"
+
+_active_context = contextvars.ContextVar("chaosmesh_mcp_cluster", default=None)
+_configurations = {}
+_api_clients = {}
+_lock = threading.Lock()
+
+
+def _kubeconfig_path():
+    return os.environ.get("KUBECONFIG") or None
+
+
+def list_contexts() -> tuple[list[str], str]:
+    """Return (context names, current context name) from the active kubeconfig."""
+    contexts, current = k8s_config.list_kube_config_contexts(config_file=_kubeconfig_path())
+    return [c["name"] for c in contexts], (current or {}).get("name")
+
+
+def configuration(context: str) -> k8s_client.Configuration:
+    """Return the cached client Configuration for a kubeconfig context, loading it on first use."""
+    with _lock:
+        cfg = _configurations.get(context)
+        if cfg is None:
+            cfg = k8s_client.Configuration()
+            k8s_config.load_kube_config(config_file=_kubeconfig_path(), context=context,
+                                        client_configuration=cfg, persist_config=False)
+            _configurations[context] = cfg
+            logger.info(f"Loaded Kubernetes configuration for context '{context}' ({cfg.host})")
+        return cfg
+
+
+def api_client(context: str) -> k8s_client.ApiClient:
+    """Return the pooled ApiClient for a kubeconfig context."""
+    cfg = configuration(context)
+    with _lock:
+        client = _api_clients.get(context)
+        if client is None:
+            client = k8s_client.ApiClient(configuration=cfg)
+            _api_clients[context] = client
+        return client
+
+
+def active() -> str:
+    """Name of the context the current call is bound to, or None for the default cluster."""
+    return _active_context.get()
+
+
+@contextmanager
+def use(context: str = None):
+    """Bind the current call (and kubernetes clients created inside it) to a kubeconfig context."""
+    if context:
+        configuration(context)
+    token = _active_context.set(context or None)
+    try:
+        yield
+    finally:
+        _active_context.reset(token)
+
+
+def core_v1(default=None) -> k8s_client.CoreV1Api:
+    """CoreV1Api for the active context, or `default` (the module's client) when none is active."""
+    context = active()
+    if context is None:
+        return default if default is not None else k8s_client.CoreV1Api()
+    return k8s_client.CoreV1Api(api_client(context))
+
+
+def custom_objects(default=None) -> k8s_client.CustomObjectsApi:
+    """CustomObjectsApi for the active context, or `default` when none is active."""
+    context = active()
+    if context is None:
+        return default if default is not None else k8s_client.CustomObjectsApi()
+    return k8s_client.CustomObjectsApi(api_client(context))
+
+
+def resolve(clusters: list[str]) -> list[str]:
+    """Expand '*' into every kubeconfig context and drop duplicates, keeping order."""
+    names = []
+    for name in clusters or []:
+        expanded = list_contexts()[0] if name == ALL_CLUSTERS else [name]
+        names.extend(n for n in expanded if n not in names)
+    return names
+
+
+def fan_out(func, clusters: list[str], **kwargs) -> dict:
+    """
+    Run func(**kwargs) once per cluster, concurrently, each bound to its own context.
+
+    Returns:
+        dict: {"clusters": {name: {"result": ..., "elapsed_ms": ...}}, "elapsed_ms": ...}
+            A cluster whose call raised gets {"error": ..., "elapsed_ms": ...} instead.
+    """
+    names = resolve(clusters)
+
+    def run(name):
+        start = time.perf_counter()
+        try:
+            with use(name):
+                entry = {"result": func(**kwargs)}
+        except Exception as e:
+            logger.error(f"Call to {getattr(func, '__name__', func)} failed in cluster '{name}': {e}")
+            entry = {"error": str(e)}
+        entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return name, entry
+
+    start = time.perf_counter()
+    results = {}
+    if names:
+        with ThreadPoolExecutor(max_workers=min(MAX_FAN_OUT_WORKERS, len(names))) as executor:
+            # 每个线程拷贝调用方的上下文，保持 tracing 等上下文变量
+            futures = [executor.submit(contextvars.copy_context().run, run, name) for name in names]
+            for future in futures:
+                name, entry = future.result()
+                results[name] = entry
+    return {"clusters": results, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+
+def pooled() -> list[str]:
+    with _lock:
+        return list(_configurations)
+
+
+# 让未显式传入配置的 ApiClient（包括 chaosmesh client 内部创建的）跟随当前上下文
+_original_get_default_copy = k8s_client.Configuration.get_default_copy.__func__
+
+
+def _get_default_copy(cls):
+    context = _active_context.get()
+    if context is not None:
+        return configuration(context)
+    return _original_get_default_copy(cls)
+
+
+k8s_client.Configuration.get_default_copy = classmethod(_get_default_copy)
@@ -0,0 +1,328 @@
+"""
+Chaos Mesh experiments of every kind: discovery, lookup by name, get / list / delete.
+
+The kinds come from API discovery of chaos-mesh.org/v1alpha1 rather than from the
+chaosmesh client's Experiment enum, so experiments created by any tool (NetworkChaos
+from network_delay, DNSChaos, HTTPChaos, IOChaos, TimeChaos, KernelChaos,
+PhysicalMachineChaos, ...) can be found and deleted. The discovery table is fetched
+once per cluster and cached in memory and on disk
+(CHAOSMESH_MCP_CACHE_DIR, default ~/.cache/chaosmesh-mcp) for
+CHAOSMESH_MCP_DISCOVERY_TTL seconds (default 6 hours), so a cold start costs no
+discovery round trip.
+
+Tools that only know an experiment's name use find(): it probes every kind
+concurrently and returns the object, which window() and target_pods() then turn into
+when the fault was active and which pods it touched.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from kubernetes.client.exceptions import ApiException
+
+import cluster_pool
+import pod_records
+
+logger = logging.getLogger(__name__)
+
+CHAOS_GROUP = "chaos-mesh.org"
+CHAOS_VERSION = "v1alpha1"
+
+CACHE_DIR = os.environ.get("CHAOSMESH_MCP_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "chaosmesh-mcp")
+DISCOVERY_TTL_SECONDS = float(os.environ.get("CHAOSMESH_MCP_DISCOVERY_TTL", str(6 * 3600)))
+
+# 发现失败时使用的内置表（kind -> plural）
+FALLBACK_KINDS = {
+    "PodChaos": "podchaos", "NetworkChaos": "networkchaos", "StressChaos": "stresschaos",
+    "IOChaos": "iochaos", "TimeChaos": "timechaos", "KernelChaos": "kernelchaos",
+    "DNSChaos": "dnschaos", "HTTPChaos": "httpchaos", "JVMChaos": "jvmchaos",
+    "PhysicalMachineChaos": "physicalmachinechaos",
+}
+# 控制器内部使用的每 Pod 资源，不是用户创建的实验
+_INTERNAL_KINDS = {"PodNetworkChaos", "PodIOChaos", "PodHttpChaos"}
+
+_discovery = {}
+_discovery_lock = threading.Lock()
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)")
+_DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str):
+    """Seconds in a Go duration string such as "1m30s", or None if it is empty or invalid."""
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value.strip():
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_time(value: str):
+    """Parse an RFC 3339 timestamp (any fraction precision) into an aware datetime, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    # Python 只接受最多 6 位小数，Kubernetes 日志时间戳是纳秒精度
+    if "." in value:
+        head, rest = value.split(".", 1)
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:min(digits, 6)].ljust(6, '0')}{rest[digits:]}"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _cache_path(host: str) -> str:
+    return os.path.join(CACHE_DIR, f"discovery-{hashlib.sha1(host.encode()).hexdigest()[:16]}.json")
+
+
+def _read_cache(path: str):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get("fetched_at", 0) > DISCOVERY_TTL_SECONDS:
+        return None
+    return cached.get("kinds")
+
+
+def _write_cache(path: str, host: str, kinds: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，并发启动的进程不会读到半个文件
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"host": host, "fetched_at": time.time(), "kinds": kinds}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Cannot write discovery cache {path}: {e}")
+
+
+def _discover(api_client) -> dict:
+    resources = api_client.call_api(
+        f"/apis/{CHAOS_GROUP}/{CHAOS_VERSION}", "GET",
+        auth_settings=["BearerToken"], response_type="object",
+        _return_http_data_only=True, _request_timeout=30)
+    kinds = {}
+    for resource in resources.get("resources") or []:
+        kind, plural = resource.get("kind"), resource.get("name") or ""
+        # 跳过子资源（xxx/status）和控制器内部资源
+        if "/" in plural or kind in _INTERNAL_KINDS or not kind.endswith("Chaos"):
+            continue
+        kinds[kind] = {"plural": plural, "namespaced": bool(resource.get("namespaced", True))}
+    return kinds
+
+
+def kinds(refresh: bool = False) -> dict:
+    """
+    Experiment kinds of the active cluster: {kind: {"plural", "namespaced"}}.
+
+    Served from memory, then from the on-disk cache, then from API discovery; falls
+    back to FALLBACK_KINDS when discovery fails.
+    """
+    api_client = cluster_pool.custom_objects().api_client
+    host = api_client.configuration.host
+    now = time.time()
+    entry = _discovery.get(host)
+    if entry and not refresh and now - entry[0] <= DISCOVERY_TTL_SECONDS:
+        return entry[1]
+    with _discovery_lock:
+        entry = _discovery.get(host)
+        if entry and not refresh and now - entry[0] <= DISCOVERY_TTL_SECONDS:
+            return entry[1]
+        path = _cache_path(host)
+        table = None if refresh else _read_cache(path)
+        if table is None:
+            try:
+                table = _discover(api_client)
+                _write_cache(path, host, table)
+                logger.info(f"Discovered {len(table)} Chaos Mesh kinds on {host}")
+            except Exception as e:
+                logger.warning(f"Chaos Mesh API discovery failed on {host}, using the built-in kinds: {e}")
+                table = {kind: {"plural": plural, "namespaced": True} for kind, plural in FALLBACK_KINDS.items()}
+        _discovery[host] = (now, table)
+        return table
+
+
+def resolve_kind(value: str) -> tuple:
+    """
+    (kind, plural) for a kind ("NetworkChaos"), plural ("networkchaos") or lowercase kind,
+    or None if the cluster has no such experiment kind.
+    """
+    table = kinds()
+    wanted = (value or "").strip().lower()
+    for kind, info in table.items():
+        if wanted in (kind.lower(), info["plural"]):
+            return kind, info["plural"]
+    return None
+
+
+def _probe_all(func, plurals: list) -> list:
+    """func(plural) for every plural concurrently, in order."""
+    with ThreadPoolExecutor(max_workers=max(1, len(plurals))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, plural) for plural in plurals]
+        return [future.result() for future in futures]
+
+
+def get(plural: str, name: str, namespace: str = "default") -> dict:
+    """The experiment object, or None if it does not exist."""
+    try:
+        return cluster_pool.custom_objects().get_namespaced_custom_object(
+            CHAOS_GROUP, CHAOS_VERSION, namespace, plural, name, _request_timeout=30)
+    except ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def find(name: str, namespace: str = "default") -> dict:
+    """
+    Return the Chaos Mesh object called `name` in `namespace`, or None.
+
+    All kinds are probed concurrently, so a lookup costs one round trip.
+    """
+    plurals = [info["plural"] for info in kinds().values()]
+    results = _probe_all(lambda plural: get(plural, name, namespace), plurals)
+    return next((obj for obj in results if obj), None)
+
+
+def list_experiments(namespace: str = "default", kind: str = None, label_selector: str = None) -> list:
+    """
+    Experiment objects of one kind, or of every kind (listed concurrently), in a namespace.
+    Each object carries its "kind".
+    """
+    if kind:
+        resolved = resolve_kind(kind)
+        if resolved is None:
+            raise ValueError(f"Unknown Chaos Mesh kind: {kind}")
+        plurals = [resolved[1]]
+    else:
+        plurals = [info["plural"] for info in kinds().values()]
+    custom_objects = cluster_pool.custom_objects()
+
+    def list_plural(plural):
+        kwargs = {"label_selector": label_selector} if label_selector else {}
+        try:
+            return custom_objects.list_namespaced_custom_object(
+                CHAOS_GROUP, CHAOS_VERSION, namespace, plural, _request_timeout=30, **kwargs).get("items") or []
+        except ApiException as e:
+            if e.status == 404:
+                return []  # CRD 未安装
+            raise
+
+    return [obj for items in _probe_all(list_plural, plurals) for obj in items]
+
+
+def delete(name: str, namespace: str = "default", kind: str = None) -> dict:
+    """
+    Delete an experiment by name; `kind` (kind or plural) skips the lookup.
+    Returns {"status": "deleted", "kind", "name", "namespace"} or an error dict.
+    """
+    if kind:
+        resolved = resolve_kind(kind)
+        if resolved is None:
+            return {
+                "error": f"Unknown Chaos Mesh kind: {kind}",
+                "suggestion": f"Use one of {sorted(kinds())} or omit the kind to look it up by name"
+            }
+        kind, plural = resolved
+    else:
+        obj = find(name, namespace)
+        if obj is None:
+            return {
+                "error": f"No Chaos Mesh experiment named '{name}' in namespace '{namespace}'",
+                "suggestion": "Check the name and namespace with list_experiments"
+            }
+        kind, plural = resolve_kind(obj.get("kind"))
+    try:
+        cluster_pool.custom_objects().delete_namespaced_custom_object(
+            CHAOS_GROUP, CHAOS_VERSION, namespace, plural, name, _request_timeout=30)
+    except ApiException as e:
+        if e.status == 404:
+            return {
+                "error": f"{kind} '{name}' not found in namespace '{namespace}'",
+                "suggestion": "It may have been deleted already; check with list_experiments"
+            }
+        raise
+    return {"status": "deleted", "kind": kind, "name": name, "namespace": namespace}
+
+
+def _record_events(obj: dict, operation: str) -> list:
+    times = []
+    for record in ((obj.get("status") or {}).get("experiment") or {}).get("containerRecords") or []:
+        for event in record.get("events") or []:
+            if event.get("operation") == operation:
+                ts = parse_time(event.get("timestamp"))
+                if ts:
+                    times.append(ts)
+    return times
+
+
+def window(obj: dict) -> tuple:
+    """
+    (start, end) of an experiment as aware datetimes.
+
+    The start is the first "Apply" event recorded by the controller (the creation time
+    when there is none). The end is the last "Recover" event, otherwise start +
+    spec.duration, capped at now for experiments that are still running.
+    """
+    now = datetime.now(timezone.utc)
+    applied = _record_events(obj, "Apply")
+    start = min(applied) if applied else parse_time((obj.get("metadata") or {}).get("creationTimestamp")) or now
+
+    recovered = _record_events(obj, "Recover")
+    duration = parse_duration((obj.get("spec") or {}).get("duration"))
+    if recovered:
+        end = max(recovered)
+    elif duration is not None:
+        end = start + timedelta(seconds=duration)
+    else:
+        end = now
+    return start, min(end, now)
+
+
+def target_pods(obj: dict, core_v1=None) -> list:
+    """
+    (namespace, pod) pairs an experiment targets: the pods the controller recorded in
+    status.experiment.containerRecords, plus pods currently matching spec.selector
+    (replacement pods of killed ones are included this way).
+    """
+    targets = set()
+    for record in ((obj.get("status") or {}).get("experiment") or {}).get("containerRecords") or []:
+        # id 的格式为 "namespace/pod" 或 "namespace/pod/container"
+        parts = (record.get("id") or "").split("/")
+        if len(parts) >= 2 and parts[0] and parts[1]:
+            targets.add((parts[0], parts[1]))
+
+    selector = (obj.get("spec") or {}).get("selector") or {}
+    for ns, names in (selector.get("pods") or {}).items():
+        targets.update((ns, name) for name in names)
+    terms = [f"{k}={v}" for k, v in sorted((selector.get("labelSelectors") or {}).items())]
+    # 多服务实验的 app in (...) 等集合选择器
+    for expression in selector.get("expressionSelectors") or []:
+        operator, key = expression.get("operator"), expression.get("key")
+        if operator in ("In", "NotIn"):
+            terms.append(f"{key} {operator.lower()} ({','.join(expression.get('values') or [])})")
+        elif operator in ("Exists", "DoesNotExist"):
+            terms.append(key if operator == "Exists" else f"!{key}")
+    if terms:
+        label_selector = ",".join(terms)
+        namespaces = selector.get("namespaces") or [(obj.get("metadata") or {}).get("namespace")]
+        for ns in namespaces:
+            for pod in pod_records.list_pods(ns, label_selector=label_selector, metadata_only=True,
+                                             core_v1=core_v1, request_timeout=30):
+                targets.add((pod.namespace or ns, pod.name))
+    return sorted(targets)
@@ -0,0 +1,910 @@
+"""
+A small in-memory stand-in for the Kubernetes API server, used by benchmark.py to
+exercise the MCP tools without a cluster.
+
+It implements the core/v1 namespace, node, pod, pod log, service and endpoints endpoints,
+generic namespaced custom objects (chaos-mesh.org, networking.istio.io, ...), watches
+(?watch=true, streamed as chunked JSON lines) and enough of API discovery for clients
+that probe /api and /apis. Latency and object
+counts are configurable so tool calls can be measured against clusters of different
+shapes.
+
+Usage:
+    python fake_apiserver.py --port 8001 --namespaces 5 --services 50 --latency-ms 5
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+CHAOS_MESH_GROUP = "chaos-mesh.org"
+
+# plural -> kind，用于发现接口和 kind 字段回填
+CUSTOM_RESOURCES = {
+    CHAOS_MESH_GROUP: {
+        "version": "v1alpha1",
+        "resources": {
+            "podchaos": "PodChaos",
+            "networkchaos": "NetworkChaos",
+            "stresschaos": "StressChaos",
+            "iochaos": "IOChaos",
+            "timechaos": "TimeChaos",
+            "kernelchaos": "KernelChaos",
+            "dnschaos": "DNSChaos",
+            "httpchaos": "HTTPChaos",
+            "jvmchaos": "JVMChaos",
+            "physicalmachinechaos": "PhysicalMachineChaos",
+            "physicalmachines": "PhysicalMachine",
+            "schedules": "Schedule",
+            "workflows": "Workflow",
+        },
+    },
+    "networking.istio.io": {
+        "version": "v1",
+        "resources": {
+            "virtualservices": "VirtualService",
+            "destinationrules": "DestinationRule",
+        },
+    },
+}
+
+# watch 能回溯的事件数，更早的 resourceVersion 返回 410 Gone
+EVENT_LOG_SIZE = 10000
+
+CORE_LIST_KINDS = {
+    "namespaces": "NamespaceList",
+    "pods": "PodList",
+    "services": "ServiceList",
+    "endpoints": "EndpointsList",
+    "nodes": "NodeList",
+}
+
+# 集群级（无命名空间）的核心资源
+CLUSTER_SCOPED = ("namespaces", "nodes")
+
+# 假节点的可用区，node-i 落在 ZONES[i % len(ZONES)]
+ZONES = ("us-east-2a", "us-east-2b", "us-east-2c")
+
+LOG_TEMPLATES = [
+    "INFO request served path=/api/cart/{id} status=200 latency={ms}ms trace_id={trace}",
+    "INFO checkout completed order_id={id} items={n} total={ms}.{n}",
+    "WARN upstream slow service=cartservice latency={ms}ms trace_id={trace}",
+    "ERROR rpc error: code = Unavailable desc = connection refused trace_id={trace}",
+    "DEBUG cache hit key=session:{id}",
+]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Selectors and patches
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SET_TERM = re.compile(r"^\s*([\w./-]+)\s+(in|notin)\s+\(([^)]*)\)\s*$")
+
+
+def _split_selector(selector: str) -> list[str]:
+    terms, depth, current = [], 0, ""
+    for ch in selector:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            terms.append(current)
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        terms.append(current)
+    return terms
+
+
+def label_selector_matcher(selector: str):
+    """Compile a Kubernetes label selector string into a predicate over a labels dict."""
+    checks = []
+    for term in _split_selector(selector or ""):
+        term = term.strip()
+        set_match = _SET_TERM.match(term)
+        if set_match:
+            key, op, values = set_match.groups()
+            values = {v.strip() for v in values.split(",") if v.strip()}
+            if op == "in":
+                checks.append(lambda labels, k=key, vs=values: labels.get(k) in vs)
+            else:
+                checks.append(lambda labels, k=key, vs=values: labels.get(k) not in vs)
+        elif "!=" in term:
+            key, value = term.split("!=", 1)
+            checks.append(lambda labels, k=key.strip(), v=value.strip(): labels.get(k) != v)
+        elif "=" in term:
+            key, value = term.replace("==", "=").split("=", 1)
+            checks.append(lambda labels, k=key.strip(), v=value.strip(): labels.get(k) == v)
+        elif term.startswith("!"):
+            checks.append(lambda labels, k=term[1:].strip(): k not in labels)
+        else:
+            checks.append(lambda labels, k=term: k in labels)
+    return lambda labels: all(check(labels or {}) for check in checks)
+
+
+def field_selector_matcher(selector: str):
+    """Compile a field selector such as 'metadata.name=x,status.phase!=Failed'."""
+    checks = []
+    for term in _split_selector(selector or ""):
+        negate = "!=" in term
+        path, value = term.replace("!=", "=").replace("==", "=").split("=", 1)
+        keys = path.strip().split(".")
+
+        def check(obj, keys=keys, value=value.strip(), negate=negate):
+            current = obj
+            for key in keys:
+                current = current.get(key) if isinstance(current, dict) else None
+            matched = str(current) == value if current is not None else value == ""
+            return not matched if negate else matched
+        checks.append(check)
+    return lambda obj: all(check(obj) for check in checks)
+
+
+def _expression_matches(expression: dict, labels: dict) -> bool:
+    """One matchExpressions-style requirement (In, NotIn, Exists, DoesNotExist)."""
+    key, operator = expression.get("key"), expression.get("operator")
+    if operator == "In":
+        return labels.get(key) in (expression.get("values") or [])
+    if operator == "NotIn":
+        return labels.get(key) not in (expression.get("values") or [])
+    if operator == "Exists":
+        return key in labels
+    return key not in labels
+
+
+def merge_patch(target, patch):
+    """RFC 7386 JSON merge patch."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _pointer(path: str) -> list:
+    return [p.replace("~1", "/").replace("~0", "~") for p in path.lstrip("/").split("/")] if path else []
+
+
+def json_patch(target, operations: list):
+    """RFC 6902 JSON patch (add, remove, replace, move, copy, test)."""
+    doc = copy.deepcopy(target)
+
+    def resolve(parts):
+        parent = doc
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        return parent, parts[-1]
+
+    def get(parts):
+        current = doc
+        for part in parts:
+            current = current[int(part)] if isinstance(current, list) else current[part]
+        return current
+
+    def remove(parts):
+        parent, key = resolve(parts)
+        return parent.pop(int(key)) if isinstance(parent, list) else parent.pop(key)
+
+    def add(parts, value):
+        parent, key = resolve(parts)
+        if isinstance(parent, list):
+            parent.insert(len(parent) if key == "-" else int(key), value)
+        else:
+            parent[key] = value
+
+    for op in operations:
+        parts = _pointer(op["path"])
+        kind = op["op"]
+        if kind == "add":
+            add(parts, copy.deepcopy(op["value"]))
+        elif kind == "remove":
+            remove(parts)
+        elif kind == "replace":
+            remove(parts)
+            add(parts, copy.deepcopy(op["value"]))
+        elif kind == "move":
+            add(parts, remove(_pointer(op["from"])))
+        elif kind == "copy":
+            add(parts, copy.deepcopy(get(_pointer(op["from"]))))
+        elif kind == "test":
+            if get(parts) != op["value"]:
+                raise ValueError(f"test failed at {op['path']}")
+        else:
+            raise ValueError(f"unsupported op {kind}")
+    return doc
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# In-memory cluster state
+# ─────────────────────────────────────────────────────────────────────────────
+
+class FakeCluster:
+    """
+    Object store backing the fake API server. Core objects are keyed by
+    (resource, namespace, name); custom objects by (group, plural, namespace, name).
+    """
+
+    def __init__(self, namespaces: int = 3, services: int = 10, pods_per_service: int = 2,
+                 log_lines: int = 200, annotation_bytes: int = 0, seed: int = 0):
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.resource_version = 0
+        # watch 事件日志：(resourceVersion, 资源键, 事件类型, 对象)
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        self.core = {"namespaces": {}, "pods": {}, "services": {}, "endpoints": {}, "nodes": {}}
+        self.custom = {}
+        self.logs = {}
+        self.log_lines = log_lines
+        self._random = random.Random(seed)
+        self._populate(namespaces, services, pods_per_service, annotation_bytes)
+
+    def _next_rv(self) -> str:
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    def _record(self, resource, event_type: str, obj: dict):
+        """Append a watch event; resource is a core resource name or (group, plural)."""
+        self.events.append((int(obj["metadata"]["resourceVersion"]), resource, event_type, copy.deepcopy(obj)))
+        self.changed.notify_all()
+
+    def _meta(self, name: str, namespace: str = None, labels: dict = None, annotations: dict = None) -> dict:
+        meta = {
+            "name": name,
+            "uid": str(uuid.UUID(int=self._random.getrandbits(128))),
+            "resourceVersion": self._next_rv(),
+            "creationTimestamp": _now(),
+            "labels": labels or {},
+        }
+        if namespace:
+            meta["namespace"] = namespace
+        if annotations:
+            meta["annotations"] = annotations
+        return meta
+
+    def _populate(self, namespaces: int, services: int, pods_per_service: int, annotation_bytes: int):
+        namespace_names = ["default", "chaos-mesh"] + [f"ns-{i}" for i in range(1, namespaces)]
+        for ns in namespace_names:
+            self.core["namespaces"][(None, ns)] = {
+                "apiVersion": "v1", "kind": "Namespace",
+                "metadata": self._meta(ns, labels={"kubernetes.io/metadata.name": ns}),
+                "status": {"phase": "Active"},
+            }
+
+        # Pod 的 nodeName 轮流取 node-0..node-2
+        for i in range(3):
+            self.add_node(f"node-{i}", ZONES[i % len(ZONES)])
+
+        # Chaos Mesh 控制器，fault_inject 初始化时会检查
+        self.add_pod("chaos-mesh", "chaos-controller-manager-0",
+                     {"app.kubernetes.io/name": "chaos-mesh", "app.kubernetes.io/component": "controller-manager"},
+                     container="chaos-mesh")
+
+        annotations = {"example.com/blob": "x" * annotation_bytes} if annotation_bytes else None
+        for ns in namespace_names:
+            if ns == "chaos-mesh":
+                continue
+            for i in range(services):
+                self.add_service(ns, f"svc-{i}", pods_per_service, annotations=annotations)
+        # get_load_test_results 读取 default/loadgenerator 的 main 容器日志
+        self.add_service("default", "loadgenerator", 1, container="main")
+
+    def add_node(self, name: str, zone: str, instance_type: str = "m5.large", labels: dict = None,
+                 ready: bool = True) -> dict:
+        with self.lock:
+            n = len(self.core["nodes"])
+            node = {
+                "apiVersion": "v1", "kind": "Node",
+                "metadata": self._meta(name, labels={
+                    "kubernetes.io/hostname": name,
+                    "topology.kubernetes.io/zone": zone,
+                    "node.kubernetes.io/instance-type": instance_type,
+                    **(labels or {}),
+                }),
+                "spec": {},
+                "status": {
+                    "addresses": [{"type": "InternalIP", "address": f"192.168.{n // 250}.{n % 250 + 10}"},
+                                  {"type": "Hostname", "address": name}],
+                    "conditions": [{"type": "Ready", "status": "True" if ready else "False"}],
+                },
+            }
+            self.core["nodes"][(None, name)] = node
+            self._record("nodes", "ADDED", node)
+            return node
+
+    def add_pod(self, namespace: str, name: str, labels: dict, container: str = "server",
+                annotations: dict = None, phase: str = "Running") -> dict:
+        with self.lock:
+            n = len(self.core["pods"])
+            pod = {
+                "apiVersion": "v1", "kind": "Pod",
+                "metadata": self._meta(name, namespace, labels, annotations),
+                "spec": {
+                    "containers": [{"name": container, "image": f"example/{container}:1.0"}],
+                    "nodeName": f"node-{n % 3}",
+                },
+                "status": {
+                    "phase": phase,
+                    "podIP": f"10.0.{n // 250}.{n % 250 + 1}",
+                    "startTime": _now(),
+                    "containerStatuses": [{
+                        "name": container, "ready": True, "restartCount": 0,
+                        "image": f"example/{container}:1.0", "imageID": "",
+                        "state": {"running": {"startedAt": _now()}},
+                    }],
+                },
+            }
+            self.core["pods"][(namespace, name)] = pod
+            self._record("pods", "ADDED", pod)
+            return pod
+
+    def add_service(self, namespace: str, name: str, pods: int, annotations: dict = None,
+                    container: str = "server") -> dict:
+        with self.lock:
+            service = {
+                "apiVersion": "v1", "kind": "Service",
+                "metadata": self._meta(name, namespace, {"app": name}, annotations),
+                "spec": {
+                    "type": "ClusterIP",
+                    "clusterIP": f"172.20.{len(self.core['services']) // 250}.{len(self.core['services']) % 250 + 1}",
+                    "selector": {"app": name},
+                    "ports": [{"name": "grpc", "port": 8080, "targetPort": 8080, "protocol": "TCP"}],
+                },
+            }
+            self.core["services"][(namespace, name)] = service
+            self._record("services", "ADDED", service)
+            addresses = []
+            for j in range(pods):
+                pod = self.add_pod(namespace, f"{name}-{j}", {"app": name, "pod-template-hash": "abc123"},
+                                   container=container, annotations=annotations)
+                addresses.append({"ip": pod["status"]["podIP"],
+                                  "targetRef": {"kind": "Pod", "name": pod["metadata"]["name"], "namespace": namespace}})
+            self.core["endpoints"][(namespace, name)] = {
+                "apiVersion": "v1", "kind": "Endpoints",
+                "metadata": self._meta(name, namespace, {"app": name}),
+                "subsets": [{"addresses": addresses,
+                             "ports": [{"name": "grpc", "port": 8080, "protocol": "TCP"}]}] if addresses else [],
+            }
+            self._record("endpoints", "ADDED", self.core["endpoints"][(namespace, name)])
+            return service
+
+    def update_core(self, resource: str, obj: dict) -> dict:
+        """Store a modified core object (bumping its resourceVersion) and emit MODIFIED."""
+        with self.lock:
+            meta = obj["metadata"]
+            meta["resourceVersion"] = self._next_rv()
+            self.core[resource][(meta.get("namespace"), meta["name"])] = obj
+            self._record(resource, "MODIFIED", obj)
+            return obj
+
+    def delete_core(self, resource: str, namespace: str, name: str) -> dict:
+        """Remove a core object and emit DELETED. Returns the removed object or None."""
+        with self.lock:
+            obj = self.core[resource].pop((namespace, name), None)
+            if obj is not None:
+                obj["metadata"]["resourceVersion"] = self._next_rv()
+                self._record(resource, "DELETED", obj)
+            return obj
+
+    def restart_container(self, namespace: str, name: str) -> dict:
+        """Simulate a container restart: bump restartCount and start a new log (the old one becomes previous)."""
+        with self.lock:
+            pod = copy.deepcopy(self.core["pods"][(namespace, name)])
+            for status in pod["status"].get("containerStatuses") or []:
+                status["restartCount"] = status.get("restartCount", 0) + 1
+            self.logs[(namespace, name, "previous")] = self.pod_log(namespace, name)
+            self.logs[(namespace, name)] = []
+            return self.update_core("pods", pod)
+
+    def pod_log(self, namespace: str, name: str, previous: bool = False) -> list[tuple[datetime, str]]:
+        key = (namespace, name, "previous") if previous else (namespace, name)
+        if key not in self.logs:
+            rng = random.Random(hash(key))
+            start = datetime.now(timezone.utc) - timedelta(seconds=self.log_lines)
+            lines = []
+            for i in range(self.log_lines):
+                template = LOG_TEMPLATES[rng.randrange(len(LOG_TEMPLATES))]
+                lines.append((start + timedelta(seconds=i), template.format(
+                    id=rng.randrange(10 ** 6), ms=rng.randrange(1, 900), n=rng.randrange(1, 20),
+                    trace=f"{rng.getrandbits(64):016x}")))
+            self.logs[key] = lines
+        return self.logs[key]
+
+    # ── custom objects ──────────────────────────────────────────────────────
+
+    def create_custom(self, group: str, version: str, plural: str, namespace: str, body: dict) -> dict:
+        with self.lock:
+            name = body.get("metadata", {}).get("name")
+            key = (group, plural, namespace, name)
+            if key in self.custom:
+                return None
+            obj = copy.deepcopy(body)
+            obj.setdefault("apiVersion", f"{group}/{version}")
+            kind = CUSTOM_RESOURCES.get(group, {}).get("resources", {}).get(plural)
+            if kind and obj.get("kind") in (None, plural):
+                obj["kind"] = kind
+            meta = obj.setdefault("metadata", {})
+            generated = self._meta(name, namespace)
+            for field in ("namespace", "uid", "resourceVersion", "creationTimestamp"):
+                meta[field] = generated[field]
+            if group == CHAOS_MESH_GROUP:
+                # 模拟控制器立即完成注入，chaosmesh client 的轮询会马上返回
+                records = [{"id": f"{ns}/{pod_name}", "phase": "Injected",
+                            "events": [{"type": "Succeeded", "operation": "Apply", "timestamp": _now()}]}
+                           for ns, pod_name in self._selected_pods((obj.get("spec") or {}).get("selector") or {})]
+                obj["status"] = {
+                    "conditions": [{"type": "AllInjected", "status": "True"},
+                                   {"type": "Selected", "status": "True"}],
+                    "experiment": {"containerRecords": records or [{"id": "default/pod", "phase": "Injected"}],
+                                   "desiredPhase": "Run"},
+                }
+            self.custom[key] = obj
+            self._record((group, plural), "ADDED", obj)
+            return obj
+
+    def _selected_pods(self, selector: dict) -> list[tuple[str, str]]:
+        """Pods matched by a Chaos Mesh selector (namespaces + labelSelectors/expressionSelectors, or explicit pods)."""
+        selected = [(ns, name) for ns, names in (selector.get("pods") or {}).items() for name in names]
+        labels = selector.get("labelSelectors")
+        expressions = selector.get("expressionSelectors") or []
+        namespaces = selector.get("namespaces")
+        if labels or expressions or namespaces:
+            for (ns, name), pod in self.core["pods"].items():
+                pod_labels = pod["metadata"].get("labels") or {}
+                if (not namespaces or ns in namespaces) and all(pod_labels.get(k) == v for k, v in (labels or {}).items()) \
+                        and all(_expression_matches(e, pod_labels) for e in expressions):
+                    selected.append((ns, name))
+        return sorted(set(selected))
+
+    def replace_custom(self, key: tuple, obj: dict) -> dict:
+        with self.lock:
+            obj["metadata"]["resourceVersion"] = self._next_rv()
+            self.custom[key] = obj
+            self._record(key[:2], "MODIFIED", obj)
+            return obj
+
+    def delete_custom(self, key: tuple) -> dict:
+        with self.lock:
+            obj = self.custom.pop(key, None)
+            if obj is not None:
+                obj["metadata"]["resourceVersion"] = self._next_rv()
+                self._record(key[:2], "DELETED", obj)
+            return obj
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HTTP handler
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "fake-apiserver/0.1"
+
+    # 头和 body 分两次写出，关闭 Nagle 避免与客户端的延迟 ACK 叠加出 40ms 级别的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # ── helpers ─────────────────────────────────────────────────────────────
+
+    @property
+    def cluster(self) -> FakeCluster:
+        return self.server.cluster
+
+    def _delay(self):
+        latency = self.server.latency_ms
+        if self.server.jitter_ms:
+            latency += random.uniform(0, self.server.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+    def _send(self, status: int, payload, content_type: str = "application/json"):
+        body = payload if isinstance(payload, bytes) else (
+            payload.encode() if isinstance(payload, str) else json.dumps(payload).encode())
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _status(self, code: int, reason: str, message: str):
+        self._send(code, {"kind": "Status", "apiVersion": "v1", "status": "Failure",
+                          "message": message, "reason": reason, "code": code})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def _list(self, kind: str, objects: list, query: dict, api_version: str = "v1",
+              resource=None, namespace: str = None):
+        if query.get("watch", ["false"])[0].lower() in ("true", "1") and resource is not None:
+            return self._watch(objects, query, resource, namespace)
+        label = query.get("labelSelector", [None])[0]
+        field = query.get("fieldSelector", [None])[0]
+        if label:
+            match = label_selector_matcher(label)
+            objects = [o for o in objects if match(o["metadata"].get("labels"))]
+        if field:
+            match = field_selector_matcher(field)
+            objects = [o for o in objects if match(o)]
+        objects.sort(key=lambda o: (o["metadata"].get("namespace", ""), o["metadata"]["name"]))
+
+        offset = int(query.get("continue", ["0"])[0] or 0)
+        limit = int(query.get("limit", ["0"])[0] or 0)
+        page = objects[offset:offset + limit] if limit else objects[offset:]
+        meta = {"resourceVersion": str(self.cluster.resource_version)}
+        if limit and offset + limit < len(objects):
+            meta["continue"] = str(offset + limit)
+            meta["remainingItemCount"] = len(objects) - offset - limit
+        if "as=PartialObjectMetadataList" in (self.headers.get("Accept") or ""):
+            # 元数据列表：只返回每个对象的 metadata
+            page = [{"apiVersion": "meta.k8s.io/v1", "kind": "PartialObjectMetadata", "metadata": o["metadata"]}
+                    for o in page]
+            kind, api_version = "PartialObjectMetadataList", "meta.k8s.io/v1"
+        self._send(200, {"kind": kind, "apiVersion": api_version, "metadata": meta, "items": page})
+
+    def _watch(self, objects: list, query: dict, resource, namespace: str = None):
+        """
+        Stream watch events as chunked JSON lines until timeoutSeconds (default 60)
+        expires. Without resourceVersion the current objects are sent as ADDED first.
+        """
+        label = query.get("labelSelector", [None])[0]
+        field = query.get("fieldSelector", [None])[0]
+        label_match = label_selector_matcher(label) if label else None
+        field_match = field_selector_matcher(field) if field else None
+
+        def matches(obj):
+            meta = obj["metadata"]
+            if namespace is not None and meta.get("namespace") != namespace:
+                return False
+            if label_match and not label_match(meta.get("labels")):
+                return False
+            return not field_match or field_match(obj)
+
+        cluster = self.cluster
+        since = query.get("resourceVersion", [""])[0]
+        deadline = time.monotonic() + int(query.get("timeoutSeconds", ["60"])[0] or 60)
+        with cluster.lock:
+            if since in ("", "0"):
+                pending = [{"type": "ADDED", "object": o} for o in objects if matches(o)]
+                since = cluster.resource_version
+            else:
+                since = int(since)
+                oldest = cluster.events[0][0] if cluster.events else cluster.resource_version + 1
+                if since < oldest - 1 and since < cluster.resource_version:
+                    pending = [{"type": "ERROR", "object": {
+                        "kind": "Status", "apiVersion": "v1", "status": "Failure", "code": 410,
+                        "reason": "Expired", "message": f"too old resource version: {since} ({oldest})"}}]
+                    deadline = 0
+                else:
+                    pending = []
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                for event in pending:
+                    line = json.dumps(event).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                with cluster.lock:
+                    if not cluster.events or cluster.events[-1][0] <= since:
+                        cluster.changed.wait(min(remaining, 1.0))
+                    pending = []
+                    for rv, res, event_type, obj in cluster.events:
+                        if rv > since and res == resource and matches(obj):
+                            pending.append({"type": event_type, "object": obj})
+                    since = max(since, cluster.resource_version)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    # ── dispatch ────────────────────────────────────────────────────────────
+
+    def _dispatch(self, method: str):
+        self._delay()
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        parts = [p for p in parsed.path.split("/") if p]
+        try:
+            if not parts:
+                # load_generate 的目标地址
+                return self._send(200, "ok", "text/plain")
+            if parts == ["version"]:
+                return self._send(200, {"major": "1", "minor": "30", "gitVersion": "v1.30.0-fake"})
+            if parts[0] == "api":
+                return self._core(method, parts[1:], query)
+            if parts[0] == "apis":
+                return self._apis(method, parts[1:], query)
+            return self._status(404, "NotFound", f"path {parsed.path} not found")
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            return self._status(422, "Invalid", str(e))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ── core/v1 ─────────────────────────────────────────────────────────────
+
+    def _core(self, method: str, parts: list, query: dict):
+        if not parts:
+            return self._send(200, {"kind": "APIVersions", "versions": ["v1"]})
+        parts = parts[1:]  # 去掉 "v1"
+        if not parts:
+            return self._send(200, {"kind": "APIResourceList", "groupVersion": "v1", "resources": [
+                {"name": r, "namespaced": r not in CLUSTER_SCOPED, "kind": k[:-4], "verbs": ["get", "list"]}
+                for r, k in CORE_LIST_KINDS.items()]})
+        if method != "GET":
+            return self._status(405, "MethodNotAllowed", f"{method} not supported on core resources")
+
+        store = self.cluster.core
+        # /api/v1/{resource}：跨命名空间列表（列表和 watch 在锁外发送）
+        if len(parts) == 1 and parts[0] in store:
+            with self.cluster.lock:
+                objects = list(store[parts[0]].values())
+            return self._list(CORE_LIST_KINDS[parts[0]], objects, query, resource=parts[0])
+        if parts[0] not in CLUSTER_SCOPED:
+            return self._status(404, "NotFound", f"resource {parts[0]} not found")
+        with self.cluster.lock:
+            if len(parts) == 2:
+                obj = store[parts[0]].get((None, parts[1]))
+                return self._send(200, obj) if obj else self._status(404, "NotFound", f'{parts[0]} "{parts[1]}" not found')
+            if parts[0] != "namespaces":
+                return self._status(404, "NotFound", f"resource {parts[0]}/{parts[2]} not found")
+            namespace, resource = parts[1], parts[2]
+            if resource not in store:
+                return self._status(404, "NotFound", f"resource {resource} not found")
+            objects = [o for (ns, _), o in store[resource].items() if ns == namespace] if len(parts) == 3 else None
+            obj = store[resource].get((namespace, parts[3])) if len(parts) > 3 else None
+        if objects is not None:
+            return self._list(CORE_LIST_KINDS[resource], objects, query, resource=resource, namespace=namespace)
+        if obj is None:
+            return self._status(404, "NotFound", f'{resource} "{parts[3]}" not found')
+        if len(parts) == 5 and resource == "pods" and parts[4] == "log":
+            return self._pod_log(namespace, parts[3], query)
+        return self._send(200, obj)
+
+    def _pod_log(self, namespace: str, name: str, query: dict):
+        previous = query.get("previous", ["false"])[0].lower() == "true"
+        if previous:
+            with self.cluster.lock:
+                pod = self.cluster.core["pods"][(namespace, name)]
+                restarted = any(c.get("restartCount") for c in pod["status"].get("containerStatuses") or [])
+            if not restarted:
+                return self._status(400, "BadRequest",
+                                    f'previous terminated container in pod "{name}" not found')
+        lines = self.cluster.pod_log(namespace, name, previous=previous)
+        since = query.get("sinceSeconds", [None])[0]
+        if since:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=int(since))
+            lines = [(ts, line) for ts, line in lines if ts >= cutoff]
+        tail = query.get("tailLines", [None])[0]
+        if tail:
+            lines = lines[-int(tail):] if int(tail) else []
+        timestamps = query.get("timestamps", ["false"])[0].lower() == "true"
+        text = "".join(
+            f"{ts.strftime('%Y-%m-%dT%H:%M:%S.%fZ')} {line}\n" if timestamps else f"{line}\n"
+            for ts, line in lines)
+        limit_bytes = query.get("limitBytes", [None])[0]
+        if limit_bytes:
+            text = text[:int(limit_bytes)]
+        self._send(200, text, "text/plain")
+
+    # ── /apis ───────────────────────────────────────────────────────────────
+
+    def _apis(self, method: str, parts: list, query: dict):
+        if not parts:
+            return self._send(200, {"kind": "APIGroupList", "apiVersion": "v1", "groups": [
+                {"name": group, "versions": [{"groupVersion": f"{group}/{info['version']}", "version": info["version"]}],
+                 "preferredVersion": {"groupVersion": f"{group}/{info['version']}", "version": info["version"]}}
+                for group, info in CUSTOM_RESOURCES.items()]})
+        group = parts[0]
+        if len(parts) == 1:
+            info = CUSTOM_RESOURCES.get(group)
+            if not info:
+                return self._status(404, "NotFound", f"group {group} not found")
+            gv = {"groupVersion": f"{group}/{info['version']}", "version": info["version"]}
+            return self._send(200, {"kind": "APIGroup", "apiVersion": "v1", "name": group,
+                                    "versions": [gv], "preferredVersion": gv})
+        version = parts[1]
+        if len(parts) == 2:
+            info = CUSTOM_RESOURCES.get(group, {"resources": {}})
+            return self._send(200, {"kind": "APIResourceList", "apiVersion": "v1",
+                                    "groupVersion": f"{group}/{version}", "resources": [
+                {"name": plural, "singularName": kind.lower(), "namespaced": True,
+                 "kind": kind, "verbs": ["create", "delete", "get", "list", "patch", "update", "watch"]}
+                for plural, kind in info["resources"].items()]})
+
+        if parts[2] != "namespaces":
+            # /apis/{group}/{version}/{plural}：跨命名空间列表
+            plural = parts[2]
+            with self.cluster.lock:
+                objects = [o for (g, p, _, _), o in self.cluster.custom.items() if g == group and p == plural]
+            return self._list(self._list_kind(group, plural), objects, query, f"{group}/{version}",
+                              resource=(group, plural))
+
+        namespace, plural = parts[3], parts[4]
+        name = parts[5] if len(parts) > 5 else None
+        cluster = self.cluster
+        if name is None:
+            if method == "GET":
+                with cluster.lock:
+                    objects = [o for (g, p, ns, _), o in cluster.custom.items()
+                               if g == group and p == plural and ns == namespace]
+                return self._list(self._list_kind(group, plural), objects, query, f"{group}/{version}",
+                                  resource=(group, plural), namespace=namespace)
+            if method == "POST":
+                body = self._body()
+                obj = cluster.create_custom(group, version, plural, namespace, body)
+                if obj is None:
+                    return self._status(409, "AlreadyExists",
+                                        f'{plural}.{group} "{body["metadata"]["name"]}" already exists')
+                return self._send(201, obj)
+            return self._status(405, "MethodNotAllowed", f"{method} not supported on collections")
+
+        key = (group, plural, namespace, name)
+        with cluster.lock:
+            existing = cluster.custom.get(key)
+            if existing is None:
+                return self._status(404, "NotFound", f'{plural}.{group} "{name}" not found')
+            if method == "GET":
+                obj = existing
+            elif method == "DELETE":
+                obj = cluster.delete_custom(key)
+            elif method == "PUT":
+                obj = cluster.replace_custom(key, self._body())
+            elif method == "PATCH":
+                content_type = self.headers.get("Content-Type", "")
+                body = self._body()
+                patched = json_patch(existing, body) if "json-patch" in content_type else merge_patch(existing, body)
+                obj = cluster.replace_custom(key, patched)
+            else:
+                return self._status(405, "MethodNotAllowed", f"{method} not supported")
+        return self._send(200, obj)
+
+    @staticmethod
+    def _list_kind(group: str, plural: str) -> str:
+        kind = CUSTOM_RESOURCES.get(group, {}).get("resources", {}).get(plural, plural)
+        return f"{kind}List"
+
+
+class _Server(ThreadingHTTPServer):
+    # load_generate 会并发建立大量连接，默认 backlog (5) 会导致 SYN 重传带来的 1s 抖动
+    request_queue_size = 256
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端提前关闭连接（例如日志搜索提前结束）是正常情况
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeApiServer:
+    """
+    Runs a FakeCluster behind a threaded HTTP server.
+
+    Args:
+        port (int): Port to listen on. 0 picks a free port.
+        latency_ms (float): Fixed latency added to every request.
+        jitter_ms (float): Random extra latency in [0, jitter_ms) added to every request.
+        **cluster_kwargs: Passed to FakeCluster (namespaces, services, pods_per_service, ...).
+    """
+
+    def __init__(self, port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, **cluster_kwargs):
+        self.cluster = FakeCluster(**cluster_kwargs)
+        self.httpd = _Server(("127.0.0.1", port), _Handler)
+        self.httpd.cluster = self.cluster
+        self.httpd.latency_ms = latency_ms
+        self.httpd.jitter_ms = jitter_ms
+        self._thread = None
+        self._kubeconfig = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeApiServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-apiserver", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._kubeconfig and os.path.exists(self._kubeconfig):
+            os.unlink(self._kubeconfig)
+
+    def write_kubeconfig(self, path: str = None, context: str = "fake") -> str:
+        """Write a kubeconfig pointing at this server and return its path."""
+        config = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": context, "cluster": {"server": self.url}}],
+            "users": [{"name": context, "user": {"token": "fake-token"}}],
+            "contexts": [{"name": context, "context": {"cluster": context, "user": context}}],
+            "current-context": context,
+        }
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="fake-kubeconfig-", suffix=".yaml")
+            os.close(fd)
+            self._kubeconfig = path
+        with open(path, "w") as f:
+            json.dump(config, f)  # JSON 是合法的 YAML
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an in-memory fake Kubernetes/Chaos Mesh API server.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--namespaces", type=int, default=3)
+    parser.add_argument("--services", type=int, default=10, help="Services per namespace.")
+    parser.add_argument("--pods", type=int, default=2, help="Pods per service.")
+    parser.add_argument("--log-lines", type=int, default=200)
+    parser.add_argument("--annotation-bytes", type=int, default=0,
+                        help="Size of a filler annotation added to every pod and service.")
+    parser.add_argument("--kubeconfig", type=str, help="Write a kubeconfig for this server to the given path.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeApiServer(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           namespaces=args.namespaces, services=args.services,
+                           pods_per_service=args.pods, log_lines=args.log_lines,
+                           annotation_bytes=args.annotation_bytes)
+    if args.kubeconfig:
+        server.write_kubeconfig(args.kubeconfig)
+        logger.info(f"Wrote kubeconfig to {args.kubeconfig}")
+    logger.info(f"Fake API server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
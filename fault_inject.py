@@ -1,17 +1,33 @@
+import contextvars
 import json
 import uuid
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List
 from chaosmesh.client import Client, Experiment
 from chaosmesh.k8s.selector import Selector
 from kubernetes import client as k8s_client, config as k8s_config
 from kubernetes.client.exceptions import ApiException
 import os
+import cluster_pool
+import experiments
+import idempotency
+import journal
+import pod_records
+import ratelimit
+import recorder
+import tracing
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 按环境变量开启 API 限流（最外层中间件）和流量录制/回放，必须在初始化客户端之前
+ratelimit.install_from_env()
+recorder.install_from_env()
+
 def initialize_kubernetes_config():
     """
     初始化Kubernetes配置，确保能正确连接到EKS集群
@@ -66,12 +82,13 @@ def initialize_chaos_mesh_client():
                 raise
         
         # 检查Chaos Mesh控制器是否运行
-        pods = v1.list_namespaced_pod(
+        pods = pod_records.list_pods(
             namespace="chaos-mesh",
-            label_selector="app.kubernetes.io/name=chaos-mesh"
+            label_selector="app.kubernetes.io/name=chaos-mesh",
+            core_v1=v1
         )
         
-        running_pods = [pod for pod in pods.items if pod.status.phase == "Running"]
+        running_pods = [pod for pod in pods if pod.phase == "Running"]
         if not running_pods:
             logger.error("No running Chaos Mesh controller pods found")
             raise Exception("Chaos Mesh controller not running")
@@ -104,16 +121,13 @@ __all__ = [
 ]
 
 
-def _apply_stress_chaos_via_kubectl(type: str, namespace: str, name: str, **kwargs) -> dict:
+def _apply_stress_chaos(type: str, namespace: str, name: str, annotations: dict = None, **kwargs) -> dict:
     """
-    Workaround function to apply StressChaos using kubectl due to chaos-mesh Python client bug.
-    The client doesn't include 'value' and 'containerNames' fields in the spec.
+    Create a StressChaos from a manifest built here, working around a chaos-mesh Python client
+    bug: the client doesn't include 'value' and 'containerNames' fields in the spec.
     """
-    import subprocess
-    import tempfile
-    import yaml
     from dataclasses import asdict
-    
+
     # Build the StressChaos spec
     spec = {
         "apiVersion": "chaos-mesh.org/v1alpha1",
@@ -152,51 +166,28 @@ def _apply_stress_chaos_via_kubectl(type: str, namespace: str, name: str, **kwar
     # Add containerNames if provided
     if kwargs.get('container_names'):
         spec["spec"]["containerNames"] = kwargs.get('container_names')
-    
-    # Write to temporary file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        yaml.dump(spec, f)
-        temp_file = f.name
-    
-    try:
-        # Apply using kubectl
-        result = subprocess.run(
-            ['kubectl', 'apply', '-f', temp_file],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logger.info(f"Successfully applied StressChaos: {result.stdout}")
-        
-        # Return a dict similar to what the client would return
-        return {
-            "apiVersion": spec["apiVersion"],
-            "kind": spec["kind"],
-            "metadata": spec["metadata"],
-            "spec": spec["spec"]
-        }
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to apply StressChaos: {e.stderr}")
+
+    if annotations:
+        spec["metadata"]["annotations"] = annotations
+
+    result = _create_manifest(spec)
+    if "error" in result:
         return {
-            "error": f"Failed to apply StressChaos: {e.stderr}",
+            "error": f"Failed to apply StressChaos: {result['error']}",
             "experiment_name": name,
             "namespace": namespace,
             "type": type
         }
-    finally:
-        # Clean up temp file
-        import os
-        try:
-            os.unlink(temp_file)
-        except:
-            pass
+    return result
 
 
-def pod_fault(service: str, type: str, namespace: str = "default", **kwargs) -> dict:
+@tracing.traced()
+def pod_fault(service, type: str, namespace: str = "default", **kwargs) -> dict:
     """
     Inject a fault into a pod
     Args:
-        service (str): The name of the service to inject the fault into, e.g., "adservice".
+        service (str | list[str]): The name of the service to inject the fault into, e.g., "adservice",
+            or several names to target with one experiment.
         type (str): The type of fault to inject, one of "POD_FAILURE", "POD_KILL", "CONTAINER_KILL".
             - POD_FAILURE: Simulate a pod failure.
             - POD_KILL: Simulate a pod kill.
@@ -213,34 +204,29 @@ def pod_fault(service: str, type: str, namespace: str = "default", **kwargs) ->
     """
     # 验证服务是否存在
     try:
-        # 检查指定命名空间中是否有匹配的pods
-        v1 = k8s_client.CoreV1Api()
-        pods = v1.list_namespaced_pod(
-            namespace=namespace,
-            label_selector=f"app={service}"
-        )
-        
-        if not pods.items:
-            # 尝试其他常见的标签选择器
-            alternative_selectors = [
-                f"app.kubernetes.io/name={service}",
-                f"k8s-app={service}"
-            ]
-            
-            for selector in alternative_selectors:
-                pods = v1.list_namespaced_pod(
-                    namespace=namespace,
-                    label_selector=selector
-                )
-                if pods.items:
-                    break
-            
-            if not pods.items:
+        with tracing.span("verify_service", service=service, namespace=namespace) as verify_span:
+            # 检查指定命名空间中是否有匹配的pods（只取元数据）
+            v1 = cluster_pool.core_v1()
+            missing, found = [], 0
+            for name in services_of(service):
+                for selector in pod_records.SERVICE_SELECTORS:
+                    selector = selector.format(name)
+                    with tracing.span("list_pods", selector=selector):
+                        pods = pod_records.list_pods(namespace, label_selector=selector,
+                                                     metadata_only=True, core_v1=v1)
+                    if pods:
+                        break
+                if not pods:
+                    missing.append(name)
+                found += len(pods)
+
+            if missing:
                 return {
-                    "error": f"No pods found for service '{service}' in namespace '{namespace}'. Please check service name and namespace."
+                    "error": f"No pods found for service '{', '.join(missing)}' in namespace '{namespace}'. Please check service name and namespace."
                 }
-        
-        logger.info(f"Found {len(pods.items)} pods for service '{service}' in namespace '{namespace}'")
+            
+            verify_span.set_attribute("pods", found)
+            logger.info(f"Found {found} pods for service '{service}' in namespace '{namespace}'")
         
     except Exception as e:
         logger.warning(f"Could not verify service existence: {e}")
@@ -255,6 +241,7 @@ def pod_fault(service: str, type: str, namespace: str = "default", **kwargs) ->
     )
 
 
+@tracing.traced()
 def pod_stress_test(service: str, type: str, container_names: list[str], namespace: str = "default", **kwargs) -> dict:
     """
     Simulate a stress test on a pod
@@ -287,7 +274,80 @@ def pod_stress_test(service: str, type: str, container_names: list[str], namespa
     )
 
 
-def host_stress_test(type: str, address: list[str], **kwargs) -> dict:
+# 主机故障按地址分片：每片一个 PhysicalMachineChaos，并发提交
+HOST_SHARD_SIZE = int(os.environ.get("CHAOSMESH_MCP_HOST_SHARD_SIZE", "50"))
+HOST_SHARD_WORKERS = int(os.environ.get("CHAOSMESH_MCP_HOST_SHARD_WORKERS", "8"))
+
+
+def _shard_hosts(apply, address: list[str], namespace: str, shard_size: int = None) -> dict:
+    """
+    Apply host chaos to `address` in batches of `shard_size` (default HOST_SHARD_SIZE)
+    addresses, one PhysicalMachineChaos per batch, created concurrently so a slow or
+    failing batch does not hold up the others.
+
+    Args:
+        apply: Called with one batch of addresses; returns the experiment or an error dict.
+        address (list[str]): All target addresses.
+        namespace (str): Namespace of the experiments (for the summary).
+        shard_size (int): Addresses per experiment.
+
+    Returns:
+        dict: apply()'s result when the addresses fit in one batch; otherwise the status of
+            every shard and totals. "error" is set only when every shard failed.
+    """
+    shard_size = max(1, int(shard_size or HOST_SHARD_SIZE))
+    address = list(dict.fromkeys(address or []))
+    if len(address) <= shard_size:
+        return apply(address)
+    batches = [address[i:i + shard_size] for i in range(0, len(address), shard_size)]
+
+    def run(index, batch):
+        start = time.perf_counter()
+        try:
+            with tracing.span("host_shard", shard=index, addresses=len(batch)):
+                result = apply(batch)
+        except Exception as e:
+            result = {"error": str(e)}
+        entry = {"shard": index, "addresses": len(batch), "first_address": batch[0]}
+        if isinstance(result, dict) and "error" not in result:
+            entry["name"] = (result.get("metadata") or {}).get("name")
+            entry["status"] = "replayed" if (result.get("idempotency") or {}).get("replayed") else "created"
+        else:
+            entry["status"] = "error"
+            entry["error"] = result.get("error") if isinstance(result, dict) else str(result)
+        entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return entry
+
+    start = time.perf_counter()
+    logger.info(f"Applying host chaos to {len(address)} addresses in {len(batches)} shards of up to {shard_size}")
+    with ThreadPoolExecutor(max_workers=min(HOST_SHARD_WORKERS, len(batches))) as executor:
+        # 每个线程拷贝调用方的上下文（集群、幂等设置、tracing）
+        futures = [executor.submit(contextvars.copy_context().run, run, index, batch)
+                   for index, batch in enumerate(batches)]
+        shards = [future.result() for future in futures]
+
+    failed = [shard for shard in shards if shard["status"] == "error"]
+    result = {
+        "kind": "PhysicalMachineChaos",
+        "namespace": namespace,
+        "addresses": len(address),
+        "shard_size": shard_size,
+        "shards": shards,
+        "experiments": [shard["name"] for shard in shards if shard["status"] != "error"],
+        "created": len(shards) - len(failed),
+        "failed": len(failed),
+        "failed_addresses": [a for shard in failed for a in batches[shard["shard"]]],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+    if len(failed) == len(shards):
+        result["error"] = f"All {len(shards)} shards failed: {failed[0]['error']}"
+        result["suggestion"] = "Check that chaosd is reachable on the addresses and Chaos Mesh is installed"
+    return result
+
+
+@tracing.traced()
+def host_stress_test(type: str, address: list[str], namespace: str = "default", shard_size: int = None,
+                     **kwargs) -> dict:
     """
     Simulate a stress test on a host
     Args:
@@ -295,6 +355,9 @@ def host_stress_test(type: str, address: list[str], **kwargs) -> dict:
             - HOST_STRESS_CPU: Simulate a CPU stress test.
             - HOST_STRESS_MEMORY: Simulate a memory stress test.
         address (list[str]): The addresses of the hosts to inject the fault into.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per experiment; longer lists are split into shards created
+            concurrently (see _shard_hosts). Default is HOST_SHARD_SIZE.
         kwargs: Additional arguments for the experiment.
             - duration (str): The duration of the experiment, e.g., "5m" for 5 minutes.
             - workers (int): The number of workers for the stress test.
@@ -304,17 +367,19 @@ def host_stress_test(type: str, address: list[str], **kwargs) -> dict:
     Returns:
         dict: The applied experiment's resource in Kubernetes.
     """
-    return _fault_inject(
-        type=type,
-        address=address,
-        **kwargs,
+    return _shard_hosts(
+        lambda batch: _fault_inject(type=type, namespace=namespace, address=batch, **kwargs),
+        address, namespace, shard_size,
     )
 
 
-def host_disk_fault(type: str, address: list[str], size: str, path: str, **kwargs) -> dict:
+@tracing.traced()
+def host_disk_fault(type: str, address: list[str], size: str, path: str, namespace: str = "default",
+                    shard_size: int = None, **kwargs) -> dict:
     """
-    Simulate a disk fault on a host via kubectl apply (workaround for Python client missing mode field).
+    Simulate a disk fault on a host from a manifest built here (workaround for Python client missing mode field).
     type: HOST_DISK_FILL | HOST_READ_PAYLOAD | HOST_WRITE_PAYLOAD
+    Long address lists are split into shards of `shard_size` created concurrently (see _shard_hosts).
     """
     action_map = {
         "HOST_DISK_FILL": "disk-fill",
@@ -325,7 +390,6 @@ def host_disk_fault(type: str, address: list[str], size: str, path: str, **kwarg
     if action is None:
         return {"error": f"Invalid type: {type}. Valid: {list(action_map.keys())}"}
 
-    name = _gen_name(type.lower().replace("_", "-"))
     duration = kwargs.get("duration", "1m")
     mode = kwargs.get("mode", "one")
     payload_process_num = kwargs.get("payload_process_num", 1)
@@ -357,21 +421,25 @@ def host_disk_fault(type: str, address: list[str], size: str, path: str, **kwarg
             }
         }
 
-    manifest = {
-        "apiVersion": "chaos-mesh.org/v1alpha1",
-        "kind": "PhysicalMachineChaos",
-        "metadata": {"name": name, "namespace": "default"},
-        "spec": {
-            "action": action,
-            "mode": mode,
-            "address": address,
-            "duration": duration,
-            **spec_action,
+    def apply(batch):
+        manifest = {
+            "apiVersion": "chaos-mesh.org/v1alpha1",
+            "kind": "PhysicalMachineChaos",
+            "metadata": {"name": _gen_name(type.lower().replace("_", "-")), "namespace": namespace},
+            "spec": {
+                "action": action,
+                "mode": mode,
+                "address": batch,
+                "duration": duration,
+                **spec_action,
+            }
         }
-    }
-    return _apply_chaos_crd(manifest)
+        return _apply_chaos_crd(manifest)
+
+    return _shard_hosts(apply, address, namespace, shard_size)
 
 
+@tracing.traced()
 def network_fault(service: str, type: str, namespace: str = "default", **kwargs) -> dict:
     """
     Simulate a network fault on a pod
@@ -400,39 +468,49 @@ def network_fault(service: str, type: str, namespace: str = "default", **kwargs)
     return _pod_fault_inject(service=service, type=type, **kwargs)
 
 
-def delete_experiment(type: str, name: str, namespace: str = "default") -> dict:
+@tracing.traced()
+def delete_experiment(name: str, namespace: str = "default", type: str = None) -> dict:
     """
-    Delete a fault injection experiment
+    Delete a fault injection experiment of any Chaos Mesh kind
     Args:
-        type (str): The type of fault to delete.
         name (str): The name of the experiment to delete.
         namespace (str): The namespace where the experiment is located. Default is "default".
+        type (str): The fault type ("POD_KILL", ...), Chaos Mesh kind ("NetworkChaos") or plural
+            ("networkchaos"). Default is to look the experiment up by name.
     Returns:
         dict: The result of the deletion.
     """
-    try:
-        experiment_type = Experiment[type]
-    except KeyError:
-        return {
-            "error": f"Invalid experiment type: {type}. Valid types are: {list(Experiment.__dict__.keys())}"
-        }
+    kind = _EXPERIMENT_PLURALS.get(type, type) if type else None
+    logger.info(f'Deleting experiment {name} ({type or "any kind"}) in namespace: {namespace}')
 
-    logger.info(f'Deleting experiment of type: {type} with name: {name} in namespace: {namespace}')
+    started = time.perf_counter()
+    with tracing.span("delete_experiment", kind=kind or "*"):
+        result = experiments.delete(name, namespace, kind=kind)
+    if result.get("status") == "deleted":
+        journal.record_cleanup(namespace, name, (time.perf_counter() - started) * 1000)
+    return result
 
-    return client.delete_experiment(
-        experiment_type=experiment_type,
-        namespace=namespace,
-        name=name,
-    )
 
+@dataclass
+class ServiceSelector(Selector):
+    """Selector with the set-based expressionSelectors the chaosmesh client's Selector lacks."""
+    expressionSelectors: List[Dict] = None
 
-def _pod_fault_inject(service: str, type: str, namespace: str = "default", **kwargs) -> dict:
-    selector = Selector(
-        labelSelectors={"app": service}, 
-        namespaces=[namespace],
-        pods={}
-    )
-    kwargs['selector'] = selector
+
+def services_of(service) -> list[str]:
+    """The services of a `service` argument (one name or a list of names), deduplicated in order."""
+    names = [service] if isinstance(service, str) else list(service or [])
+    return list(dict.fromkeys(names))
+
+
+def _pod_fault_inject(service, type: str, namespace: str = "default", **kwargs) -> dict:
+    with tracing.span("build_selector"):
+        spec = _selector_spec(service, namespace)
+        if "expressionSelectors" in spec:
+            selector = ServiceSelector(**spec, labelSelectors={}, pods={})
+        else:
+            selector = Selector(**spec, pods={})
+        kwargs['selector'] = selector
 
     return _fault_inject(
         type=type,
@@ -442,6 +520,16 @@ def _pod_fault_inject(service: str, type: str, namespace: str = "default", **kwa
 
 
 def _fault_inject(type: str, namespace: str = "default", **kwargs) -> dict:
+    """
+    Start an experiment through the Chaos Mesh client and append it to the experiment journal.
+    """
+    started_at = time.time()
+    result = _start_experiment(type, namespace, **kwargs)
+    journal.record_result(None, namespace, kwargs, result, started_at, action=type)
+    return result
+
+
+def _start_experiment(type: str, namespace: str = "default", **kwargs) -> dict:
     """
     改进的故障注入函数，包含重试机制和更好的错误处理
     """
@@ -464,17 +552,31 @@ def _fault_inject(type: str, namespace: str = "default", **kwargs) -> dict:
     # 生成唯一的实验名称，确保符合Kubernetes命名规范
     # 将下划线替换为连字符，确保名称符合RFC 1123规范
     experiment_name = f"{type.lower().replace('_', '-')}-{str(uuid.uuid4())[:8]}"
+    plural = _EXPERIMENT_PLURALS.get(type)
+    annotations = None
+
+    # 幂等模式：名称由规格哈希决定，窗口内的重复请求直接返回已有实验，不再写入
+    if idempotency.active() and plural:
+        experiment_name, candidates, digest = idempotency.names(
+            type.lower().replace('_', '-'), type, namespace, kwargs)
+        annotations = idempotency.annotations(digest)
+        with tracing.span("idempotency_lookup", plural=plural):
+            existing = idempotency.find_existing(plural, namespace, candidates)
+        if existing:
+            logger.info(f"Idempotent replay: {type} experiment {existing['metadata']['name']} already exists")
+            return idempotency.mark(existing, replayed=True)
     
     # Workaround for StressChaos: chaos-mesh Python client has a bug where it doesn't include
-    # 'value' and 'containerNames' fields in the spec. Use kubectl to apply YAML directly.
+    # 'value' and 'containerNames' fields in the spec. Create the object from our own manifest.
     if type in ["POD_STRESS_CPU", "POD_STRESS_MEMORY"]:
-        logger.info(f"Using kubectl workaround for {type}")
-        return _apply_stress_chaos_via_kubectl(
+        logger.info(f"Using StressChaos manifest workaround for {type}")
+        return idempotency.mark(_apply_stress_chaos(
             type=type,
             namespace=namespace,
             name=experiment_name,
+            annotations=annotations,
             **kwargs
-        )
+        ), replayed=False)
     
     # 添加重试机制
     max_retries = 3
@@ -482,22 +584,32 @@ def _fault_inject(type: str, namespace: str = "default", **kwargs) -> dict:
         try:
             logger.info(f"Attempt {attempt + 1}/{max_retries} to start experiment in namespace: {namespace}")
             
-            r = client.start_experiment(
-                experiment_type=experiment_type,
-                namespace=namespace,
-                name=experiment_name,
-                **kwargs,
-            )
+            with tracing.span("chaosmesh_client.start_experiment", attempt=attempt + 1):
+                r = client.start_experiment(
+                    experiment_type=experiment_type,
+                    namespace=namespace,
+                    name=experiment_name,
+                    **kwargs,
+                )
 
             logger.info(f'Experiment started successfully: {experiment_name} in namespace: {namespace}')
-            return r
+            if annotations:
+                r = _annotate_experiment(plural, namespace, experiment_name, annotations, r)
+            return idempotency.mark(r, replayed=False)
 
         except Exception as e:
+            # 幂等名称冲突：并发的相同请求（或超时前已成功的上一次尝试）已经创建了实验
+            if isinstance(e, ApiException) and e.status == 409 and idempotency.active() and plural:
+                existing = idempotency.find_existing(plural, namespace, [experiment_name])
+                if existing:
+                    logger.info(f"Idempotent replay: {experiment_name} was created concurrently")
+                    return idempotency.mark(existing, replayed=True)
             logger.error(f"Attempt {attempt + 1} failed: {e}")
             if attempt < max_retries - 1:
                 wait_time = 2 ** attempt  # 指数退避
                 logger.info(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
+                with tracing.span("retry_backoff", seconds=wait_time):
+                    time.sleep(wait_time)
             else:
                 logger.error(f"All {max_retries} attempts failed")
                 return {
@@ -508,65 +620,127 @@ def _fault_inject(type: str, namespace: str = "default", **kwargs) -> dict:
                 }
 
 
+def _annotate_experiment(plural: str, namespace: str, name: str, annotations: dict, created):
+    """
+    Add the idempotency annotations to an experiment the chaosmesh client created (the client
+    takes no metadata). Returns the patched object, or `created` if the patch fails: the
+    annotations only record the key and spec hash, the experiment itself is already running.
+    """
+    try:
+        with tracing.span("annotate_experiment", plural=plural):
+            return cluster_pool.custom_objects().patch_namespaced_custom_object(
+                experiments.CHAOS_GROUP, experiments.CHAOS_VERSION, namespace, plural, name,
+                {"metadata": {"annotations": annotations}}, _request_timeout=30)
+    except ApiException as e:
+        logger.warning(f"Cannot annotate {plural} {namespace}/{name}: {e.status} {e.reason}")
+        return created
+
+
 # ─────────────────────────────────────────────────────────────────────────────
-# Generic kubectl-based CRD applier
+# Generic CRD applier
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _apply_chaos_crd(manifest: dict) -> dict:
-    """Apply any Chaos Mesh CRD manifest via kubectl apply."""
-    import subprocess, tempfile, yaml, os
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        yaml.dump(manifest, f)
-        tmp = f.name
-    try:
-        result = subprocess.run(['kubectl', 'apply', '-f', tmp],
-                                capture_output=True, text=True, check=True)
-        logger.info(f"kubectl apply: {result.stdout.strip()}")
-        return {
-            "apiVersion": manifest.get("apiVersion"),
-            "kind": manifest.get("kind"),
-            "metadata": manifest.get("metadata"),
-            "spec": manifest.get("spec"),
-        }
-    except subprocess.CalledProcessError as e:
-        logger.error(f"kubectl apply failed: {e.stderr}")
-        return {"error": e.stderr, "manifest": manifest}
-    finally:
-        try:
-            os.unlink(tmp)
-        except Exception:
-            pass
-
-
-def _delete_chaos_crd(kind: str, name: str, namespace: str) -> dict:
-    """Delete a Chaos Mesh CRD resource via kubectl."""
-    import subprocess
-    resource_map = {
-        "NetworkChaos": "networkchaos",
-        "DNSChaos": "dnschaos",
-        "HTTPChaos": "httpchaos",
-        "IOChaos": "iochaos",
-        "TimeChaos": "timechaos",
-        "KernelChaos": "kernelchaos",
-    }
-    crd = resource_map.get(kind, kind.lower())
+    """
+    Apply any Chaos Mesh CRD manifest through the API server and append it to the experiment
+    journal. In idempotent mode the name is replaced by the spec-hash name and an existing
+    experiment is returned without applying.
+    """
+    started_at = time.time()
+    result = _apply_manifest(manifest)
+    journal.record_result(manifest["kind"], manifest["metadata"]["namespace"], manifest["spec"], result, started_at)
+    return result
+
+
+def _apply_manifest(manifest: dict) -> dict:
+    if idempotency.active():
+        metadata = manifest["metadata"]
+        plural = manifest["kind"].lower()
+        # _gen_name 的随机后缀换成规格哈希
+        name, candidates, digest = idempotency.names(
+            metadata["name"].rsplit("-", 1)[0], manifest["kind"], metadata["namespace"], manifest["spec"])
+        with tracing.span("idempotency_lookup", plural=plural):
+            existing = idempotency.find_existing(plural, metadata["namespace"], candidates)
+        if existing:
+            logger.info(f"Idempotent replay: {manifest['kind']} {existing['metadata']['name']} already exists")
+            return idempotency.mark(existing, replayed=True)
+        manifest = {**manifest, "metadata": {
+            **metadata, "name": name,
+            "annotations": {**(metadata.get("annotations") or {}), **idempotency.annotations(digest)}}}
+        return idempotency.mark(_create_manifest(manifest), replayed=False)
+    return _create_manifest(manifest)
+
+
+def _create_manifest(manifest: dict) -> dict:
+    """
+    Create the object in-process with the CustomObjectsApi, so the write goes through the
+    shared transport (rate limiter, recorder, tracing). Like kubectl apply, an object that
+    already exists under the name is merge-patched with the manifest's labels, annotations
+    and spec. Returns the object as stored by the API server, or {"error", "manifest"}.
+    """
+    group, version = manifest["apiVersion"].split("/", 1)
+    metadata = manifest["metadata"]
+    # 复数名取自 API 发现表，未发现时按 Chaos Mesh 惯例取小写 kind
+    resolved = experiments.resolve_kind(manifest["kind"])
+    plural = resolved[1] if resolved else manifest["kind"].lower()
+    custom_objects = cluster_pool.custom_objects()
     try:
-        result = subprocess.run(
-            ['kubectl', 'delete', crd, name, '-n', namespace, '--ignore-not-found'],
-            capture_output=True, text=True, check=True)
-        return {"status": "deleted", "kind": kind, "name": name, "namespace": namespace}
-    except subprocess.CalledProcessError as e:
-        return {"error": e.stderr}
+        with tracing.span("create_custom_object", kind=manifest["kind"]):
+            try:
+                r = custom_objects.create_namespaced_custom_object(
+                    group, version, metadata["namespace"], plural, manifest, _request_timeout=30)
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+                r = custom_objects.patch_namespaced_custom_object(
+                    group, version, metadata["namespace"], plural, metadata["name"],
+                    {"metadata": {key: metadata[key] for key in ("labels", "annotations") if key in metadata},
+                     "spec": manifest["spec"]},
+                    _request_timeout=30)
+        logger.info(f"Applied {manifest['kind']} {metadata['namespace']}/{metadata['name']}")
+        return r
+    except ApiException as e:
+        logger.error(f"Creating {manifest['kind']} failed: {e.status} {e.reason}: {e.body}")
+        return {"error": f"{e.status} {e.reason}: {e.body}", "manifest": manifest}
+
+
+# 故障类型对应的 Chaos Mesh 资源（幂等模式按名称查找已有实验时使用）
+_EXPERIMENT_PLURALS = {
+    "POD_FAILURE": "podchaos",
+    "POD_KILL": "podchaos",
+    "CONTAINER_KILL": "podchaos",
+    "POD_STRESS_CPU": "stresschaos",
+    "POD_STRESS_MEMORY": "stresschaos",
+    "NETWORK_PARTITION": "networkchaos",
+    "NETWORK_BANDWIDTH": "networkchaos",
+    "HOST_STRESS_CPU": "physicalmachinechaos",
+    "HOST_STRESS_MEMORY": "physicalmachinechaos",
+    "HOST_DISK_FILL": "physicalmachinechaos",
+    "HOST_READ_PAYLOAD": "physicalmachinechaos",
+    "HOST_WRITE_PAYLOAD": "physicalmachinechaos",
+}
 
 
 def _gen_name(prefix: str) -> str:
     return f"{prefix}-{str(uuid.uuid4())[:8]}"
 
 
-def _selector_spec(service: str, namespace: str) -> dict:
+def _selector_spec(service, namespace: str) -> dict:
+    """
+    Chaos Mesh selector of one service (a list with one name included), or of several
+    services compiled into a single `app in (...)` expression selector, so one experiment
+    object (one write, one controller reconcile) covers all of them.
+    """
+    services = services_of(service)
+    if len(services) == 1:
+        return {
+            "namespaces": [namespace],
+            "labelSelectors": {"app": services[0]},
+        }
     return {
         "namespaces": [namespace],
-        "labelSelectors": {"app": service},
+        # 排序使相同服务集合的规格一致（幂等哈希不受顺序影响）
+        "expressionSelectors": [{"key": "app", "operator": "In", "values": sorted(services)}],
     }
 
 
@@ -574,6 +748,7 @@ def _selector_spec(service: str, namespace: str) -> dict:
 # NetworkChaos – delay / loss / corrupt / duplicate
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def network_delay(service: str, namespace: str = "default",
                   duration: str = "1m", mode: str = "all", value: str = "",
                   latency: str = "100ms", jitter: str = "0ms", correlation: str = "0",
@@ -599,6 +774,7 @@ def network_delay(service: str, namespace: str = "default",
     return _apply_chaos_crd(manifest)
 
 
+@tracing.traced()
 def network_loss(service: str, namespace: str = "default",
                  duration: str = "1m", mode: str = "all", value: str = "",
                  loss: str = "50", correlation: str = "0",
@@ -624,6 +800,7 @@ def network_loss(service: str, namespace: str = "default",
     return _apply_chaos_crd(manifest)
 
 
+@tracing.traced()
 def network_corrupt(service: str, namespace: str = "default",
                     duration: str = "1m", mode: str = "all", value: str = "",
                     corrupt: str = "50", correlation: str = "0",
@@ -649,6 +826,7 @@ def network_corrupt(service: str, namespace: str = "default",
     return _apply_chaos_crd(manifest)
 
 
+@tracing.traced()
 def network_duplicate(service: str, namespace: str = "default",
                       duration: str = "1m", mode: str = "all", value: str = "",
                       duplicate: str = "50", correlation: str = "0",
@@ -678,6 +856,7 @@ def network_duplicate(service: str, namespace: str = "default",
 # DNSChaos
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def dns_chaos(service: str, namespace: str = "default",
               duration: str = "1m", mode: str = "all", value: str = "",
               action: str = "error", scope: str = "outer",
@@ -711,6 +890,7 @@ def dns_chaos(service: str, namespace: str = "default",
 # HTTPChaos
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def http_chaos(service: str, namespace: str = "default",
                duration: str = "1m", mode: str = "all", value: str = "",
                target: str = "Request", port: int = 80,
@@ -763,6 +943,7 @@ def http_chaos(service: str, namespace: str = "default",
 # IOChaos
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def io_chaos(service: str, namespace: str = "default",
              duration: str = "1m", mode: str = "all", value: str = "",
              action: str = "latency",
@@ -806,6 +987,7 @@ def io_chaos(service: str, namespace: str = "default",
 # TimeChaos
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def time_chaos(service: str, namespace: str = "default",
                duration: str = "1m", mode: str = "all", value: str = "",
                time_offset: str = "-5m",
@@ -837,6 +1019,7 @@ def time_chaos(service: str, namespace: str = "default",
 # KernelChaos
 # ─────────────────────────────────────────────────────────────────────────────
 
+@tracing.traced()
 def kernel_chaos(service: str, namespace: str = "default",
                  duration: str = "1m", mode: str = "all", value: str = "",
                  fail_kern_request: dict = None) -> dict:
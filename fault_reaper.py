@@ -0,0 +1,125 @@
+"""
+Removal of expired faults that Chaos Mesh does not clean up itself.
+
+Chaos Mesh experiments end on their own after spec.duration, but resources the server
+writes directly (the Istio VirtualService delay faults) stay until someone removes
+them; if the agent session dies first, the fault stays forever. A Reaper keeps a heap
+of expiry times and one thread that sleeps until the earliest one, so a fault is
+removed at its expiry without polling the cluster.
+
+The expiry itself is stored on the resource (see kube.inject_delay_fault), so the heap
+is only a schedule: on server start rebuild() lists the pending faults from the cluster
+and schedules them again, faults that expired while the server was down are removed at
+once. A removal that fails is retried after `retry_seconds`.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import cluster_pool
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 30.0
+
+
+class Reaper:
+    """
+    Timer heap calling `expire(key, expires_at)` once `expires_at` (epoch seconds) has passed.
+
+    Args:
+        name (str): Thread name, also used in log messages.
+        expire: Called in the cluster context the entry was scheduled in. It must check the
+            resource itself: a fault may have been removed or re-injected with a later expiry.
+        pending: Returns (expires_at, key) pairs of the faults present in the active cluster.
+        retry_seconds (float): Delay before a failed expire call is retried.
+    """
+
+    def __init__(self, name: str, expire, pending, retry_seconds: float = RETRY_SECONDS):
+        self.name = name
+        self._expire = expire
+        self._pending = pending
+        self.retry_seconds = retry_seconds
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.expired = 0
+        self.failed = 0
+
+    def schedule(self, expires_at: float, key, context: str = None) -> None:
+        """Schedule `key` for expiry; context defaults to the cluster of the current call."""
+        context = context if context is not None else cluster_pool.active()
+        with self._condition:
+            heapq.heappush(self._heap, (expires_at, next(self._sequence), context, key))
+            # 新条目可能比当前等待的更早到期，唤醒线程重新计算等待时间
+            self._condition.notify()
+        self._ensure_thread()
+
+    def rebuild(self, context: str = None) -> int:
+        """Schedule every pending fault found in a cluster. Returns how many were found."""
+        with cluster_pool.use(context):
+            entries = list(self._pending())
+        for expires_at, key in entries:
+            self.schedule(expires_at, key, context)
+        logger.info(f"{self.name}: {len(entries)} pending fault(s) in cluster '{context or 'default'}'")
+        return len(entries)
+
+    def start(self, contexts=(None,)) -> None:
+        """Start the thread and rebuild the schedule from `contexts` in the background."""
+        def rebuild():
+            for context in contexts:
+                try:
+                    self.rebuild(context)
+                except Exception as e:
+                    logger.warning(f"{self.name}: cannot list pending faults in '{context or 'default'}': {e}")
+
+        self._ensure_thread()
+        threading.Thread(target=rebuild, name=f"{self.name}-rebuild", daemon=True).start()
+
+    def pending(self) -> list:
+        """(expires_at, context, key) of the scheduled entries, earliest first."""
+        with self._condition:
+            return [(expires_at, context, key) for expires_at, _, context, key in sorted(self._heap)]
+
+    def stats(self) -> dict:
+        with self._condition:
+            next_expiry = self._heap[0][0] if self._heap else None
+        return {
+            "scheduled": len(self._heap),
+            "next_expiry_in_s": round(max(0.0, next_expiry - time.time()), 3) if next_expiry else None,
+            "expired": self.expired,
+            "failed": self.failed,
+        }
+
+    def _ensure_thread(self) -> None:
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _next(self):
+        """Block until the earliest entry is due and pop it."""
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)
+                self._condition.wait(delay)
+
+    def _run(self) -> None:
+        while True:
+            expires_at, _, context, key = self._next()
+            try:
+                with cluster_pool.use(context):
+                    self._expire(key, expires_at)
+                self.expired += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"{self.name}: removing {key} failed, retrying in {self.retry_seconds:g}s: {e}")
+                self.schedule(time.time() + self.retry_seconds, key, context)
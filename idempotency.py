@@ -0,0 +1,168 @@
+"""
+Idempotent experiment creation.
+
+Experiment names normally end in a random suffix, so when an MCP client times out and
+retries pod_kill or network_delay the retry creates a second experiment that stacks
+the same fault on the same pods. Inside idempotency.use() names are derived from a hash
+of the normalized experiment spec (kind, namespace, spec and an optional client key)
+instead:
+
+    with idempotency.use(key="run-42", window=600):
+        fault_inject.network_delay(service="cartservice", latency="200ms")
+
+A request identical to one made less than `window` seconds earlier maps to the same
+name; the injection path finds the existing object and returns it without writing.
+The hash also covers the window slot (time // window), so the same experiment can be
+run again once the window has passed; lookups check the current and the previous slot,
+so a retry that crosses a slot boundary still finds its original object.
+
+CHAOSMESH_MCP_IDEMPOTENT=1 turns the mode on for every call and
+CHAOSMESH_MCP_IDEMPOTENCY_WINDOW sets the default window (600 seconds).
+"""
+import contextvars
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from kubernetes.client.exceptions import ApiException
+
+import cluster_pool
+import experiments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = int(os.environ.get("CHAOSMESH_MCP_IDEMPOTENCY_WINDOW", "600"))
+ENABLED_BY_DEFAULT = os.environ.get("CHAOSMESH_MCP_IDEMPOTENT", "").lower() in ("1", "true", "yes")
+
+# 名称中哈希部分的长度（十六进制字符）
+HASH_LENGTH = 10
+
+# 注解：记录幂等键与规格哈希，便于排查
+KEY_ANNOTATION = "chaosmesh-mcp/idempotency-key"
+HASH_ANNOTATION = "chaosmesh-mcp/spec-hash"
+
+_active = contextvars.ContextVar("chaosmesh_mcp_idempotency", default=None)
+
+
+class Scope:
+    """The idempotency settings of the current call."""
+
+    __slots__ = ("key", "window")
+
+    def __init__(self, key: str, window: int):
+        self.key = key or ""
+        self.window = max(1, int(window))
+
+
+@contextmanager
+def use(enabled: bool = None, key: str = None, window: int = None):
+    """
+    Derive experiment names from the spec hash for the calls made inside the block.
+
+    Args:
+        enabled (bool): Turn the mode on or off; None follows CHAOSMESH_MCP_IDEMPOTENT,
+            and a key always turns it on.
+        key (str): Client key mixed into the hash, e.g. a run or request ID.
+        window (int): Seconds during which an identical request returns the existing experiment.
+    """
+    if enabled is None:
+        enabled = ENABLED_BY_DEFAULT or bool(key)
+    token = _active.set(Scope(key, window or DEFAULT_WINDOW_SECONDS) if enabled else None)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def active() -> Scope:
+    """Settings of the current call, or None when names are random."""
+    return _active.get()
+
+
+def normalize(value):
+    """
+    Canonical form of a spec for hashing: dataclasses become dicts, None and empty
+    values are dropped (Chaos Mesh treats them as unset) and numbers become strings,
+    so "50" and 50 hash alike.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        items = ((str(k), normalize(v)) for k, v in value.items())
+        return {k: v for k, v in sorted(items) if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value)
+
+
+def spec_hash(kind: str, namespace: str, spec: dict, key: str = "") -> str:
+    """Hex digest of the normalized request (without the window slot)."""
+    payload = json.dumps([kind, namespace, normalize(spec), key or ""], separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def names(prefix: str, kind: str, namespace: str, spec: dict, now: float = None) -> tuple:
+    """
+    (name for a new experiment, names to look for, spec hash) in the current scope.
+    The candidates are the names of the current and the previous window slot.
+    """
+    scope = active()
+    digest = spec_hash(kind, namespace, spec, scope.key)
+    slot = int((now if now is not None else time.time()) // scope.window)
+
+    def name(s):
+        return f"{prefix}-{hashlib.sha256(f'{digest}:{s}'.encode()).hexdigest()[:HASH_LENGTH]}"
+
+    return name(slot), (name(slot), name(slot - 1)), digest
+
+
+def find_existing(plural: str, namespace: str, candidates) -> dict:
+    """
+    Return the first candidate object created less than the window ago, or None.
+    Every candidate costs one GET; a missing object is a 404.
+    """
+    scope = active()
+    custom_objects = cluster_pool.custom_objects()
+    now = datetime.now(timezone.utc)
+    for name in candidates:
+        try:
+            obj = custom_objects.get_namespaced_custom_object(
+                experiments.CHAOS_GROUP, experiments.CHAOS_VERSION, namespace, plural, name, _request_timeout=30)
+        except ApiException as e:
+            if e.status == 404:
+                continue
+            raise
+        created = experiments.parse_time((obj.get("metadata") or {}).get("creationTimestamp"))
+        if created is None or (now - created).total_seconds() < scope.window:
+            return obj
+    return None
+
+
+def annotations(digest: str) -> dict:
+    """Annotations recording the key and spec hash on a new experiment."""
+    scope = active()
+    result = {HASH_ANNOTATION: digest[:HASH_LENGTH * 2]}
+    if scope and scope.key:
+        result[KEY_ANNOTATION] = scope.key
+    return result
+
+
+def mark(result: dict, replayed: bool) -> dict:
+    """Add an "idempotency" entry to a successful injection result."""
+    scope = active()
+    if scope is None or not isinstance(result, dict) or "error" in result:
+        return result
+    result = dict(result)
+    result["idempotency"] = {
+        "replayed": replayed,
+        "key": scope.key or None,
+        "window_seconds": scope.window,
+    }
+    return result
@@ -0,0 +1,383 @@
+"""
+In-memory copies of Kubernetes resource lists, kept fresh by a watch.
+
+An Informer lists a resource once (paged, raw JSON, no model deserialisation), then
+follows a watch from the returned resourceVersion and applies each event to its
+store. Objects are reduced by a `transform` function before they are stored, so a
+store holds only the fields its readers need. Readers get a consistent snapshot and a
+`version` counter that only moves when a stored (transformed) object actually changes,
+which makes it cheap to cache anything derived from the store.
+
+Informers are shared per (resource, kubeconfig context):
+
+    services = informer.services()          # bound to cluster_pool.active()
+    for (namespace, name), svc in services.snapshot().items():
+        ...
+
+When a watch cannot be kept open (RBAC without the watch verb, replayed traffic,
+CHAOSMESH_MCP_WATCH=0) the store falls back to relisting on read once it is older than
+CHAOSMESH_MCP_RESYNC_SECONDS.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from kubernetes.client.exceptions import ApiException
+from kubernetes.watch.watch import iter_resp_lines
+
+import cluster_pool
+
+logger = logging.getLogger(__name__)
+
+WATCH_ENABLED = os.environ.get("CHAOSMESH_MCP_WATCH", "1").lower() not in ("0", "false", "no")
+RESYNC_SECONDS = float(os.environ.get("CHAOSMESH_MCP_RESYNC_SECONDS", "30"))
+WATCH_TIMEOUT_SECONDS = 300
+LIST_PAGE_SIZE = 500
+MAX_BACKOFF_SECONDS = 30.0
+
+_informers = {}
+_registry_lock = threading.Lock()
+
+
+def _key(obj: dict) -> tuple:
+    meta = obj.get("metadata") or {}
+    return meta.get("namespace"), meta.get("name")
+
+
+class Informer:
+    """
+    List+watch cache of one resource.
+
+    Args:
+        name (str): Resource name used in logs, e.g. "services".
+        list_func: A kubernetes list method (e.g. CoreV1Api.list_service_for_all_namespaces)
+            or any callable accepting the same keyword arguments.
+        transform: Maps a raw object dict to the value that is stored. Default keeps it as is.
+        context (str): kubeconfig context the informer belongs to (None for the default one).
+    """
+
+    def __init__(self, name: str, list_func, transform=None, context: str = None):
+        self.name = name
+        self.context = context
+        self._list_func = list_func
+        self._transform = transform or (lambda obj: obj)
+        self._items = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._response = None
+        self.resource_version = None
+        self.version = 0
+        self.synced_at = 0.0
+        self.watching = False
+        self.relists = 0
+        self.events = 0
+
+    # ── reading ────────────────────────────────────────────────────────────
+
+    def snapshot(self) -> dict:
+        """Return {(namespace, name): stored value}, listing or relisting first if needed."""
+        self.ensure_fresh()
+        with self._lock:
+            return dict(self._items)
+
+    def get(self, namespace: str, name: str):
+        self.ensure_fresh()
+        with self._lock:
+            return self._items.get((namespace, name))
+
+    def ensure_fresh(self) -> None:
+        """Start the informer on first use; relist when no watch keeps the store current."""
+        if not self.synced_at:
+            with self._lock:
+                if not self.synced_at:
+                    self.relist()
+                    self._start_watch()
+            return
+        if not self.watching and time.time() - self.synced_at > RESYNC_SECONDS:
+            with self._lock:
+                if not self.watching and time.time() - self.synced_at > RESYNC_SECONDS:
+                    self.relist()
+
+    def add_listener(self, listener) -> None:
+        """
+        Register listener(event_type, key, old, new), called under the store lock for
+        every change to a stored value ("ADDED", "MODIFIED" or "DELETED"). Objects
+        already in the store are replayed to the new listener as ADDED.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            for key, value in self._items.items():
+                listener("ADDED", key, None, value)
+
+    def stats(self) -> dict:
+        return {
+            "resource": self.name,
+            "context": self.context,
+            "items": len(self._items),
+            "version": self.version,
+            "resource_version": self.resource_version,
+            "watching": self.watching,
+            "synced_at": self.synced_at,
+            "relists": self.relists,
+            "events": self.events,
+        }
+
+    # ── writing ────────────────────────────────────────────────────────────
+
+    def _apply(self, event_type: str, key: tuple, value) -> None:
+        old = self._items.get(key)
+        if event_type == "DELETED":
+            if key not in self._items:
+                return
+            del self._items[key]
+            value = None
+        else:
+            if old == value and key in self._items:
+                return
+            self._items[key] = value
+            event_type = "MODIFIED" if old is not None else "ADDED"
+        self.version += 1
+        for listener in self._listeners:
+            try:
+                listener(event_type, key, old, value)
+            except Exception as e:
+                logger.error(f"{self.name} informer listener failed: {e}")
+
+    def relist(self) -> None:
+        """Replace the store with a fresh paged list, emitting the differences to listeners."""
+        items, resource_version, _continue = {}, None, None
+        while True:
+            kwargs = {"limit": LIST_PAGE_SIZE, "_preload_content": False}
+            if _continue:
+                kwargs["_continue"] = _continue
+            with cluster_pool.use(self.context):
+                response = self._list_func(**kwargs)
+            page = json.loads(response.data)
+            for obj in page.get("items") or []:
+                items[_key(obj)] = self._transform(obj)
+            meta = page.get("metadata") or {}
+            resource_version = meta.get("resourceVersion") or resource_version
+            _continue = meta.get("continue")
+            if not _continue:
+                break
+
+        with self._lock:
+            for key in [k for k in self._items if k not in items]:
+                self._apply("DELETED", key, None)
+            for key, value in items.items():
+                self._apply("ADDED", key, value)
+            self.resource_version = resource_version
+            self.synced_at = time.time()
+            self.relists += 1
+        logger.debug(f"Listed {len(items)} {self.name} (resourceVersion {resource_version})")
+
+    # ── watching ───────────────────────────────────────────────────────────
+
+    def _start_watch(self) -> None:
+        if not WATCH_ENABLED or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True,
+                                        name=f"informer-{self.name}-{self.context or 'default'}")
+        self._thread.start()
+
+    def _watch_loop(self) -> None:
+        backoff = 1.0
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            received = 0
+            try:
+                received = self._watch_once()
+            except ApiException as e:
+                self.watching = False
+                if e.status == 410:
+                    logger.info(f"{self.name} watch expired, relisting")
+                else:
+                    logger.warning(f"{self.name} watch failed: {e.status} {e.reason}")
+                    self._stopped.wait(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                self._safe_relist()
+                continue
+            except Exception as e:
+                self.watching = False
+                if self._stopped.is_set():
+                    break
+                logger.warning(f"{self.name} watch interrupted: {e}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                self._safe_relist()
+                continue
+
+            # 立即结束且没有事件的 watch（例如回放模式）视为不可用，退避后再试
+            if not received and time.monotonic() - started < 1.0:
+                self.watching = False
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            else:
+                backoff = 1.0
+
+    def _safe_relist(self) -> None:
+        try:
+            self.relist()
+        except Exception as e:
+            logger.warning(f"{self.name} relist failed: {e}")
+
+    def _watch_once(self) -> int:
+        with cluster_pool.use(self.context):
+            response = self._list_func(
+                watch=True,
+                resource_version=self.resource_version,
+                allow_watch_bookmarks=True,
+                timeout_seconds=WATCH_TIMEOUT_SECONDS,
+                _preload_content=False,
+                _request_timeout=(10, WATCH_TIMEOUT_SECONDS + 30),
+            )
+        self._response = response
+        received = 0
+        try:
+            self.watching = True
+            for line in iter_resp_lines(response):
+                if self._stopped.is_set():
+                    break
+                event = json.loads(line)
+                event_type, obj = event.get("type"), event.get("object") or {}
+                if event_type == "ERROR":
+                    raise ApiException(status=obj.get("code"), reason=obj.get("message"))
+                received += 1
+                resource_version = (obj.get("metadata") or {}).get("resourceVersion")
+                with self._lock:
+                    if event_type != "BOOKMARK":
+                        self.events += 1
+                        self._apply(event_type, _key(obj), None if event_type == "DELETED" else self._transform(obj))
+                    if resource_version:
+                        self.resource_version = resource_version
+                    self.synced_at = time.time()
+        finally:
+            self._response = None
+            response.release_conn()
+        return received
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.watching = False
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+def get(name: str, list_func_factory, transform=None) -> Informer:
+    """
+    Return the shared informer for `name` in the active kubeconfig context, creating it
+    with list_func_factory() (called inside that context) on first use.
+    """
+    context = cluster_pool.active()
+    key = (name, context)
+    with _registry_lock:
+        inf = _informers.get(key)
+        if inf is None:
+            inf = Informer(name, list_func_factory(), transform=transform, context=context)
+            _informers[key] = inf
+        return inf
+
+
+def stats() -> list[dict]:
+    with _registry_lock:
+        return [inf.stats() for inf in _informers.values()]
+
+
+def stop_all() -> None:
+    with _registry_lock:
+        for inf in _informers.values():
+            inf.stop()
+        _informers.clear()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Shared stores
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _slim_service(obj: dict) -> dict:
+    meta, spec = obj.get("metadata") or {}, obj.get("spec") or {}
+    return {
+        "name": meta.get("name"),
+        "namespace": meta.get("namespace"),
+        "labels": meta.get("labels") or {},
+        "selector": spec.get("selector") or {},
+        "type": spec.get("type"),
+        "cluster_ip": spec.get("clusterIP"),
+        "ports": [{"port": p.get("port"), "target_port": p.get("targetPort"), "protocol": p.get("protocol")}
+                  for p in spec.get("ports") or []],
+    }
+
+
+def _slim_endpoints(obj: dict) -> dict:
+    ready, not_ready, pods = 0, 0, []
+    for subset in obj.get("subsets") or []:
+        for address in subset.get("addresses") or []:
+            ready += 1
+            target = address.get("targetRef") or {}
+            if target.get("kind") == "Pod":
+                pods.append(target.get("name"))
+        not_ready += len(subset.get("notReadyAddresses") or [])
+    return {"ready": ready, "not_ready": not_ready, "pods": sorted(pods)}
+
+
+def services() -> Informer:
+    """All Services of the active cluster, reduced to name, labels, selector, type, IP and ports."""
+    return get("services", lambda: cluster_pool.core_v1().list_service_for_all_namespaces, _slim_service)
+
+
+def endpoints() -> Informer:
+    """All Endpoints of the active cluster, reduced to ready/not-ready counts and pod names."""
+    return get("endpoints", lambda: cluster_pool.core_v1().list_endpoints_for_all_namespaces, _slim_endpoints)
+
+
+def _slim_pod(obj: dict) -> dict:
+    meta, spec, status = obj.get("metadata") or {}, obj.get("spec") or {}, obj.get("status") or {}
+    return {
+        "labels": meta.get("labels") or {},
+        "phase": status.get("phase"),
+        "node_name": spec.get("nodeName"),
+        "deleting": bool(meta.get("deletionTimestamp")),
+    }
+
+
+def pods() -> Informer:
+    """All Pods of the active cluster, reduced to labels, phase, node and whether they are being deleted."""
+    return get("pods", lambda: cluster_pool.core_v1().list_pod_for_all_namespaces, _slim_pod)
+
+
+def _slim_node(obj: dict) -> dict:
+    meta, spec, status = obj.get("metadata") or {}, obj.get("spec") or {}, obj.get("status") or {}
+    addresses = {a.get("type"): a.get("address") for a in status.get("addresses") or []}
+    ready = any(c.get("type") == "Ready" and c.get("status") == "True" for c in status.get("conditions") or [])
+    return {
+        "labels": meta.get("labels") or {},
+        "internal_ip": addresses.get("InternalIP"),
+        "ready": ready,
+        "unschedulable": bool(spec.get("unschedulable")),
+    }
+
+
+def _slim_physical_machine(obj: dict) -> dict:
+    return {"labels": (obj.get("metadata") or {}).get("labels") or {},
+            "address": (obj.get("spec") or {}).get("address")}
+
+
+def nodes() -> Informer:
+    """All Nodes of the active cluster, reduced to labels, internal IP and readiness."""
+    return get("nodes", lambda: cluster_pool.core_v1().list_node, _slim_node)
+
+
+def physical_machines() -> Informer:
+    """All Chaos Mesh PhysicalMachines (registered chaosd instances) of the active cluster."""
+    return get("physicalmachines", lambda: functools.partial(
+        cluster_pool.custom_objects().list_cluster_custom_object, "chaos-mesh.org", "v1alpha1", "physicalmachines"),
+        _slim_physical_machine)
@@ -0,0 +1,374 @@
+"""
+Persistent experiment history.
+
+Every injection the server makes is appended to a local SQLite journal together with
+its spec, how long the injection took and, later, when and how fast it was removed and
+the load-test results attached to it, so a question like "what did we inject into
+cartservice last week and what did it do to p99" is answered from an index instead of
+the logs:
+
+    journal.record_injection("NetworkChaos", "shop", "net-delay-1a2b", spec, started_at, inject_ms)
+    journal.record_cleanup("shop", "net-delay-1a2b", cleanup_ms, how="delete")
+    journal.aggregate(service="cartservice", since="168h", group_by="kind")
+
+Rows are only ever inserted: removals and load tests go to their own tables, keyed by
+the experiment row. Experiments are indexed by service, kind and time (a multi-service
+experiment has one experiment_services row per service), and aggregate() runs a GROUP BY
+over the matching rows so the history is never loaded into memory.
+
+CHAOSMESH_MCP_JOURNAL sets the database file (default
+~/.local/state/chaosmesh-mcp/journal.sqlite3); "off" disables the journal.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import cluster_pool
+import experiments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".local", "state", "chaosmesh-mcp", "journal.sqlite3")
+
+GROUP_BY = ("kind", "service", "namespace", "cluster", "action", "day")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cluster TEXT NOT NULL,
+    namespace TEXT,
+    name TEXT,
+    kind TEXT,
+    service TEXT,
+    action TEXT,
+    spec TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    injected_at REAL NOT NULL,
+    inject_ms REAL,
+    duration_s REAL
+);
+CREATE INDEX IF NOT EXISTS experiments_service ON experiments (service, injected_at);
+CREATE INDEX IF NOT EXISTS experiments_kind ON experiments (kind, injected_at);
+CREATE INDEX IF NOT EXISTS experiments_time ON experiments (injected_at);
+CREATE INDEX IF NOT EXISTS experiments_name ON experiments (cluster, namespace, name);
+
+CREATE TABLE IF NOT EXISTS experiment_services (
+    experiment_id INTEGER NOT NULL REFERENCES experiments (id),
+    service TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS experiment_services_service ON experiment_services (service, experiment_id);
+
+CREATE TABLE IF NOT EXISTS cleanups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiment_id INTEGER NOT NULL REFERENCES experiments (id),
+    removed_at REAL NOT NULL,
+    cleanup_ms REAL,
+    how TEXT
+);
+CREATE INDEX IF NOT EXISTS cleanups_experiment ON cleanups (experiment_id);
+
+CREATE TABLE IF NOT EXISTS load_tests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiment_id INTEGER NOT NULL REFERENCES experiments (id),
+    recorded_at REAL NOT NULL,
+    p50_ms REAL,
+    p99_ms REAL,
+    baseline_p99_ms REAL,
+    p99_delta_ms REAL,
+    error_rate REAL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS load_tests_experiment ON load_tests (experiment_id);
+"""
+
+_connection = None
+_path = None
+_lock = threading.Lock()
+
+
+def path() -> str:
+    """The database file, or None when the journal is off."""
+    value = os.environ.get("CHAOSMESH_MCP_JOURNAL", DEFAULT_PATH)
+    return None if value.lower() in ("", "0", "off", "false", "no") else os.path.expanduser(value)
+
+
+def _connect():
+    """The shared connection (callers hold _lock), opened and migrated on first use."""
+    global _connection, _path
+    target = path()
+    if target != _path:
+        if _connection is not None:
+            _connection.close()
+        _connection, _path = None, target
+        if target is None:
+            return None
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        connection = sqlite3.connect(target, check_same_thread=False, isolation_level=None)
+        # WAL：读查询不阻塞写入；NORMAL 同步在 WAL 下不会损坏数据库，只可能丢最后几次提交
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        backfill = not connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'experiment_services'").fetchone()
+        connection.executescript(_SCHEMA)
+        if backfill:
+            _backfill_services(connection)
+        connection.row_factory = sqlite3.Row
+        _connection = connection
+    return _connection
+
+
+def _backfill_services(connection) -> None:
+    """Fill experiment_services from the service column of a journal written before it existed."""
+    rows = connection.execute("SELECT id, service FROM experiments WHERE service IS NOT NULL").fetchall()
+    connection.executemany("INSERT INTO experiment_services (experiment_id, service) VALUES (?, ?)",
+                           [(experiment_id, service) for experiment_id, value in rows
+                            for service in _split_services(value)])
+
+
+def _split_services(value) -> list:
+    return [service for service in (value or "").split(",") if service]
+
+
+def _execute(sql: str, parameters=()):
+    """Run one statement; journal failures are logged and never fail the tool call."""
+    with _lock:
+        try:
+            connection = _connect()
+            if connection is None:
+                return None
+            return connection.execute(sql, parameters)
+        except sqlite3.Error as e:
+            logger.warning(f"Experiment journal {_path}: {e}")
+            return None
+
+
+def _query(sql: str, parameters=()) -> list:
+    with _lock:
+        connection = _connect()
+        if connection is None:
+            return []
+        return [dict(row) for row in connection.execute(sql, parameters).fetchall()]
+
+
+def _service(spec: dict):
+    selector = (spec or {}).get("selector") or {}
+    if not isinstance(selector, dict):
+        selector = vars(selector) if hasattr(selector, "__dict__") else {}
+    labels = selector.get("labelSelectors") or {}
+    if labels.get("app"):
+        return labels["app"]
+    # 多服务实验记为逗号分隔的服务列表；按服务过滤走 experiment_services 表
+    for expression in selector.get("expressionSelectors") or []:
+        if expression.get("key") == "app" and expression.get("operator") == "In":
+            return ",".join(expression.get("values") or []) or None
+    return None
+
+
+def _spec_json(spec) -> str:
+    def default(value):
+        return vars(value) if hasattr(value, "__dict__") else str(value)
+    return json.dumps(spec, separators=(",", ":"), sort_keys=True, default=default)
+
+
+def record_injection(kind: str, namespace: str, name: str, spec: dict, started_at: float, inject_ms: float,
+                     service: str = None, action: str = None, status: str = "created", error: str = None) -> None:
+    """
+    Append an injection attempt.
+
+    Args:
+        kind (str): Chaos Mesh kind (or "VirtualService" for Istio faults).
+        namespace (str): Namespace of the experiment.
+        name (str): Name of the experiment (None when it was never created).
+        spec (dict): The experiment spec or the request arguments.
+        started_at (float): Epoch seconds the injection started.
+        inject_ms (float): How long the injection took.
+        service (str): Target service; default is the app label of spec.selector.
+        action (str): Fault type, e.g. "POD_KILL" or "delay"; default is spec.action.
+        status (str): "created", "replayed" (an idempotent request found an existing
+            experiment) or "error".
+        error (str): The error of a failed injection.
+    """
+    spec = spec or {}
+    service = service or _service(spec)
+    row = (cluster_pool.active() or "", namespace, name, kind, service,
+           action or (spec.get("action") if isinstance(spec, dict) else None), _spec_json(spec), status,
+           error, started_at, round(inject_ms, 3),
+           experiments.parse_duration(spec.get("duration")) if isinstance(spec, dict) else None)
+    with _lock:
+        try:
+            connection = _connect()
+            if connection is None:
+                return
+            # 实验行与其服务行在同一事务中写入
+            connection.execute("BEGIN")
+            try:
+                cursor = connection.execute(
+                    "INSERT INTO experiments (cluster, namespace, name, kind, service, action, spec, status, error,"
+                    " injected_at, inject_ms, duration_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                connection.executemany("INSERT INTO experiment_services (experiment_id, service) VALUES (?, ?)",
+                                       [(cursor.lastrowid, s) for s in _split_services(service)])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Experiment journal {_path}: {e}")
+
+
+def record_result(kind: str, namespace: str, spec: dict, result, started_at: float,
+                  service: str = None, action: str = None) -> None:
+    """Append an injection from the result dict an injection function returned."""
+    inject_ms = (time.time() - started_at) * 1000
+    if not isinstance(result, dict) or "error" in result:
+        error = result.get("error") if isinstance(result, dict) else str(result)
+        record_injection(kind, namespace, None, spec, started_at, inject_ms, service, action, "error", str(error))
+        return
+    metadata = result.get("metadata") or {}
+    replayed = (result.get("idempotency") or {}).get("replayed")
+    record_injection(result.get("kind") or kind, metadata.get("namespace") or namespace,
+                     metadata.get("name"), result.get("spec") or spec, started_at, inject_ms,
+                     service, action, "replayed" if replayed else "created")
+
+
+def _experiment_id(namespace: str, name: str):
+    # 幂等重放的记录与原实验同名，优先取真正创建它的那一行
+    rows = _query("SELECT id FROM experiments WHERE cluster = ? AND namespace = ? AND name = ?"
+                  " ORDER BY status = 'created' DESC, injected_at DESC LIMIT 1",
+                  (cluster_pool.active() or "", namespace, name))
+    return rows[0]["id"] if rows else None
+
+
+def record_cleanup(namespace: str, name: str, cleanup_ms: float, how: str = "delete") -> bool:
+    """
+    Append the removal of an experiment ("delete", "expired", "revert"). Returns False
+    when the experiment is not in the journal.
+    """
+    if path() is None:
+        return False
+    experiment_id = _experiment_id(namespace, name)
+    if experiment_id is None:
+        return False
+    _execute("INSERT INTO cleanups (experiment_id, removed_at, cleanup_ms, how) VALUES (?, ?, ?, ?)",
+             (experiment_id, time.time(), round(cleanup_ms, 3), how))
+    return True
+
+
+def record_load_test(namespace: str, name: str, p50_ms: float = None, p99_ms: float = None,
+                     baseline_p99_ms: float = None, error_rate: float = None, summary=None) -> dict:
+    """Attach a load-test summary to an experiment. Raises LookupError when it is not in the journal."""
+    if path() is None:
+        raise LookupError("The experiment journal is off (CHAOSMESH_MCP_JOURNAL=off)")
+    experiment_id = _experiment_id(namespace, name)
+    if experiment_id is None:
+        raise LookupError(f"No experiment named '{name}' in namespace '{namespace}' in the journal")
+    delta = p99_ms - baseline_p99_ms if p99_ms is not None and baseline_p99_ms is not None else None
+    _execute("INSERT INTO load_tests (experiment_id, recorded_at, p50_ms, p99_ms, baseline_p99_ms,"
+             " p99_delta_ms, error_rate, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+             (experiment_id, time.time(), p50_ms, p99_ms, baseline_p99_ms, delta, error_rate,
+              None if summary is None else _spec_json(summary)))
+    return {"experiment": name, "namespace": namespace, "p99_delta_ms": delta}
+
+
+def parse_since(value: str):
+    """Epoch seconds of a Go duration ago ("168h", also "7d"), or of an RFC 3339 timestamp."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("d") and value[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(value[:-1]) * 86400
+    seconds = experiments.parse_duration(value)
+    if seconds is not None:
+        return time.time() - seconds
+    parsed = experiments.parse_time(value)
+    if parsed is None:
+        raise ValueError(f"Cannot parse '{value}' as a duration (e.g. '168h', '7d') or an RFC 3339 time")
+    return parsed.timestamp()
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds") if epoch else None
+
+
+def aggregate(service: str = None, kind: str = None, namespace: str = None, since: str = None,
+              until: str = None, group_by: str = "kind", recent: int = 10) -> dict:
+    """
+    Aggregate the journal over the experiments matching the filters.
+
+    Returns per group: experiment count, errors, idempotent replays, injection latency
+    (avg / max ms), removals and their latency, load tests and their p99 deltas, first and
+    last injection; plus the `recent` newest matching experiments. Raises ValueError for
+    an unknown group_by or an unparseable time.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"Unknown group_by '{group_by}'; valid values are {list(GROUP_BY)}")
+    conditions, parameters = [], []
+    if service:
+        conditions.append("e.id IN (SELECT experiment_id FROM experiment_services WHERE service = ?)")
+        parameters.append(service)
+    for column, value in (("kind", kind), ("namespace", namespace)):
+        if value:
+            conditions.append(f"e.{column} = ?")
+            parameters.append(value)
+    if since:
+        conditions.append("e.injected_at >= ?")
+        parameters.append(parse_since(since))
+    if until:
+        conditions.append("e.injected_at < ?")
+        parameters.append(parse_since(until))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group = "date(e.injected_at, 'unixepoch')" if group_by == "day" else f"e.{group_by}"
+
+    # 清理和压测各自先按实验聚合，避免一对多连接把实验行重复计数
+    groups = _query(f"""
+        SELECT {group} AS grp,
+               COUNT(*) AS experiments,
+               SUM(e.status = 'error') AS errors,
+               SUM(e.status = 'replayed') AS replayed,
+               ROUND(AVG(CASE WHEN e.status = 'created' THEN e.inject_ms END), 3) AS avg_inject_ms,
+               ROUND(MAX(CASE WHEN e.status = 'created' THEN e.inject_ms END), 3) AS max_inject_ms,
+               SUM(c.experiment_id IS NOT NULL) AS removed,
+               ROUND(AVG(c.cleanup_ms), 3) AS avg_cleanup_ms,
+               COALESCE(SUM(l.load_tests), 0) AS load_tests,
+               ROUND(AVG(l.p99_delta_ms), 3) AS avg_p99_delta_ms,
+               ROUND(MAX(l.max_p99_delta_ms), 3) AS max_p99_delta_ms,
+               MIN(e.injected_at) AS first_injected_at,
+               MAX(e.injected_at) AS last_injected_at
+        FROM experiments e
+        LEFT JOIN (SELECT experiment_id, MIN(cleanup_ms) AS cleanup_ms FROM cleanups GROUP BY experiment_id) c
+               ON c.experiment_id = e.id
+        LEFT JOIN (SELECT experiment_id, COUNT(*) AS load_tests, AVG(p99_delta_ms) AS p99_delta_ms,
+                          MAX(p99_delta_ms) AS max_p99_delta_ms
+                   FROM load_tests GROUP BY experiment_id) l
+               ON l.experiment_id = e.id
+        {where}
+        GROUP BY grp ORDER BY experiments DESC, grp""", parameters)
+    groups = [{group_by: row.pop("grp"), **row} for row in groups]
+    for row in groups:
+        row["first_injected_at"] = _iso(row["first_injected_at"])
+        row["last_injected_at"] = _iso(row["last_injected_at"])
+
+    latest = _query(f"""
+        SELECT e.name, e.kind, e.namespace, e.service, e.action, e.status, e.injected_at, e.inject_ms,
+               (SELECT MIN(removed_at) FROM cleanups WHERE experiment_id = e.id) AS removed_at,
+               (SELECT p99_delta_ms FROM load_tests WHERE experiment_id = e.id
+                ORDER BY recorded_at DESC LIMIT 1) AS p99_delta_ms
+        FROM experiments e {where}
+        ORDER BY e.injected_at DESC LIMIT ?""", [*parameters, max(0, recent)])
+    for row in latest:
+        row["injected_at"] = _iso(row["injected_at"])
+        row["removed_at"] = _iso(row["removed_at"])
+
+    return {
+        "filters": {k: v for k, v in {"service": service, "kind": kind, "namespace": namespace,
+                                      "since": since, "until": until}.items() if v},
+        "group_by": group_by,
+        "groups": groups,
+        "total_experiments": sum(row["experiments"] for row in groups),
+        "recent": latest,
+        "journal": _path,
+    }
@@ -1,12 +1,46 @@
 from kubernetes import client, config, utils
 import requests
 import os
+import re
 import logging
+import contextvars
+import heapq
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import cluster_pool
+import experiments
+import fault_reaper
+import journal
+import log_templates
+import pod_records
+import ratelimit
+import recorder
+import tracing
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 按环境变量开启 API 限流（最外层中间件）和流量录制/回放，必须在初始化客户端之前
+ratelimit.install_from_env()
+recorder.install_from_env()
+
+# search_service_logs：并发读取的 Pod 数、每个 Pod 默认最多读取的字节数和读取块大小
+LOG_SEARCH_WORKERS = 8
+LOG_SEARCH_MAX_BYTES = 1024 * 1024
+LOG_SEARCH_CHUNK_BYTES = 16 * 1024
+# 未指定 tail_lines / since_seconds 时只搜索最近的这些行（故障期间的日志在末尾，而读取从窗口开头开始）
+LOG_SEARCH_TAIL_LINES = 4000
+
+# get_experiment_logs：实验窗口前后默认多取的秒数
+EXPERIMENT_LOG_PADDING_SECONDS = 30
+
+# 日志模板摘要默认返回的模板数
+LOG_SUMMARY_TEMPLATES = 50
+
 def initialize_k8s_client():
     """
     初始化Kubernetes客户端，优先支持EKS环境
@@ -55,6 +89,7 @@ else:
     api = None
 
 
+@tracing.traced()
 def get_pod_logs(pod_name: str, namespace: str, container_name: str, tail_lines: int = 20) -> str:
     """
     Retrieve logs for a specific pod and container.
@@ -62,7 +97,7 @@ def get_pod_logs(pod_name: str, namespace: str, container_name: str, tail_lines:
     """
     try:
         # 添加超时设置
-        logs = v1.read_namespaced_pod_log(
+        logs = cluster_pool.core_v1(v1).read_namespaced_pod_log(
             name=pod_name, 
             namespace=namespace, 
             container=container_name, 
@@ -84,6 +119,7 @@ def get_pod_logs(pod_name: str, namespace: str, container_name: str, tail_lines:
         return f"Error: {str(e)}"
 
 
+@tracing.traced()
 def get_pods_by_service(service_name: str, namespace: str) -> list[str]:
     """
     Retrieve all pods for a specific service in a namespace.
@@ -91,22 +127,22 @@ def get_pods_by_service(service_name: str, namespace: str) -> list[str]:
     """
     try:
         # 更灵活的标签选择器
-        label_selectors = [
-            f"app={service_name}",
-            f"app.kubernetes.io/name={service_name}",
-            f"k8s-app={service_name}"
-        ]
+        label_selectors = [selector.format(service_name) for selector in pod_records.SERVICE_SELECTORS]
         
+        core_v1 = cluster_pool.core_v1(v1)
         pod_names = []
         for selector in label_selectors:
             try:
-                pods = v1.list_namespaced_pod(
-                    namespace=namespace, 
-                    label_selector=selector,
-                    _request_timeout=30
-                )
-                if pods.items:
-                    pod_names.extend([pod.metadata.name for pod in pods.items])
+                with tracing.span("list_pods", selector=selector):
+                    pods = pod_records.list_pods(
+                        namespace,
+                        label_selector=selector,
+                        metadata_only=True,
+                        core_v1=core_v1,
+                        request_timeout=30
+                    )
+                if pods:
+                    pod_names.extend([pod.name for pod in pods])
                     break  # 找到匹配的pods就停止
             except Exception as e:
                 logger.debug(f"Label selector {selector} failed: {e}")
@@ -128,6 +164,7 @@ def get_pods_by_service(service_name: str, namespace: str) -> list[str]:
         return []
 
 
+@tracing.traced()
 def get_service_pod_logs(service_name: str, namespace: str, container_name: str, type: str = "all", tail_lines: int = 20) -> dict:
     """
     Retrieve logs for all pods of a specific service in a namespace.
@@ -166,8 +203,384 @@ def get_service_pod_logs(service_name: str, namespace: str, container_name: str,
     return pod_logs
 
 
+def _line_matcher(pattern: str, regex: bool = False, ignore_case: bool = False):
+    """Compile a pattern into a predicate over log lines. Raises re.error for a bad regex."""
+    if regex:
+        compiled = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        return lambda line: compiled.search(line) is not None
+    if ignore_case:
+        needle = pattern.lower()
+        return lambda line: needle in line.lower()
+    return lambda line: pattern in line
+
+
+def search_pod_log(pod_name: str, namespace: str, container_name: str, matches, context_lines: int = 0,
+                   max_matches: int = 5, max_bytes: int = LOG_SEARCH_MAX_BYTES, tail_lines: int = None,
+                   since_seconds: int = None) -> dict:
+    """
+    Stream one pod's log and collect the lines for which matches(line) is true.
+
+    Without tail_lines or since_seconds only the last LOG_SEARCH_TAIL_LINES lines are
+    searched, so a large log is read from its recent end rather than its oldest bytes.
+    Reading stops as soon as max_matches lines matched (after their trailing context)
+    or max_bytes were read; the connection is then closed instead of drained.
+    """
+    kwargs = {"limit_bytes": max_bytes, "_preload_content": False, "_request_timeout": 30}
+    if container_name:
+        kwargs["container"] = container_name
+    if not tail_lines and not since_seconds:
+        tail_lines = LOG_SEARCH_TAIL_LINES
+    if tail_lines:
+        kwargs["tail_lines"] = tail_lines
+    if since_seconds:
+        kwargs["since_seconds"] = since_seconds
+
+    found, pending_after = [], []  # pending_after：仍在收集后续上下文的匹配
+    before = deque(maxlen=context_lines) if context_lines else None
+    state = {"line_no": 0}
+
+    def feed(line: str) -> bool:
+        """Process one line; True once max_matches matched and their context is complete."""
+        state["line_no"] += 1
+        for match in pending_after:
+            match["after"].append(line)
+        pending_after[:] = [m for m in pending_after if len(m["after"]) < context_lines]
+        if len(found) < max_matches and matches(line):
+            match = {"line_no": state["line_no"], "line": line}
+            if context_lines:
+                match["before"] = list(before)
+                match["after"] = []
+                pending_after.append(match)
+            found.append(match)
+        if before is not None:
+            before.append(line)
+        return len(found) >= max_matches and not pending_after
+
+    bytes_read, stopped, buffer = 0, None, b""
+    response = cluster_pool.core_v1(v1).read_namespaced_pod_log(name=pod_name, namespace=namespace, **kwargs)
+    try:
+        for chunk in response.stream(LOG_SEARCH_CHUNK_BYTES):
+            bytes_read += len(chunk)
+            lines = (buffer + chunk).split(b"\n")
+            buffer = lines.pop()
+            for raw in lines:
+                if feed(raw.decode("utf-8", errors="replace")):
+                    stopped = "max_matches"
+                    break
+            if not stopped and bytes_read >= max_bytes:
+                stopped = "max_bytes"
+            if stopped:
+                # 提前结束：关闭连接而不是读完剩余日志
+                response.close()
+                break
+        if not stopped and buffer:
+            feed(buffer.decode("utf-8", errors="replace"))
+    finally:
+        response.release_conn()
+    return {"match_count": len(found), "matches": found, "lines_scanned": state["line_no"],
+            "bytes_read": bytes_read, "stopped": stopped}
+
+
+@tracing.traced()
+def search_service_logs(service_name: str, namespace: str, pattern: str, container_name: str = None,
+                        regex: bool = False, ignore_case: bool = False, context_lines: int = 0,
+                        max_matches_per_pod: int = 5, max_bytes_per_pod: int = LOG_SEARCH_MAX_BYTES,
+                        tail_lines: int = None, since_seconds: int = None) -> dict:
+    """
+    Search the logs of every pod of a service concurrently.
+
+    Returns:
+        dict: Per-pod matches with context and counts, the pods that matched and totals.
+    """
+    try:
+        matches = _line_matcher(pattern, regex=regex, ignore_case=ignore_case)
+    except re.error as e:
+        return {"error": f"Invalid regular expression '{pattern}': {e}"}
+
+    pod_names = get_pods_by_service(service_name, namespace)
+    if not pod_names:
+        return {"error": f"No pods found for service '{service_name}' in namespace '{namespace}'."}
+
+    def search(pod_name):
+        with tracing.span("search_pod_log", pod=pod_name):
+            try:
+                return pod_name, search_pod_log(pod_name, namespace, container_name, matches,
+                                                context_lines=context_lines, max_matches=max_matches_per_pod,
+                                                max_bytes=max_bytes_per_pod, tail_lines=tail_lines,
+                                                since_seconds=since_seconds)
+            except client.exceptions.ApiException as e:
+                return pod_name, {"error": f"{e.status} {e.reason}"}
+            except Exception as e:
+                return pod_name, {"error": str(e)}
+
+    pods = {}
+    with ThreadPoolExecutor(max_workers=min(LOG_SEARCH_WORKERS, len(pod_names))) as executor:
+        # 每个线程沿用调用方的上下文（集群、tracing）
+        futures = [executor.submit(contextvars.copy_context().run, search, name) for name in sorted(pod_names)]
+        for future in futures:
+            pod_name, result = future.result()
+            pods[pod_name] = result
+
+    matched = [name for name, r in pods.items() if r.get("match_count")]
+    return {
+        "service": service_name,
+        "namespace": namespace,
+        "pattern": pattern,
+        "pods": pods,
+        "matched_pods": matched,
+        "total_matches": sum(r.get("match_count", 0) for r in pods.values()),
+        "bytes_read": sum(r.get("bytes_read", 0) for r in pods.values()),
+    }
+
+
+def read_log_window(pod_name: str, namespace: str, container_name: str, since: datetime, until: datetime,
+                    previous: bool = False, max_lines: int = 500, max_bytes: int = None) -> dict:
+    """
+    Stream one container's log from `since` and keep the lines stamped up to `until`.
+
+    The kubelet is asked for timestamps and for the log since `since` (rounded to whole
+    seconds, the finest filter the log endpoint has). Reading stops at the first line past
+    `until`, after max_lines lines or after max_bytes bytes of kept lines (None: no limit),
+    and the connection is closed instead of drained.
+
+    Returns:
+        dict: "lines" as (timestamp, text) pairs in log order, and "truncated".
+    """
+    since_seconds = max(1, math.ceil((datetime.now(timezone.utc) - since).total_seconds()))
+    kwargs = {"since_seconds": since_seconds, "timestamps": True, "_preload_content": False,
+              "_request_timeout": 30}
+    if container_name:
+        kwargs["container"] = container_name
+    if previous:
+        kwargs["previous"] = True
+
+    lines, truncated, done, buffer, size = [], False, False, b"", 0
+    last_ts = since
+
+    def full(raw: bytes) -> bool:
+        return ((max_lines is not None and len(lines) >= max_lines)
+                or (max_bytes is not None and size + len(raw) + 1 > max_bytes))
+
+    response = cluster_pool.core_v1(v1).read_namespaced_pod_log(name=pod_name, namespace=namespace, **kwargs)
+    try:
+        for chunk in response.stream(LOG_SEARCH_CHUNK_BYTES):
+            parts = (buffer + chunk).split(b"\n")
+            buffer = parts.pop()
+            for raw in parts:
+                stamp, _, text = raw.decode("utf-8", errors="replace").partition(" ")
+                # 没有可解析时间戳的行沿用上一行的时间
+                ts = experiments.parse_time(stamp) or last_ts
+                if ts < since:
+                    continue
+                if ts > until:
+                    done = True
+                    break
+                if full(raw):
+                    truncated = done = True
+                    break
+                lines.append((ts, text))
+                size += len(raw) + 1
+                last_ts = ts
+            if done:
+                response.close()
+                break
+        if not done and buffer:
+            stamp, _, text = buffer.decode("utf-8", errors="replace").partition(" ")
+            ts = experiments.parse_time(stamp) or last_ts
+            if since <= ts <= until:
+                if not full(buffer):
+                    lines.append((ts, text))
+                else:
+                    truncated = True
+    finally:
+        response.release_conn()
+    return {"lines": lines, "truncated": truncated}
+
+
+@tracing.traced()
+def get_experiment_logs(experiment: str, namespace: str = "default", container_name: str = None,
+                        padding_seconds: int = EXPERIMENT_LOG_PADDING_SECONDS, include_previous: bool = True,
+                        max_lines: int = 500, summarize: bool = False,
+                        max_templates: int = LOG_SUMMARY_TEMPLATES) -> dict:
+    """
+    Retrieve the logs of every pod an experiment targeted, bounded to the experiment's
+    active window (plus padding on both sides), merged into one chronological stream.
+
+    Pods are read concurrently. For containers that restarted (e.g. after a container
+    kill) the log of the previous instance is read as well and marked "previous": true.
+
+    Args:
+        experiment (str): Name of the Chaos Mesh experiment.
+        namespace (str): Namespace of the experiment.
+        container_name (str): Container to read. Default reads every container of each pod.
+        padding_seconds (int): Seconds of log to include before the start and after the end.
+        include_previous (bool): Also read logs of restarted containers' previous instances.
+        max_lines (int): Maximum number of merged lines to return (the earliest are kept).
+            Not applied when summarizing.
+        summarize (bool): Return log templates (see log_templates) instead of the lines,
+            mined from each log's whole window up to LOG_SEARCH_MAX_BYTES.
+        max_templates (int): Maximum number of templates when summarizing.
+
+    Returns:
+        dict: Experiment window, per-pod line counts and errors, and the merged lines
+            or their templates.
+    """
+    obj = experiments.find(experiment, namespace)
+    if obj is None:
+        return {
+            "error": f"Experiment '{experiment}' not found in namespace '{namespace}'",
+            "suggestion": "Check the experiment name and namespace, e.g., with the name returned by the injection tool"
+        }
+    start, end = experiments.window(obj)
+    padding = timedelta(seconds=max(0, padding_seconds))
+    since, until = start - padding, end + padding
+
+    core_v1 = cluster_pool.core_v1(v1)
+    targets = experiments.target_pods(obj, core_v1=core_v1)
+    pods_by_namespace = {}
+    for ns in sorted({ns for ns, _ in targets}):
+        pods_by_namespace[ns] = {pod.name: pod for pod in pod_records.list_pods(ns, core_v1=core_v1,
+                                                                                request_timeout=30)}
+
+    pods, streams = {}, []
+    for ns, name in targets:
+        key = f"{ns}/{name}"
+        record = pods_by_namespace[ns].get(name)
+        if record is None:
+            # 被 pod-kill 删除的 Pod 日志已随 Pod 一起消失
+            pods[key] = {"error": "Pod no longer exists; its logs are gone"}
+            continue
+        pods[key] = {"lines": 0}
+        containers = [container_name] if container_name else sorted(record.restarts or {}) or [None]
+        for container in containers:
+            streams.append((key, ns, name, container, False))
+            if include_previous and (record.restarts or {}).get(container):
+                streams.append((key, ns, name, container, True))
+
+    # 摘要模式把整个窗口（按字节封顶）交给模板挖掘，max_lines 只限制原始行输出
+    window_limits = {"max_lines": None, "max_bytes": LOG_SEARCH_MAX_BYTES} if summarize else {"max_lines": max_lines}
+
+    def read(stream):
+        key, ns, name, container, previous = stream
+        with tracing.span("read_log_window", pod=key, previous=previous):
+            try:
+                return stream, read_log_window(name, ns, container, since, until,
+                                               previous=previous, **window_limits)
+            except client.exceptions.ApiException as e:
+                return stream, {"error": f"{e.status} {e.reason}"}
+            except Exception as e:
+                return stream, {"error": str(e)}
+
+    results = []
+    if streams:
+        with ThreadPoolExecutor(max_workers=min(LOG_SEARCH_WORKERS, len(streams))) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, read, s) for s in streams]
+            results = [future.result() for future in futures]
+
+    truncated, sources = False, []
+    for (key, _, _, container, previous), result in results:
+        if "error" in result:
+            label = f"{container} (previous)" if previous else container
+            pods[key].setdefault("errors", {})[label or "log"] = result["error"]
+            continue
+        truncated = truncated or result["truncated"]
+        pods[key]["lines"] += len(result["lines"])
+        sources.append([(ts, key, container, previous, text) for ts, text in result["lines"]])
+
+    lines, miner = [], log_templates.TemplateMiner() if summarize else None
+    for ts, key, container, previous, text in heapq.merge(*sources, key=lambda entry: entry[0]):
+        if not miner and len(lines) >= max_lines:
+            truncated = True
+            break
+        if miner:
+            miner.add(text, ts=ts, source=key)
+            continue
+        line = {"ts": ts.isoformat(), "pod": key, "container": container, "line": text}
+        if previous:
+            line["previous"] = True
+        lines.append(line)
+
+    result = {
+        "experiment": {
+            "name": experiment,
+            "namespace": namespace,
+            "kind": obj.get("kind"),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "window": {"since": since.isoformat(), "until": until.isoformat()},
+        },
+        "pods": pods,
+        "lines": lines,
+        "total_lines": len(lines),
+        "truncated": truncated,
+    }
+    if miner:
+        del result["lines"]
+        result.update(miner.summary(max_templates))
+    return result
+
+
+@tracing.traced()
+def summarize_service_logs(service_name: str, namespace: str, container_name: str = None, tail_lines: int = 1000,
+                           max_templates: int = LOG_SUMMARY_TEMPLATES) -> dict:
+    """
+    Read the last tail_lines lines of every pod of a service concurrently and fold them
+    into log templates with counts, sample variable values, first/last-seen times and
+    per-pod counts.
+
+    Returns:
+        dict: total_lines, template_count, templates (largest first) and per-pod line counts.
+    """
+    pod_names = get_pods_by_service(service_name, namespace)
+    if not pod_names:
+        return {"error": f"No pods found for service '{service_name}' in namespace '{namespace}'."}
+
+    def read(pod_name):
+        kwargs = {"timestamps": True, "_preload_content": False, "_request_timeout": 30}
+        if container_name:
+            kwargs["container"] = container_name
+        if tail_lines:
+            kwargs["tail_lines"] = tail_lines
+        with tracing.span("read_pod_log", pod=pod_name):
+            try:
+                response = cluster_pool.core_v1(v1).read_namespaced_pod_log(
+                    name=pod_name, namespace=namespace, **kwargs)
+                try:
+                    text = response.data.decode("utf-8", errors="replace")
+                finally:
+                    response.release_conn()
+            except client.exceptions.ApiException as e:
+                return pod_name, {"error": f"{e.status} {e.reason}"}
+            except Exception as e:
+                return pod_name, {"error": str(e)}
+            return pod_name, [line.partition(" ") for line in text.splitlines()]
+
+    # 并发读取，在当前线程中串行聚类（挖掘是纯 CPU 计算，多线程只会争抢 GIL）
+    miner, pods = log_templates.TemplateMiner(), {}
+    with ThreadPoolExecutor(max_workers=min(LOG_SEARCH_WORKERS, len(pod_names))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, read, name) for name in sorted(pod_names)]
+        with tracing.span("mine_templates"):
+            for future in futures:
+                pod_name, lines = future.result()
+                if isinstance(lines, dict):
+                    pods[pod_name] = lines
+                    continue
+                # kubelet 的时间戳是定长 RFC3339Nano，按字符串比较即按时间先后
+                for stamp, _, text in lines:
+                    miner.add(text, ts=stamp, source=pod_name)
+                pods[pod_name] = {"lines": len(lines)}
+
+    return {
+        "service": service_name,
+        "namespace": namespace,
+        "pods": pods,
+        **miner.summary(max_templates),
+    }
+
+
+@tracing.traced()
 def load_generate(rate: int) -> list[str]:
-    url = "http://localhost:80"
+    url = os.environ.get("LOAD_GENERATE_URL", "http://localhost:80")
     results = []
 
     def send_request():
@@ -186,62 +599,419 @@ def load_generate(rate: int) -> list[str]:
     return results
 
 
-def inject_delay_fault(service_name: str, delay_seconds: int, namespace: str = "default"):
+# Istio 故障：标签用于在重启后列出故障（"delay" 表示自建的 VirtualService，"patch" 表示修改了应用已有的
+# VirtualService），注解记录目标服务、持续时间和到期时间
+ISTIO_GROUP = "networking.istio.io"
+ISTIO_VERSION = "v1"
+ISTIO_PLURAL = "virtualservices"
+ISTIO_FAULT_LABEL = "chaosmesh-mcp/fault"
+ISTIO_SERVICE_ANNOTATION = "chaosmesh-mcp/service"
+ISTIO_DURATION_ANNOTATION = "chaosmesh-mcp/duration"
+ISTIO_EXPIRES_ANNOTATION = "chaosmesh-mcp/expires-at"
+# 注入到已有 VirtualService 中的故障路由名前缀，撤销时按它删除
+ISTIO_FAULT_ROUTE_PREFIX = "chaosmesh-mcp-fault"
+ISTIO_PATCH_RETRIES = 3
+
+
+def _delay_fault_expiry(obj: dict):
+    """Expiry of a delay fault VirtualService as an aware datetime, or None if it has none."""
+    annotations = (obj.get("metadata") or {}).get("annotations") or {}
+    return experiments.parse_time(annotations.get(ISTIO_EXPIRES_ANNOTATION))
+
+
+def _pending_delay_faults():
+    """(expires_at, (namespace, name)) of every delay fault with an expiry in the active cluster."""
+    objects = cluster_pool.custom_objects(api).list_cluster_custom_object(
+        group=ISTIO_GROUP, version=ISTIO_VERSION, plural=ISTIO_PLURAL,
+        label_selector=ISTIO_FAULT_LABEL, _request_timeout=30)
+    for obj in objects.get("items") or []:
+        expires_at = _delay_fault_expiry(obj)
+        if expires_at is not None:
+            meta = obj["metadata"]
+            yield expires_at.timestamp(), (meta["namespace"], meta["name"])
+
+
+def _get_virtual_service(namespace: str, name: str):
+    try:
+        return cluster_pool.custom_objects(api).get_namespaced_custom_object(
+            group=ISTIO_GROUP, version=ISTIO_VERSION, namespace=namespace,
+            plural=ISTIO_PLURAL, name=name, _request_timeout=30)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def _delete_virtual_service(namespace: str, name: str) -> bool:
+    try:
+        cluster_pool.custom_objects(api).delete_namespaced_custom_object(
+            group=ISTIO_GROUP, version=ISTIO_VERSION, namespace=namespace,
+            plural=ISTIO_PLURAL, name=name, _request_timeout=30)
+        return True
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return False
+        raise
+
+
+def _json_patch_virtual_service(namespace: str, name: str, operations: list) -> dict:
+    """Apply an RFC 6902 JSON patch (CustomObjectsApi only sends merge patches)."""
+    api_client = cluster_pool.custom_objects(api).api_client
+    return api_client.call_api(
+        "/apis/{group}/{version}/namespaces/{namespace}/{plural}/{name}", "PATCH",
+        path_params={"group": ISTIO_GROUP, "version": ISTIO_VERSION, "namespace": namespace,
+                     "plural": ISTIO_PLURAL, "name": name},
+        header_params={"Content-Type": "application/json-patch+json", "Accept": "application/json"},
+        body=operations,
+        auth_settings=["BearerToken"],
+        response_type="object",
+        _return_http_data_only=True,
+        _request_timeout=30,
+    )
+
+
+def _pointer(key: str) -> str:
+    """Escape a key for a JSON pointer (RFC 6901)."""
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _istio_fault(delay_seconds, percentage, abort_http_status, abort_percentage) -> dict:
+    fault = {}
+    if delay_seconds:
+        fault["delay"] = {"fixedDelay": f"{delay_seconds}s", "percentage": {"value": float(percentage)}}
+    if abort_http_status:
+        fault["abort"] = {"httpStatus": int(abort_http_status), "percentage": {"value": float(abort_percentage)}}
+    return fault
+
+
+def _istio_match(headers: dict = None, path: str = None) -> dict:
+    """
+    One HTTPMatchRequest. Header values are exact matches unless prefixed with "regex:";
+    a path ending in "*" is a prefix match.
+    """
+    match = {}
+    if headers:
+        match["headers"] = {
+            name: {"regex": value[len("regex:"):]} if value.startswith("regex:") else {"exact": value}
+            for name, value in headers.items()
+        }
+    if path:
+        match["uri"] = {"prefix": path[:-1]} if path.endswith("*") else {"exact": path}
+    return match
+
+
+def _service_hosts(service_name: str, namespace: str) -> set:
+    return {service_name, f"{service_name}.{namespace}", f"{service_name}.{namespace}.svc",
+            f"{service_name}.{namespace}.svc.cluster.local"}
+
+
+def _application_virtual_services(service_name: str, namespace: str) -> list:
+    """The application's own VirtualServices routing mesh traffic to a service."""
+    hosts = _service_hosts(service_name, namespace)
+    objects = cluster_pool.custom_objects(api).list_namespaced_custom_object(
+        group=ISTIO_GROUP, version=ISTIO_VERSION, namespace=namespace, plural=ISTIO_PLURAL, _request_timeout=30)
+    result = []
+    for obj in objects.get("items") or []:
+        spec = obj.get("spec") or {}
+        labels = (obj.get("metadata") or {}).get("labels") or {}
+        gateways = spec.get("gateways") or ["mesh"]
+        if labels.get(ISTIO_FAULT_LABEL) == "delay" or "mesh" not in gateways:
+            continue
+        if hosts & set(spec.get("hosts") or []) and spec.get("http"):
+            result.append(obj)
+    return sorted(result, key=lambda o: o["metadata"]["name"])
+
+
+def _is_fault_route(route: dict) -> bool:
+    return str(route.get("name") or "").startswith(ISTIO_FAULT_ROUTE_PREFIX)
+
+
+def _narrow_match(existing: dict, match: dict) -> dict:
+    """A route's match block further restricted by the fault's headers / path (the fault's path wins)."""
+    narrowed = {**existing, **{k: v for k, v in match.items() if k != "headers"}}
+    if "headers" in match:
+        narrowed["headers"] = {**(existing.get("headers") or {}), **match["headers"]}
+    return narrowed
+
+
+def _inject_operations(obj: dict, match: dict, fault: dict, annotations: dict, service_name: str) -> list:
+    """
+    JSON patch inserting a faulted copy in front of every HTTP route of a VirtualService.
+    Each copy keeps the route's destinations and matches (narrowed by `match`), so the
+    application's routing is unchanged apart from the fault; reverting removes the copies.
+    """
+    meta = obj["metadata"]
+    operations = [{"op": "test", "path": "/metadata/resourceVersion", "value": meta["resourceVersion"]}]
+    for i, route in enumerate(obj["spec"]["http"]):
+        copy = {k: v for k, v in route.items() if k not in ("name", "match", "fault")}
+        copy["name"] = f"{ISTIO_FAULT_ROUTE_PREFIX}-{i}"
+        if match or route.get("match"):
+            copy["match"] = [_narrow_match(m, match) for m in route.get("match") or [{}]]
+        copy["fault"] = fault
+        # 第 i 条原始路由前面已经插入了 i 条副本
+        operations.append({"op": "add", "path": f"/spec/http/{2 * i}", "value": copy})
+
+    annotations = {**annotations, ISTIO_SERVICE_ANNOTATION: service_name}
+    if meta.get("annotations"):
+        operations += [{"op": "add", "path": f"/metadata/annotations/{_pointer(k)}", "value": v}
+                       for k, v in annotations.items()]
+    else:
+        operations.append({"op": "add", "path": "/metadata/annotations", "value": annotations})
+    if meta.get("labels"):
+        operations.append({"op": "add", "path": f"/metadata/labels/{_pointer(ISTIO_FAULT_LABEL)}", "value": "patch"})
+    else:
+        operations.append({"op": "add", "path": "/metadata/labels", "value": {ISTIO_FAULT_LABEL: "patch"}})
+    return operations
+
+
+def _revert_operations(obj: dict) -> list:
+    """JSON patch removing the fault routes, labels and annotations added by _inject_operations."""
+    meta = obj["metadata"]
+    operations = [{"op": "test", "path": "/metadata/resourceVersion", "value": meta["resourceVersion"]}]
+    routes = (obj.get("spec") or {}).get("http") or []
+    # 从后往前删除，前面的下标保持不变
+    operations += [{"op": "remove", "path": f"/spec/http/{i}"}
+                   for i in reversed(range(len(routes))) if _is_fault_route(routes[i])]
+    for field, keys in (("annotations", (ISTIO_SERVICE_ANNOTATION, ISTIO_DURATION_ANNOTATION, ISTIO_EXPIRES_ANNOTATION)),
+                        ("labels", (ISTIO_FAULT_LABEL,))):
+        values = meta.get(field) or {}
+        ours = [k for k in keys if k in values]
+        if ours and len(ours) == len(values):
+            # 整个字段都是注入时添加的，删除字段本身以恢复原样
+            operations.append({"op": "remove", "path": f"/metadata/{field}"})
+        else:
+            operations += [{"op": "remove", "path": f"/metadata/{field}/{_pointer(k)}"} for k in ours]
+    return operations
+
+
+def _patch_with_retry(namespace: str, name: str, build) -> dict:
+    """
+    GET the VirtualService and apply build(obj) as a JSON patch guarded by a resourceVersion
+    test; retry when someone else modified it in between. Returns None if it is gone.
+    """
+    for attempt in range(ISTIO_PATCH_RETRIES):
+        obj = _get_virtual_service(namespace, name)
+        if obj is None:
+            return None
+        operations = build(obj)
+        if len(operations) <= 1:
+            return obj
+        try:
+            with tracing.span("patch_virtualservice", virtual_service=name, operations=len(operations)):
+                return _json_patch_virtual_service(namespace, name, operations)
+        except client.exceptions.ApiException as e:
+            # 409/422：resourceVersion 的 test 失败，对象被并发修改
+            if e.status not in (409, 422) or attempt == ISTIO_PATCH_RETRIES - 1:
+                raise
+            logger.info(f"VirtualService '{namespace}/{name}' changed concurrently, retrying patch")
+
+
+def _revert_virtual_service(namespace: str, name: str):
+    return _patch_with_retry(namespace, name, _revert_operations)
+
+
+def _expire_delay_fault(key: tuple, expires_at: float):
+    namespace, name = key
+    obj = _get_virtual_service(namespace, name)
+    if obj is None:
+        return  # 已被 remove_delay_fault 删除
+    current = _delay_fault_expiry(obj)
+    if current is None or current.timestamp() > time.time() + 1:
+        return  # 故障已被重新注入（无期限或更晚到期），由新的计划条目处理
+    started = time.perf_counter()
+    if ((obj["metadata"].get("labels") or {}).get(ISTIO_FAULT_LABEL)) == "patch":
+        _revert_virtual_service(namespace, name)
+    elif not _delete_virtual_service(namespace, name):
+        return
+    service = (obj["metadata"].get("annotations") or {}).get(ISTIO_SERVICE_ANNOTATION)
+    if service:
+        journal.record_cleanup(namespace, f"{service}-delay", (time.perf_counter() - started) * 1000, how="expired")
+    logger.info(f"Delay fault '{namespace}/{name}' expired at {current.isoformat()} and was removed.")
+
+
+# 按到期时间删除 Istio 延迟故障；服务启动时 start_fault_reaper() 从集群重建计划
+delay_fault_reaper = fault_reaper.Reaper("delay-fault-reaper", _expire_delay_fault, _pending_delay_faults)
+
+
+def start_fault_reaper(contexts=(None,)):
+    """Start the delay fault reaper and reschedule the faults already in the cluster."""
+    delay_fault_reaper.start(contexts)
+
+
+@tracing.traced()
+def inject_delay_fault(service_name: str, delay_seconds: int, namespace: str = "default", duration: str = None,
+                       percentage: float = 100.0, abort_http_status: int = None, abort_percentage: float = 100.0,
+                       headers: dict = None, path: str = None):
+    """
+    Inject an Istio delay and/or abort fault (see _inject_delay_fault) and append it to the
+    experiment journal as "<service>-delay", the name remove_delay_fault records its removal under.
+    """
+    started_at = time.time()
+    spec = {"delay_seconds": delay_seconds, "percentage": percentage, "abort_http_status": abort_http_status,
+            "abort_percentage": abort_percentage, "headers": headers, "path": path, "duration": duration}
+    try:
+        result = _inject_delay_fault(service_name, delay_seconds, namespace, duration, percentage,
+                                     abort_http_status, abort_percentage, headers, path)
+    except Exception as e:
+        journal.record_injection("VirtualService", namespace, None, spec, started_at,
+                                 (time.time() - started_at) * 1000, service_name, "delay", "error", str(e))
+        raise
+    failed = "error" in result
+    journal.record_injection("VirtualService", namespace, None if failed else f"{service_name}-delay", spec,
+                             started_at, (time.time() - started_at) * 1000, service_name,
+                             "delay" if delay_seconds else "abort", "error" if failed else "created",
+                             result.get("error") if failed else None)
+    return result
+
+
+def _inject_delay_fault(service_name: str, delay_seconds: int, namespace: str = "default", duration: str = None,
+                        percentage: float = 100.0, abort_http_status: int = None, abort_percentage: float = 100.0,
+                        headers: dict = None, path: str = None):
+    """
+    Inject an Istio delay and/or abort fault into requests to a service.
+
+    When the application already routes the service with its own VirtualServices, every
+    HTTP route of them gets a faulted copy in front of it (one JSON patch per
+    VirtualService), so its routing keeps working and remove_delay_fault restores the
+    original routes exactly. Otherwise a "<service>-delay" VirtualService is created.
+
+    percentage / abort_percentage select the share of requests that get the delay / abort;
+    headers and path restrict the fault to matching requests. With a duration (e.g. "10m")
+    the expiry is recorded in annotations and the reaper removes the fault when it passes.
+    """
+    fault = _istio_fault(delay_seconds, percentage, abort_http_status, abort_percentage)
+    if not fault:
+        return {
+            "error": "Nothing to inject: delay is 0 and no abort status was given",
+            "suggestion": "Set a delay in seconds and/or an abort HTTP status, e.g. 503"
+        }
+    for value in (percentage, abort_percentage):
+        if not 0 < float(value) <= 100:
+            return {"error": f"Invalid percentage: {value}", "suggestion": "Use a value in (0, 100], e.g. 1 or 0.5"}
+    if abort_http_status and not 100 <= int(abort_http_status) <= 599:
+        return {"error": f"Invalid abort status: {abort_http_status}", "suggestion": "Use an HTTP status such as 503"}
+
+    annotations = {}
+    expires_at = None
+    if duration:
+        seconds = experiments.parse_duration(duration)
+        if not seconds or seconds <= 0:
+            return {
+                "error": f"Invalid duration: {duration}",
+                "suggestion": "Use a Go duration such as '90s', '10m' or '1h30m'"
+            }
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=seconds)).replace(microsecond=0)
+        annotations = {
+            ISTIO_DURATION_ANNOTATION: duration,
+            ISTIO_EXPIRES_ANNOTATION: expires_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+    match = _istio_match(headers, path)
+
+    with tracing.span("find_virtualservices"):
+        targets = _application_virtual_services(service_name, namespace)
+
+    if targets:
+        # 先撤销此前注入的故障，再插入新的故障路由
+        patched = []
+        for obj in targets:
+            name = obj["metadata"]["name"]
+            _revert_virtual_service(namespace, name)
+            r = _patch_with_retry(namespace, name, lambda o: _inject_operations(o, match, fault, annotations,
+                                                                                service_name))
+            if r is not None:
+                patched.append(name)
+                if expires_at is not None:
+                    delay_fault_reaper.schedule(expires_at.timestamp(), (namespace, name))
+        logger.info(f"Injected fault {fault} for service '{service_name}' into VirtualServices {patched} "
+                    f"in namespace '{namespace}'.")
+        return {
+            "service": service_name,
+            "namespace": namespace,
+            "patched_virtual_services": patched,
+            "fault": fault,
+            "match": match or None,
+            "expires_at": annotations.get(ISTIO_EXPIRES_ANNOTATION),
+        }
+
+    route = {"name": f"{ISTIO_FAULT_ROUTE_PREFIX}-0", "fault": fault,
+             "route": [{"destination": {"host": service_name}}]}
+    http = [route]
+    if match:
+        # 只有匹配的请求注入故障，其余请求正常路由
+        route["match"] = [match]
+        http.append({"route": [{"destination": {"host": service_name}}]})
     virtual_service_manifest = {
-        "apiVersion": "networking.istio.io/v1",
+        "apiVersion": f"{ISTIO_GROUP}/{ISTIO_VERSION}",
         "kind": "VirtualService",
         "metadata": {
             "name": f"{service_name}-delay",
             "namespace": namespace,
+            "labels": {ISTIO_FAULT_LABEL: "delay"},
+            "annotations": {**annotations, ISTIO_SERVICE_ANNOTATION: service_name},
         },
         "spec": {
             "hosts": [service_name],
-            "http": [
-                {
-                    "fault": {
-                        "delay": {
-                            "fixedDelay": f"{delay_seconds}s",
-                            "percentage": {
-                                "value": 100,
-                            }
-                        }
-                    },
-                    "route": [
-                        {
-                            "destination": {
-                                "host": service_name
-                            }
-                        }
-                    ]
-                }
-            ]
+            "http": http,
         }
     }
 
-    r = api.create_namespaced_custom_object(
-        group="networking.istio.io",
-        version="v1",
-        namespace=namespace,
-        plural="virtualservices",
-        body=virtual_service_manifest,
-    )
+    custom_objects = cluster_pool.custom_objects(api)
+    with tracing.span("create_virtualservice"):
+        try:
+            r = custom_objects.create_namespaced_custom_object(
+                group=ISTIO_GROUP,
+                version=ISTIO_VERSION,
+                namespace=namespace,
+                plural=ISTIO_PLURAL,
+                body=virtual_service_manifest,
+            )
+        except client.exceptions.ApiException as e:
+            if e.status != 409:
+                raise
+            # 已注入过：整体替换 spec，并清除旧的到期注解
+            r = custom_objects.patch_namespaced_custom_object(
+                group=ISTIO_GROUP, version=ISTIO_VERSION, namespace=namespace, plural=ISTIO_PLURAL,
+                name=f"{service_name}-delay",
+                body={"metadata": {"annotations": {ISTIO_DURATION_ANNOTATION: None, ISTIO_EXPIRES_ANNOTATION: None,
+                                                   **virtual_service_manifest["metadata"]["annotations"]}},
+                      "spec": virtual_service_manifest["spec"]},
+            )
     logger.info(
         f"Injected delay fault for service '{service_name}' with {delay_seconds} seconds delay in namespace '{namespace}'.")
 
+    if expires_at is not None:
+        delay_fault_reaper.schedule(expires_at.timestamp(), (namespace, f"{service_name}-delay"))
     return r
 
 
+@tracing.traced()
 def remove_delay_fault(service_name: str, namespace: str = "default"):
+    """Delete the "<service>-delay" VirtualService and revert the faults patched into existing ones."""
+    started = time.perf_counter()
     try:
-        r = api.delete_namespaced_custom_object(
-            group="networking.istio.io",
-            version="v1",
-            namespace=namespace,
-            plural="virtualservices",
-            name=f"{service_name}-delay",
-        )
+        removed = _delete_virtual_service(namespace, f"{service_name}-delay")
+        patched = cluster_pool.custom_objects(api).list_namespaced_custom_object(
+            group=ISTIO_GROUP, version=ISTIO_VERSION, namespace=namespace, plural=ISTIO_PLURAL,
+            label_selector=f"{ISTIO_FAULT_LABEL}=patch", _request_timeout=30)
+        reverted = []
+        for obj in patched.get("items") or []:
+            meta = obj["metadata"]
+            if (meta.get("annotations") or {}).get(ISTIO_SERVICE_ANNOTATION) == service_name:
+                _revert_virtual_service(namespace, meta["name"])
+                reverted.append(meta["name"])
+        if not removed and not reverted:
+            return {
+                "error": f"No delay fault found for service '{service_name}' in namespace '{namespace}'",
+                "suggestion": "The fault may have expired or been removed already"
+            }
         logger.info(f"Removed delay fault for service '{service_name}' in namespace '{namespace}'.")
-        return r
+        journal.record_cleanup(namespace, f"{service_name}-delay", (time.perf_counter() - started) * 1000)
+        return {
+            "service": service_name,
+            "namespace": namespace,
+            "deleted": [f"{service_name}-delay"] if removed else [],
+            "reverted_virtual_services": reverted,
+        }
     except Exception as e:
         logger.error(f"Error removing delay fault: {e}")
         return {"error": str(e)}
@@ -0,0 +1,193 @@
+"""
+Online log-template mining (Drain).
+
+Most lines of a service's log are a handful of statements printed with different IDs,
+latencies and counters. TemplateMiner folds such lines into templates like
+
+    INFO request served path=<*> status=<*> latency=<*> trace_id=<*>
+
+with a count, sample values for every <*> and the first/last time the template was
+seen, so a multi-pod log dump can be returned as a few dozen entries instead of
+thousands of lines.
+
+The algorithm is Drain (He et al., "Drain: An Online Log Parsing Approach with Fixed
+Depth Tree", ICWS 2017): a line is routed through a fixed-depth tree by its token count
+and its first tokens (tokens containing digits route as <*>), and is merged into the
+most similar template of the leaf it reaches, or starts a new one. Each line costs a
+few dictionary lookups and one comparison per template in its leaf.
+"""
+import re
+
+WILDCARD = "<*>"
+
+# "key=value" 拆成 "key=" 和 "value" 两个 token，使 key 保留在模板中
+_TOKEN = re.compile(r"[^\s=]+=|[^\s]+")
+_HAS_DIGIT = re.compile(r"\d")
+
+
+def tokenize(line: str) -> list[str]:
+    return _TOKEN.findall(line)
+
+
+def render(tokens) -> str:
+    """Join tokens back into a line; a "key=" token is glued to the token after it (a bare "=" is not)."""
+    parts = []
+    glue = False
+    for token in tokens:
+        if parts and not glue:
+            parts.append(" ")
+        parts.append(token)
+        glue = len(token) > 1 and token.endswith("=")
+    return "".join(parts)
+
+
+class LogCluster:
+    """One template: its tokens, how many lines it absorbed and where/when they came from."""
+
+    __slots__ = ("tokens", "wildcards", "count", "samples", "example", "first_seen", "last_seen", "sources")
+
+    def __init__(self, tokens: list[str], line: str):
+        self.tokens = tokens
+        self.wildcards = ()
+        self.count = 0
+        self.samples = {}
+        self.example = line
+        self.first_seen = None
+        self.last_seen = None
+        self.sources = {}
+
+    @property
+    def template(self) -> str:
+        return render(self.tokens)
+
+
+class TemplateMiner:
+    """
+    Drain template miner.
+
+    Args:
+        depth (int): Depth of the parse tree; depth - 2 leading tokens are used for routing.
+        similarity (float): Minimum share of matching tokens for a line to join a template.
+        max_children (int): Maximum children of an inner node before new tokens route to <*>.
+        max_samples (int): Distinct sample values kept for each <*> of a template.
+    """
+
+    def __init__(self, depth: int = 4, similarity: float = 0.4, max_children: int = 100, max_samples: int = 3):
+        self.depth = max(depth, 3)
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_samples = max_samples
+        self.clusters = []
+        self.lines = 0
+        self._root = {}
+
+    def add(self, line: str, ts=None, source: str = None) -> LogCluster:
+        """
+        Fold one line into the templates and return its cluster. `ts` is any comparable
+        timestamp (first/last seen), `source` is counted per cluster (e.g. the pod name).
+        """
+        tokens = tokenize(line)
+        self.lines += 1
+        leaf = self._leaf(tokens)
+        cluster, covered = self._match(leaf, tokens)
+        if cluster is None:
+            cluster = LogCluster(tokens, line)
+            leaf.append(cluster)
+            self.clusters.append(cluster)
+        elif not covered:
+            template = cluster.tokens
+            new = [i for i, token in enumerate(tokens) if template[i] != token and template[i] != WILDCARD]
+            if new:
+                template = list(template)
+                first = tokenize(cluster.example)
+                for i in new:
+                    template[i] = WILDCARD
+                    # 位置 i 刚变成通配符：此前各行在该位置的取值都是模板原来的 token
+                    cluster.samples[i] = [first[i]]
+                cluster.tokens = template
+                cluster.wildcards = tuple(i for i, token in enumerate(template) if token == WILDCARD)
+
+        cluster.count += 1
+        max_samples = self.max_samples
+        for i in cluster.wildcards:
+            values = cluster.samples[i]
+            if len(values) < max_samples and tokens[i] not in values:
+                values.append(tokens[i])
+        if ts is not None:
+            if cluster.first_seen is None or ts < cluster.first_seen:
+                cluster.first_seen = ts
+            if cluster.last_seen is None or ts > cluster.last_seen:
+                cluster.last_seen = ts
+        if source is not None:
+            cluster.sources[source] = cluster.sources.get(source, 0) + 1
+        return cluster
+
+    def _leaf(self, tokens: list[str]) -> list:
+        node = self._root.get(len(tokens))
+        if node is None:
+            node = self._root[len(tokens)] = {}
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if _HAS_DIGIT.search(token) else token
+            child = node.get(key)
+            if child is None:
+                if len(node) >= self.max_children:
+                    # 分支过多（例如首个 token 是不含数字的随机 ID）时归入通配符分支
+                    key = WILDCARD
+                    child = node.get(WILDCARD)
+                if child is None:
+                    child = node[key] = {}
+            node = child
+        leaf = node.get(None)
+        if leaf is None:
+            leaf = node[None] = []
+        return leaf
+
+    def _match(self, leaf: list, tokens: list[str]) -> tuple:
+        """(most similar cluster or None, whether its template already covers every token)."""
+        if not tokens:
+            return (leaf[0] if leaf else None), True
+        best, best_score, best_same, best_params = None, -1.0, 0, -1
+        for cluster in leaf:
+            same = params = 0
+            for template_token, token in zip(cluster.tokens, tokens):
+                if template_token == WILDCARD:
+                    params += 1
+                elif template_token == token:
+                    same += 1
+            score = same / len(tokens)
+            if score > best_score or (score == best_score and params > best_params):
+                best, best_score, best_same, best_params = cluster, score, same, params
+        if best is None or best_score < self.similarity:
+            return None, False
+        return best, best_same + best_params == len(tokens)
+
+    def summary(self, limit: int = 50) -> dict:
+        """Templates ordered by line count, the largest `limit` of them in full."""
+        clusters = sorted(self.clusters, key=lambda c: -c.count)
+        templates = []
+        for cluster in clusters[:limit]:
+            entry = {
+                "template": cluster.template,
+                "count": cluster.count,
+                "example": cluster.example,
+            }
+            variables = [cluster.samples[i] for i in cluster.wildcards]
+            if variables:
+                entry["variables"] = variables
+            if cluster.first_seen is not None:
+                entry["first_seen"] = _timestamp(cluster.first_seen)
+                entry["last_seen"] = _timestamp(cluster.last_seen)
+            if cluster.sources:
+                entry["sources"] = dict(sorted(cluster.sources.items()))
+            templates.append(entry)
+        return {
+            "total_lines": self.lines,
+            "template_count": len(clusters),
+            "templates": templates,
+            "omitted_templates": max(0, len(clusters) - limit),
+            "omitted_lines": sum(c.count for c in clusters[limit:]),
+        }
+
+
+def _timestamp(ts) -> str:
+    return ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
@@ -0,0 +1,176 @@
+"""
+Node to chaosd address discovery.
+
+The host tools take raw chaosd addresses ("ip:port"), which agents had to guess or copy
+from hand-kept lists that drift as the autoscaler replaces nodes. The NodeInventory sits
+on the shared Nodes informer (one list_node snapshot kept fresh by a watch) and indexes
+every node by zone, instance type and (label, value), so "all ready nodes in us-east-2a
+with label X" resolves to a set intersection without an API call.
+
+A node's chaosd address is taken from the PhysicalMachine registered for it (same name,
+or same host as the node's InternalIP) when CHAOSMESH_MCP_PHYSICAL_MACHINES is enabled,
+and is otherwise <InternalIP>:CHAOSMESH_MCP_CHAOSD_PORT (default 31767, the port chaosd
+listens on when deployed as a DaemonSet).
+"""
+import logging
+import os
+import threading
+
+import cluster_pool
+import informer
+
+logger = logging.getLogger(__name__)
+
+CHAOSD_PORT = int(os.environ.get("CHAOSMESH_MCP_CHAOSD_PORT", "31767"))
+PHYSICAL_MACHINES = os.environ.get("CHAOSMESH_MCP_PHYSICAL_MACHINES", "").lower() in ("1", "true", "yes", "on")
+
+# 新旧两套拓扑标签，新标签优先
+ZONE_LABELS = ("topology.kubernetes.io/zone", "failure-domain.beta.kubernetes.io/zone")
+INSTANCE_TYPE_LABELS = ("node.kubernetes.io/instance-type", "beta.kubernetes.io/instance-type")
+
+_inventories = {}
+_registry_lock = threading.Lock()
+
+
+def _first_label(labels: dict, keys: tuple):
+    for key in keys:
+        if labels.get(key):
+            return labels[key]
+    return None
+
+
+def _host(address: str) -> str:
+    """Host part of a chaosd address such as "https://10.0.0.1:31768" or "10.0.0.1:31767"."""
+    address = address.split("://", 1)[-1].split("/", 1)[0]
+    return address.rsplit(":", 1)[0] if address.count(":") == 1 else address
+
+
+class NodeInventory:
+    """(label key, label value) -> {node name}; zone and instance type are indexed as their labels."""
+
+    def __init__(self, source: informer.Informer, machines: informer.Informer = None):
+        self.source = source
+        self.machines = machines
+        self._by_label = {}
+        self._all = set()
+        self._lock = threading.Lock()
+        source.add_listener(self._on_event)
+
+    def _on_event(self, event_type, key, old, new):
+        name = key[1]
+        with self._lock:
+            if old is not None:
+                for label in (old.get("labels") or {}).items():
+                    names = self._by_label.get(label)
+                    if names is not None:
+                        names.discard(name)
+                        if not names:
+                            del self._by_label[label]
+                self._all.discard(name)
+            if new is not None:
+                for label in (new.get("labels") or {}).items():
+                    self._by_label.setdefault(label, set()).add(name)
+                self._all.add(name)
+
+    def _names(self, labels: dict) -> set:
+        with self._lock:
+            if not labels:
+                return set(self._all)
+            sets = [self._by_label.get((k, str(v))) or set() for k, v in labels.items()]
+            sets.sort(key=len)
+            return sets[0].intersection(*sets[1:])
+
+    def _machine_addresses(self) -> dict:
+        """{node name or host: address} of the registered PhysicalMachines; empty when disabled or unavailable."""
+        if self.machines is None:
+            return {}
+        try:
+            snapshot = self.machines.snapshot()
+        except Exception as e:
+            # 没有安装 PhysicalMachine CRD 或没有权限时退回节点 IP
+            logger.warning(f"Cannot list PhysicalMachines, falling back to node IPs: {e}")
+            return {}
+        addresses = {}
+        for (_, name), machine in snapshot.items():
+            address = machine.get("address")
+            if address:
+                addresses.setdefault(name, address.split("://", 1)[-1])
+                addresses.setdefault(_host(address), address.split("://", 1)[-1])
+        return addresses
+
+    def select(self, zone: str = None, labels: dict = None, instance_type: str = None,
+               nodes: list[str] = None, ready_only: bool = True) -> list[dict]:
+        """
+        The nodes matching every given filter, sorted by name, each with its chaosd address
+        (None when the node has no InternalIP and no PhysicalMachine).
+        """
+        self.source.ensure_fresh()
+        labels = dict(labels or {})
+        names = self._names(labels)
+        if nodes is not None:
+            names &= set(nodes)
+        machines = self._machine_addresses()
+        selected = []
+        for name in sorted(names):
+            node = self.source.get(None, name)
+            if node is None:
+                continue
+            node_labels = node.get("labels") or {}
+            node_zone = _first_label(node_labels, ZONE_LABELS)
+            node_type = _first_label(node_labels, INSTANCE_TYPE_LABELS)
+            if zone is not None and node_zone != zone:
+                continue
+            if instance_type is not None and node_type != instance_type:
+                continue
+            if ready_only and (not node.get("ready") or node.get("unschedulable")):
+                continue
+            ip = node.get("internal_ip")
+            address = machines.get(name) or (ip and machines.get(ip))
+            source = "physical_machine" if address else "node_ip"
+            if not address and ip:
+                address = f"{ip}:{CHAOSD_PORT}"
+            selected.append({
+                "node": name,
+                "zone": node_zone,
+                "instance_type": node_type,
+                "internal_ip": ip,
+                "ready": node.get("ready"),
+                "unschedulable": node.get("unschedulable"),
+                "address": address,
+                "source": source if address else None,
+                "labels": node_labels,
+            })
+        return selected
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+
+def get() -> NodeInventory:
+    """The node inventory of the active kubeconfig context."""
+    context = cluster_pool.active()
+    with _registry_lock:
+        inventory = _inventories.get(context)
+        if inventory is None:
+            inventory = NodeInventory(informer.nodes(), informer.physical_machines() if PHYSICAL_MACHINES else None)
+            _inventories[context] = inventory
+        return inventory
+
+
+def resolve(zone: str = None, labels: dict = None, instance_type: str = None, nodes: list[str] = None) -> dict:
+    """
+    The chaosd addresses of the ready, schedulable nodes matching the filters.
+    Raises ValueError when no filter is given.
+    """
+    if zone is None and not labels and instance_type is None and nodes is None:
+        raise ValueError("Give at least one of zone, node_labels, instance_type or nodes")
+    inventory = get()
+    matched = inventory.select(zone=zone, labels=labels, instance_type=instance_type, nodes=nodes)
+    return {
+        "addresses": [entry["address"] for entry in matched if entry["address"]],
+        "nodes": [entry["node"] for entry in matched],
+        "unresolved": [entry["node"] for entry in matched if not entry["address"]],
+        "snapshot_version": inventory.source.version,
+    }
@@ -0,0 +1,159 @@
+"""
+Local evaluation of experiment pod selection.
+
+For fixed, fixed-percent and random-max-percent modes the number of pods an experiment
+hits depends on how many pods the selector matches at that moment, which the agent
+cannot see before injecting. The PodIndex sits on the shared Pods informer (one
+list_pod_for_all_namespaces snapshot kept fresh by a watch) and maps every
+(namespace, label, value) to its pods, so a label selector resolves to a set
+intersection without an API call; preview() then applies Chaos Mesh's mode rules to the
+candidates:
+
+    one                 1 pod, chosen at random
+    all                 every candidate
+    fixed               min(value, candidates)
+    fixed-percent       floor(candidates * value / 100)
+    random-max-percent  between 0 and floor(candidates * value / 100), at random
+"""
+import math
+import threading
+
+import cluster_pool
+import informer
+
+MODES = ("one", "all", "fixed", "fixed-percent", "random-max-percent")
+
+_indexes = {}
+_registry_lock = threading.Lock()
+
+
+class PodIndex:
+    """(namespace, label key, label value) -> {pod key}, plus namespace -> {pod key}."""
+
+    def __init__(self, source: informer.Informer):
+        self.source = source
+        self._by_label = {}
+        self._by_namespace = {}
+        self._lock = threading.Lock()
+        source.add_listener(self._on_event)
+
+    def _on_event(self, event_type, key, old, new):
+        namespace = key[0]
+        with self._lock:
+            if old is not None:
+                for label in (old.get("labels") or {}).items():
+                    keys = self._by_label.get((namespace, *label))
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self._by_label[(namespace, *label)]
+                keys = self._by_namespace.get(namespace)
+                if keys is not None:
+                    keys.discard(key)
+            if new is not None:
+                for label in (new.get("labels") or {}).items():
+                    self._by_label.setdefault((namespace, *label), set()).add(key)
+                self._by_namespace.setdefault(namespace, set()).add(key)
+
+    def select(self, namespace: str, labels: dict) -> list[tuple]:
+        """Keys of the pods in `namespace` carrying every label in `labels`, sorted."""
+        self.source.ensure_fresh()
+        with self._lock:
+            if not labels:
+                return sorted(self._by_namespace.get(namespace) or ())
+            sets = [self._by_label.get((namespace, k, str(v))) or set() for k, v in labels.items()]
+            sets.sort(key=len)
+            return sorted(sets[0].intersection(*sets[1:]))
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(keys) for keys in self._by_namespace.values())
+
+
+def get() -> PodIndex:
+    """The pod index of the active kubeconfig context."""
+    context = cluster_pool.active()
+    with _registry_lock:
+        index = _indexes.get(context)
+        if index is None:
+            index = PodIndex(informer.pods())
+            _indexes[context] = index
+        return index
+
+
+def selection_range(mode: str, value, candidates: int) -> tuple:
+    """
+    (min, max) number of pods Chaos Mesh selects out of `candidates` for a mode and value.
+    Raises ValueError for the values Chaos Mesh rejects.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'; valid modes are {list(MODES)}")
+    if mode == "one":
+        return (min(1, candidates),) * 2
+    if mode == "all":
+        return (candidates,) * 2
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Mode '{mode}' needs an integer value, got '{value}'")
+    if number <= 0:
+        raise ValueError(f"Mode '{mode}' cannot select any pod with value {number}")
+    if mode == "fixed":
+        return (min(number, candidates),) * 2
+    if number > 100:
+        raise ValueError(f"Mode '{mode}' needs a percentage between 1 and 100, got {number}")
+    count = int(math.floor(candidates * number / 100))
+    return (count, count) if mode == "fixed-percent" else (0, count)
+
+
+def service_pods(services: list[str], namespace: str) -> dict:
+    """{service: keys of its pods (app=<service>)} for several services."""
+    index = get()
+    return {service: index.select(namespace, {"app": service}) for service in services}
+
+
+def preview(service, namespace: str = "default", mode: str = "all", value: str = "",
+            labels: dict = None) -> dict:
+    """
+    The pods an experiment on `service` (a name, or a list of names targeted through one
+    `app in (...)` selector) would select, without creating anything. The mode applies to
+    the union of the services' pods, as it does in Chaos Mesh.
+    Raises ValueError for an invalid mode or value.
+    """
+    index = get()
+    services = [service] if isinstance(service, str) else list(dict.fromkeys(service))
+    if labels or len(services) == 1:
+        labels = labels or {"app": services[0]}
+        keys, per_service = index.select(namespace, labels), None
+    else:
+        per_service = service_pods(services, namespace)
+        keys = sorted(set().union(*per_service.values()))
+        labels = [{"key": "app", "operator": "In", "values": sorted(services)}]
+    owner = {key: name for name, pod_keys in (per_service or {}).items() for key in pod_keys}
+    minimum, maximum = selection_range(mode, value, len(keys))
+    candidates = []
+    for key in keys:
+        pod = index.source.get(*key) or {}
+        candidate = {"name": key[1], "phase": pod.get("phase"), "node": pod.get("node_name")}
+        if per_service:
+            candidate["service"] = owner[key]
+        candidates.append(candidate)
+    result = {
+        "service": service,
+        "namespace": namespace,
+        "selector": labels,
+        "mode": mode,
+        "value": value,
+        "candidates": candidates,
+        "candidate_count": len(candidates),
+        "min_count": minimum,
+        "max_count": maximum,
+        # 被选中的 Pod（或数量）由 Chaos Mesh 随机决定
+        "random": minimum != maximum or maximum < len(candidates),
+        "whole_service": bool(candidates) and minimum == len(candidates),
+        "snapshot_version": index.source.version,
+    }
+    if per_service:
+        result["services"] = {name: len(pod_keys) for name, pod_keys in per_service.items()}
+    return result
@@ -0,0 +1,98 @@
+"""
+Lightweight pod listing.
+
+The generated kubernetes client turns every pod in a list response into a V1Pod model
+tree (metadata, spec, status, containers, volumes, ...), although the tools only read
+names, labels, phase and restart counts. list_pods() reads the response as raw JSON instead and keeps
+just those fields in compact __slots__ records.
+
+With metadata_only=True the request asks the API server for PartialObjectMetadataList,
+so spec and status are not even sent; servers that do not support it fall back to the
+full JSON list, which is parsed the same way.
+"""
+import json
+
+import cluster_pool
+
+# 按优先级尝试的服务标签选择器
+SERVICE_SELECTORS = ("app={}", "app.kubernetes.io/name={}", "k8s-app={}")
+
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+
+class PodRecord:
+    """
+    The parts of a pod the tools use. phase, node_name and restarts (container name ->
+    restartCount) are None for metadata-only lists.
+    """
+
+    __slots__ = ("name", "namespace", "labels", "phase", "node_name", "restarts")
+
+    def __init__(self, name: str, namespace: str, labels: dict, phase: str = None, node_name: str = None,
+                 restarts: dict = None):
+        self.name = name
+        self.namespace = namespace
+        self.labels = labels
+        self.phase = phase
+        self.node_name = node_name
+        self.restarts = restarts
+
+    def __repr__(self):
+        return f"PodRecord({self.namespace}/{self.name}, phase={self.phase})"
+
+
+def _record(obj: dict) -> PodRecord:
+    meta = obj.get("metadata") or {}
+    status = obj.get("status") or {}
+    spec = obj.get("spec") or {}
+    restarts = None
+    if status:
+        restarts = {c.get("name"): c.get("restartCount") or 0 for c in status.get("containerStatuses") or []}
+    return PodRecord(meta.get("name"), meta.get("namespace"), meta.get("labels") or {},
+                     status.get("phase"), spec.get("nodeName"), restarts)
+
+
+def list_pods(namespace: str, label_selector: str = None, field_selector: str = None,
+              metadata_only: bool = False, core_v1=None, request_timeout=None) -> list[PodRecord]:
+    """
+    List pods in a namespace as PodRecords.
+
+    Args:
+        namespace (str): Namespace to list.
+        label_selector (str): Kubernetes label selector.
+        field_selector (str): Kubernetes field selector, e.g., "status.phase=Running".
+        metadata_only (bool): Only fetch object metadata (no phase / node).
+        core_v1: CoreV1Api to use. Default is the one of the active cluster.
+        request_timeout: Passed to the client as _request_timeout.
+    """
+    core_v1 = core_v1 or cluster_pool.core_v1()
+    query = []
+    if label_selector:
+        query.append(("labelSelector", label_selector))
+    if field_selector:
+        query.append(("fieldSelector", field_selector))
+
+    if metadata_only:
+        api = core_v1.api_client
+        response = api.call_api(
+            "/api/v1/namespaces/{namespace}/pods", "GET",
+            path_params={"namespace": namespace},
+            query_params=query,
+            header_params={"Accept": METADATA_ACCEPT},
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+            _preload_content=False,
+            _request_timeout=request_timeout,
+        )
+    else:
+        kwargs = {"_preload_content": False}
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        if request_timeout is not None:
+            kwargs["_request_timeout"] = request_timeout
+        response = core_v1.list_namespaced_pod(namespace=namespace, **kwargs)
+
+    data = json.loads(response.data)
+    return [_record(obj) for obj in data.get("items") or []]
@@ -0,0 +1,208 @@
+"""
+Client-side rate limiting of Kubernetes API calls.
+
+Several agents running chaos against one cluster can send bursts of pod lists, creates
+and retries that trip API Priority and Fairness and slow the whole control plane. The
+RateLimiter transport middleware puts every request through a token bucket chosen by
+its verb (get, list, watch, create, update, patch, delete) and namespace, so the server
+waits its turn instead of amplifying load on a struggling API server.
+
+Rules come from CHAOSMESH_MCP_RATE_LIMITS, a comma separated list of
+`verb[@namespace]=rate[/burst]` (requests per second, burst defaults to rate):
+
+    CHAOSMESH_MCP_RATE_LIMITS="*=50/100,list=10/20,create=5/10,create@prod=1/2"
+
+The most specific rule wins: verb@namespace, then verb, then *@namespace, then *.
+Each rule keeps one bucket per namespace ("" for cluster-scoped requests), so
+"list=10" allows 10 lists per second in every namespace. Watches are only limited by
+an explicit watch rule. "off" disables limiting.
+
+A request that finds its bucket empty waits for a token; one that would wait longer
+than CHAOSMESH_MCP_RATE_LIMIT_MAX_WAIT seconds (default 30) fails at once with a 429
+ApiException instead. stats() reports requests, throttled requests and time spent
+waiting per bucket.
+"""
+import logging
+import os
+import threading
+import time
+
+from kubernetes.client.exceptions import ApiException
+
+import tracing
+import transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = "*=200/400"
+DEFAULT_MAX_WAIT_SECONDS = 30.0
+
+_VERBS = {"POST": "create", "PUT": "update", "PATCH": "patch", "DELETE": "delete"}
+
+_limiter = None
+_install_lock = threading.Lock()
+
+
+def parse_rules(spec: str) -> dict:
+    """Parse "verb[@namespace]=rate[/burst],..." into {(verb, namespace or None): (rate, burst)}."""
+    rules = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        key, _, value = part.partition("=")
+        verb, _, namespace = key.strip().partition("@")
+        rate, _, burst = value.strip().partition("/")
+        rate = float(rate)
+        burst = float(burst) if burst else max(rate, 1.0)
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{part}': rate must be > 0 and burst >= 1")
+        rules[(verb or "*", namespace or None)] = (rate, burst)
+    return rules
+
+
+def classify(method: str, url: str, query_params=None) -> tuple[str, str]:
+    """(verb, namespace) of a request, e.g. ("list", "default") for GET /api/v1/namespaces/default/pods."""
+    parts = [p for p in transport.request_path(url).split("/") if p]
+    # /api/v1/... 或 /apis/{group}/{version}/...
+    rest = parts[2:] if parts[:1] == ["api"] else parts[3:]
+    namespace = ""
+    if len(rest) >= 2 and rest[0] == "namespaces":
+        namespace = rest[1]
+        rest = rest[2:]
+        if not rest:
+            rest = ["namespaces", namespace]
+    method = method.upper()
+    if method == "GET":
+        if transport.is_watch(query_params):
+            return "watch", namespace
+        # 集合（pods）是 list，单个对象（pods/x、pods/x/log）是 get
+        return ("list" if len(rest) == 1 else "get"), namespace
+    return _VERBS.get(method, method.lower()), namespace
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations: take() returns how long the caller must wait."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "requests", "throttled", "rejected",
+                 "wait_seconds", "max_wait_seconds", "lock")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def take(self, max_wait: float):
+        """Reserve one token. Returns the seconds to wait, or None if that exceeds max_wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌可以透支：排队的请求按预约顺序依次等待
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                self.rejected += 1
+                return None
+            self.tokens -= 1
+            self.requests += 1
+            if wait:
+                self.throttled += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            return wait
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+        }
+
+
+class RateLimiter:
+    """Transport middleware applying per (verb, namespace) token buckets."""
+
+    def __init__(self, rules: dict, max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        self.rules = rules
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _rule(self, verb: str, namespace: str):
+        for key in ((verb, namespace), (verb, None), ("*", namespace), ("*", None)):
+            if key in self.rules and (verb != "watch" or key[0] == "watch"):
+                return key
+        return None
+
+    def bucket(self, verb: str, namespace: str):
+        rule = self._rule(verb, namespace)
+        if rule is None:
+            return None, None
+        key = (rule[0], namespace)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*self.rules[rule])
+        return key, bucket
+
+    def __call__(self, call_next, method, url, **kwargs):
+        verb, namespace = classify(method, url, kwargs.get("query_params"))
+        key, bucket = self.bucket(verb, namespace)
+        if bucket is not None:
+            wait = bucket.take(self.max_wait)
+            if wait is None:
+                raise ApiException(status=429, reason=(
+                    f"Client-side rate limit: {verb} in namespace '{namespace or '*'}' would wait "
+                    f"more than {self.max_wait:g}s ({bucket.rate:g}/s, burst {bucket.burst:g})"))
+            if wait:
+                with tracing.span("rate_limit_wait", verb=verb, namespace=namespace, wait_ms=round(wait * 1000, 1)):
+                    time.sleep(wait)
+        return call_next(method, url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = dict(self._buckets)
+        result = {f"{verb}@{namespace}" if namespace else verb: b.stats()
+                  for (verb, namespace), b in sorted(buckets.items())}
+        return {
+            "rules": {f"{verb}@{namespace}" if namespace else verb: f"{rate:g}/{burst:g}"
+                      for (verb, namespace), (rate, burst) in self.rules.items()},
+            "max_wait_seconds": self.max_wait,
+            "buckets": result,
+            "throttled": sum(b.throttled for b in buckets.values()),
+            "rejected": sum(b.rejected for b in buckets.values()),
+            "wait_seconds": round(sum(b.wait_seconds for b in buckets.values()), 3),
+        }
+
+
+def install_from_env() -> RateLimiter:
+    """Install the limiter with CHAOSMESH_MCP_RATE_LIMITS (once). Returns None when it is "off"."""
+    global _limiter
+    with _install_lock:
+        if _limiter is not None:
+            return _limiter
+        spec = os.environ.get("CHAOSMESH_MCP_RATE_LIMITS", DEFAULT_RULES)
+        if spec.strip().lower() in ("off", "0", "false", "no", ""):
+            return None
+        max_wait = float(os.environ.get("CHAOSMESH_MCP_RATE_LIMIT_MAX_WAIT", DEFAULT_MAX_WAIT_SECONDS))
+        _limiter = RateLimiter(parse_rules(spec), max_wait=max_wait)
+        transport.add_middleware(_limiter)
+        logger.info(f"Kubernetes API rate limits: {spec} (max wait {max_wait:g}s)")
+        return _limiter
+
+
+def stats() -> dict:
+    return _limiter.stats() if _limiter else {"enabled": False}
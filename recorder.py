@@ -0,0 +1,276 @@
+"""
+Record and replay Kubernetes API traffic.
+
+Recording captures every request/response pair made through the kubernetes python
+client (see transport.py) into a gzip-compressed JSON-lines file. Replay serves those
+responses back without a cluster, so tool calls can be profiled and benchmarked
+offline against production-shaped objects.
+
+Enable with environment variables before the server starts:
+
+    CHAOSMESH_MCP_RECORD=/tmp/cluster.jsonl.gz   record live traffic
+    CHAOSMESH_MCP_REPLAY=/tmp/cluster.jsonl.gz   serve recorded traffic
+    CHAOSMESH_MCP_REPLAY_LATENCY=1               also sleep for the recorded latency
+
+Replay matching is deterministic: requests are keyed by method, path and query, with
+generated experiment name suffixes (e.g. "pod-kill-1a2b3c4d") normalised away. Several
+recordings of the same key are served in recorded order; the last one is repeated once
+the sequence is exhausted. Watch requests are never recorded and replay as an empty stream.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from kubernetes import client as k8s_client, config as k8s_config
+from kubernetes.client import rest
+from kubernetes.client.exceptions import ApiException
+
+import transport
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+REPLAY_HOST = "http://replay.invalid"
+
+# _gen_name 和 _fault_inject 生成的名字都以 8 位十六进制 uuid 片段结尾
+_GENERATED_SUFFIX = re.compile(r"-[0-9a-f]{8}$")
+
+_recorder = None
+_replayer = None
+_install_lock = threading.Lock()
+
+
+def _normalise_segment(segment: str) -> str:
+    return _GENERATED_SUFFIX.sub("-*", segment)
+
+
+def request_key(method: str, url: str, query_params=None) -> str:
+    path = "/".join(_normalise_segment(s) for s in transport.request_path(url).split("/"))
+    query = transport.query_dict(query_params)
+    query_part = "&".join(f"{k}={_normalise_segment(str(v))}" for k, v in sorted(query.items()))
+    return f"{method.upper()} {path}" + (f"?{query_part}" if query_part else "")
+
+
+class RecordedResponse:
+    """
+    Minimal stand-in for a urllib3 HTTPResponse built from recorded data. It supports
+    what the kubernetes client and this server use: status, reason, data, headers,
+    read(), stream() and release_conn().
+    """
+
+    def __init__(self, status: int, reason: str, data: bytes, headers: dict):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._data = data
+        self._offset = 0
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    def getheaders(self) -> dict:
+        return self.headers
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def read(self, amt=None, decode_content=None) -> bytes:
+        end = len(self._data) if amt is None else self._offset + amt
+        chunk = self._data[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        while True:
+            chunk = self.read(amt or 2 ** 16)
+            if not chunk:
+                break
+            yield chunk
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _as_response(status, reason, data: bytes, headers: dict, preload_content: bool):
+    raw = RecordedResponse(status, reason, data, headers)
+    if preload_content:
+        response = rest.RESTResponse(raw)
+        response.data = data.decode("utf8")
+        raw = response
+    if not 200 <= status <= 299:
+        raise ApiException(http_resp=raw)
+    return raw
+
+
+class Recorder:
+    """Transport middleware that appends each exchange to a gzip JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"version": FORMAT_VERSION, "recorded_at": time.time()}) + "\n")
+        atexit.register(self.close)
+
+    def __call__(self, call_next, method, url, **kwargs):
+        query_params = kwargs.get("query_params")
+        if transport.is_watch(query_params):
+            return call_next(method, url, **kwargs)
+
+        preload = kwargs.get("_preload_content", True)
+        start = time.perf_counter()
+        try:
+            response = call_next(method, url, **kwargs)
+        except ApiException as e:
+            if e.status:
+                body = e.body.encode("utf8") if isinstance(e.body, str) else (e.body or b"")
+                self._write(method, url, query_params, e.status, e.reason, body, dict(e.headers or {}), start)
+            raise
+
+        if preload:
+            body = response.data.encode("utf8") if isinstance(response.data, str) else response.data
+            headers = dict(response.getheaders() or {})
+        else:
+            # 非预加载的流式响应：读完整个 body 后换成可重复读取的对象
+            body = response.data
+            headers = dict(response.headers or {})
+            response.release_conn()
+            response = RecordedResponse(response.status, response.reason, body, headers)
+        self._write(method, url, query_params, response.status, response.reason, body, headers, start)
+        return response
+
+    def _write(self, method, url, query_params, status, reason, body: bytes, headers: dict, start: float):
+        entry = {
+            "k": request_key(method, url, query_params),
+            "s": status,
+            "r": reason,
+            "h": {k: v for k, v in headers.items() if k.lower() == "content-type"},
+            "b": body.decode("utf8", errors="replace"),
+            "d": round((time.perf_counter() - start) * 1000, 3),
+        }
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"Recorded {self.count} Kubernetes API exchanges to {self.path}")
+
+
+class Replayer:
+    """Transport middleware that answers requests from a recording instead of the network."""
+
+    def __init__(self, path: str, simulate_latency: bool = False):
+        self.path = path
+        self.simulate_latency = simulate_latency
+        self.misses = 0
+        self._entries = defaultdict(list)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported recording version {header.get('version')} in {path}")
+            for line in f:
+                entry = json.loads(line)
+                self._entries[entry["k"]].append(entry)
+        logger.info(f"Loaded {sum(len(v) for v in self._entries.values())} recorded exchanges "
+                    f"({len(self._entries)} distinct requests) from {path}")
+
+    def __call__(self, call_next, method, url, **kwargs):
+        query_params = kwargs.get("query_params")
+        preload = kwargs.get("_preload_content", True)
+        if transport.is_watch(query_params):
+            return _as_response(200, "OK", b"", {"Content-Type": "application/json"}, preload)
+
+        key = request_key(method, url, query_params)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                entry = None
+            else:
+                position = self._positions[key]
+                entry = entries[min(position, len(entries) - 1)]
+                self._positions[key] = position + 1
+        if entry is None:
+            logger.warning(f"Replay miss: {key}")
+            raise ApiException(status=0, reason=f"No recorded response for {key}")
+
+        if self.simulate_latency and entry.get("d"):
+            time.sleep(entry["d"] / 1000.0)
+        return _as_response(entry["s"], entry["r"], entry["b"].encode("utf8"), entry["h"], preload)
+
+
+def _load_replay_config(*args, client_configuration=None, **kwargs):
+    """Stand-in for kubernetes config loaders while replaying: no kubeconfig is needed."""
+    if client_configuration is not None:
+        client_configuration.host = REPLAY_HOST
+        return
+    configuration = k8s_client.Configuration()
+    configuration.host = REPLAY_HOST
+    k8s_client.Configuration.set_default(configuration)
+
+
+def start_recording(path: str) -> Recorder:
+    global _recorder
+    with _install_lock:
+        if _recorder is None:
+            _recorder = Recorder(path)
+            transport.add_middleware(_recorder)
+            logger.info(f"Recording Kubernetes API traffic to {path}")
+        return _recorder
+
+
+def start_replay(path: str, simulate_latency: bool = False) -> Replayer:
+    global _replayer
+    with _install_lock:
+        if _replayer is None:
+            _replayer = Replayer(path, simulate_latency=simulate_latency)
+            # 回放时不访问集群，也不需要 kubeconfig
+            k8s_config.load_kube_config = _load_replay_config
+            k8s_config.load_incluster_config = _load_replay_config
+            _load_replay_config()
+            transport.add_middleware(_replayer)
+            logger.info(f"Replaying Kubernetes API traffic from {path}")
+        return _replayer
+
+
+def replaying() -> bool:
+    return _replayer is not None
+
+
+def install_from_env() -> None:
+    """Start recording or replay according to CHAOSMESH_MCP_RECORD / CHAOSMESH_MCP_REPLAY."""
+    replay_path = os.environ.get("CHAOSMESH_MCP_REPLAY")
+    record_path = os.environ.get("CHAOSMESH_MCP_RECORD")
+    if replay_path:
+        simulate = os.environ.get("CHAOSMESH_MCP_REPLAY_LATENCY", "").lower() in ("1", "true", "yes")
+        start_replay(replay_path, simulate_latency=simulate)
+    elif record_path:
+        start_recording(record_path)
+
+
+def stats() -> dict:
+    result = {"mode": "replay" if _replayer else "record" if _recorder else "off"}
+    if _recorder:
+        result.update({"path": _recorder.path, "recorded": _recorder.count})
+    if _replayer:
+        result.update({"path": _replayer.path, "misses": _replayer.misses})
+    return result
@@ -1,11 +1,31 @@
 import argparse
+import contextvars
+import functools
+import inspect
 import json
 import os
 import logging
 from datetime import datetime
+from typing import Union
+import anyio
 from mcp.server.fastmcp import FastMCP
+import admission
+import cluster_pool
+import experiments
 import fault_inject
+import idempotency
+import journal
 import kube
+import node_inventory
+import pod_index
+import pod_records
+import ratelimit
+import recorder
+import service_graph
+import service_index
+import sweep
+import tracing
+import verbosity as verbosity_levels
 
 # 配置日志
 logging.basicConfig(
@@ -66,8 +86,306 @@ def check_environment():
 
 mcp = FastMCP("Chaos Mesh", log_level="INFO")
 
+
+_MULTI_CLUSTER_DOC = """
+    Multi-cluster:
+        cluster (str): kubeconfig context to run against. Default is the current context.
+        clusters (list[str]): Run against several contexts concurrently ("*" for all of them).
+            The result is then {"clusters": {context: {"result" | "error", "elapsed_ms"}}, "elapsed_ms"}.
+"""
+
+
+def _extend_signature(wrapper, func, parameters: list, doc: str, return_annotation=inspect.Signature.empty):
+    """Expose extra keyword-only parameters and a docstring note on a tool wrapper."""
+    signature = inspect.signature(func)
+    if return_annotation is inspect.Signature.empty:
+        return_annotation = signature.return_annotation
+    wrapper.__signature__ = signature.replace(
+        parameters=[*signature.parameters.values(), *parameters], return_annotation=return_annotation)
+    wrapper.__doc__ = (func.__doc__ or "").rstrip() + "\n" + doc
+    return wrapper
+
+
+def multi_cluster(func):
+    """
+    Add `cluster` and `clusters` arguments to a tool. `cluster` binds the call to one
+    kubeconfig context; `clusters` fans the call out to several contexts in parallel.
+    Place it directly under @mcp.tool() (or under @response_verbosity).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, cluster: str = None, clusters: list[str] = None, **kwargs):
+        if clusters:
+            return cluster_pool.fan_out(functools.partial(func, *args), clusters, **kwargs)
+        with cluster_pool.use(cluster):
+            return func(*args, **kwargs)
+
+    return_annotation = inspect.signature(func).return_annotation
+    if return_annotation is not dict:
+        # fan-out 的结果总是 dict
+        return_annotation = Union[return_annotation, dict]
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("cluster", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str),
+        inspect.Parameter("clusters", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=list[str]),
+    ], _MULTI_CLUSTER_DOC, return_annotation)
+
+
+# 服务端默认的爆炸半径上限，单次调用可用 max_blast_radius 覆盖
+MAX_BLAST_RADIUS = int(os.environ["CHAOSMESH_MCP_MAX_BLAST_RADIUS"]) if os.environ.get("CHAOSMESH_MCP_MAX_BLAST_RADIUS") else None
+
+_BLAST_RADIUS_DOC = """
+    Safety:
+        max_blast_radius (int): Refuse the experiment when more than this many upstream services
+            (transitive callers, see blast_radius) would be affected. Default is no limit.
+"""
+
+
+def _check_blast_radius(tool: str, service, namespace: str, limit: int):
+    """
+    The error dict refusing `tool` when the upstream closure of `service` (one name or a
+    list, whose closures are united) is larger than `limit`; None when it is allowed.
+    """
+    radii = []
+    for name in fault_inject.services_of(service):
+        try:
+            radius = service_graph.blast_radius(name, namespace)
+        except Exception as e:
+            radius = {"error": str(e)}
+        if "error" in radius:
+            return {
+                "error": f"Cannot evaluate the blast radius of '{name}': {radius['error']}",
+                "suggestion": "Fix the service graph or call again without max_blast_radius"
+            }
+        radii.append(radius)
+    if len(radii) > 1:
+        # 多服务实验的影响范围是各服务上游的并集
+        upstream = sorted({caller for radius in radii for caller in radius["upstream"]})
+        radius = {"service": ", ".join(r["service"] for r in radii), "upstream": upstream,
+                  "affected_count": len(upstream)}
+    if radius["affected_count"] > limit:
+        logger.warning(f"Refusing {tool} on {radius['service']}: "
+                       f"{radius['affected_count']} upstream services affected (limit {limit})")
+        return {
+            "error": f"Blast radius of '{radius['service']}' is {radius['affected_count']} services, "
+                     f"above the limit of {limit}",
+            "blast_radius": radius,
+            "suggestion": "Target a less central service or raise max_blast_radius"
+        }
+    return None
+
+
+def blast_radius_limit(func):
+    """
+    Add a `max_blast_radius` argument to an injection tool taking `service` and `namespace`.
+    The experiment is refused when the service's upstream closure is larger than the limit.
+    Place it under @multi_cluster so the check runs against the targeted cluster.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, max_blast_radius: int = None, **kwargs):
+        limit = max_blast_radius if max_blast_radius is not None else MAX_BLAST_RADIUS
+        if limit is None:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        refusal = _check_blast_radius(func.__name__, bound.arguments["service"],
+                                      bound.arguments.get("namespace", "default"), limit)
+        if refusal:
+            return refusal
+        return func(*args, **kwargs)
+
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("max_blast_radius", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=int),
+    ], _BLAST_RADIUS_DOC)
+
+
+_MULTI_SERVICE_DOC = """
+    Multiple services:
+        services (list[str]): More services to target together with `service`, e.g., ["cartservice",
+            "checkoutservice"]. All of them go into one experiment through a single `app in (...)`
+            selector (one object to create, reconcile and delete); mode/value apply to their pods
+            together, and the result lists the pods of each service under "services".
+"""
+
+
+def multi_service(func):
+    """
+    Add a `services` argument to an injection tool taking `service` and `namespace`; the
+    tool then receives the list of services as `service` and builds one selector for them.
+    Place it under @multi_cluster, above @target_preview, so previews cover every service.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, services: list[str] = None, **kwargs):
+        if not services:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        targets = fault_inject.services_of([bound.arguments["service"], *services])
+        if len(targets) == 1:
+            return func(*args, **kwargs)
+        bound.arguments["service"] = targets
+        result = func(*bound.args, **bound.kwargs)
+        if not isinstance(result, dict) or "error" in result or "metadata" not in result:
+            return result
+        namespace = bound.arguments.get("namespace", signature.parameters["namespace"].default)
+        try:
+            pods = pod_index.service_pods(targets, namespace)
+        except Exception as e:
+            logger.warning(f"Cannot count the pods of {targets} in {namespace}: {e}")
+            return result
+        return {**result, "services": [{"service": name, "pods": len(keys)} for name, keys in pods.items()]}
+
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("services", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=list[str]),
+    ], _MULTI_SERVICE_DOC)
+
+
+_PREVIEW_DOC = """
+    Preview:
+        preview (bool): Only resolve which pods the selector and mode/value would hit (see
+            preview_targets) and return them; nothing is created.
+"""
+
+
+def target_preview(func):
+    """
+    Add a `preview` argument to an injection tool taking `service`, `namespace`, `mode` and
+    `value`. With preview=True the call returns pod_index.preview() instead of injecting.
+    Place it under @multi_cluster so the pods of the targeted cluster are used.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, preview: bool = False, **kwargs):
+        if not preview:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        return _preview(arguments["service"], arguments.get("namespace", "default"),
+                        arguments["mode"], arguments["value"])
+
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("preview", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool),
+    ], _PREVIEW_DOC)
+
+
+_HOST_TARGETS_DOC = """
+    Host selection (resolved locally from the watch-updated node inventory, see find_hosts):
+        zone (str): Target the ready nodes in this zone (topology.kubernetes.io/zone), e.g., "us-east-2a".
+        node_labels (dict[str, str]): Target the ready nodes carrying all these labels.
+        instance_type (str): Target the ready nodes of this instance type, e.g., "m5.large".
+        nodes (list[str]): Target these nodes by name.
+        The filters combine with AND; the chaosd addresses of the matching nodes are added to `address`,
+        which may then be omitted.
+"""
+
+
+def host_targets(func):
+    """
+    Add `zone`, `node_labels`, `instance_type` and `nodes` arguments to a host tool taking
+    `address`, and make `address` optional. The filters resolve to chaosd addresses through
+    node_inventory before the tool runs.
+    Place it under @multi_cluster so the nodes of the targeted cluster are used.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, zone: str = None, node_labels: dict[str, str] = None, instance_type: str = None,
+                nodes: list[str] = None, **kwargs):
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        address = list(arguments.pop("address", None) or [])
+        if zone is not None or node_labels or instance_type is not None or nodes is not None:
+            try:
+                resolved = node_inventory.resolve(zone=zone, labels=node_labels, instance_type=instance_type, nodes=nodes)
+            except Exception as e:
+                logger.error(f"Failed to resolve hosts for {func.__name__}: {e}")
+                return {"error": str(e), "suggestion": "Check if you have permissions to list and watch nodes"}
+            if not resolved["addresses"]:
+                return {
+                    "error": "No ready node with a chaosd address matches the host selection",
+                    "selection": {"zone": zone, "node_labels": node_labels, "instance_type": instance_type, "nodes": nodes},
+                    "unresolved_nodes": resolved["unresolved"],
+                    "suggestion": "Inspect the inventory with find_hosts and relax the filters"
+                }
+            address += resolved["addresses"]
+        if not address:
+            return {"error": "No target hosts given",
+                    "suggestion": "Pass address, or select nodes with zone, node_labels, instance_type or nodes"}
+        return func(address=list(dict.fromkeys(address)), **arguments)
+
+    # address 变为可选的关键字参数，其余参数保持原顺序
+    address = signature.parameters["address"].replace(kind=inspect.Parameter.KEYWORD_ONLY, default=None)
+    wrapper.__signature__ = signature.replace(parameters=[
+        *[p for p in signature.parameters.values() if p.name != "address"],
+        address,
+        inspect.Parameter("zone", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str),
+        inspect.Parameter("node_labels", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=dict[str, str]),
+        inspect.Parameter("instance_type", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str),
+        inspect.Parameter("nodes", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=list[str]),
+    ])
+    wrapper.__doc__ = (func.__doc__ or "").rstrip() + "\n" + _HOST_TARGETS_DOC
+    return wrapper
+
+
+_IDEMPOTENT_DOC = """
+    Idempotency:
+        idempotent (bool): Name the experiment after a hash of its spec, so an identical request
+            repeated within the idempotency window (e.g. a retry after a timeout) returns the
+            existing experiment instead of creating a second one. Default is the server setting.
+        idempotency_key (str): Client key mixed into the hash (e.g. a run ID); implies idempotent.
+"""
+
+
+def idempotent(func):
+    """
+    Add `idempotent` and `idempotency_key` arguments to an injection tool.
+    Place it under @multi_cluster so the lookup runs against the targeted cluster.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, idempotent: bool = None, idempotency_key: str = None, **kwargs):
+        with idempotency.use(enabled=idempotent, key=idempotency_key):
+            return func(*args, **kwargs)
+
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("idempotent", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=bool),
+        inspect.Parameter("idempotency_key", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str),
+    ], _IDEMPOTENT_DOC)
+
+
+_VERBOSITY_DOC = """
+    Output:
+        verbosity (str): "minimal" (name, kind, namespace, target count and status), "normal"
+            (the resource without server bookkeeping) or "full". Default is the server setting.
+"""
+
+
+def response_verbosity(func):
+    """
+    Add a `verbosity` argument to a tool and return its result as compact JSON text,
+    reduced to the requested level (see verbosity.py).
+    Place it directly under @mcp.tool(), above @multi_cluster, so fan-out results are
+    shaped per cluster.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, verbosity: str = None, **kwargs):
+        try:
+            level = verbosity_levels.resolve(verbosity)
+        except ValueError as e:
+            return verbosity_levels.dumps({"error": str(e), "suggestion": "Pass minimal, normal or full"})
+        with verbosity_levels.use(level):
+            # 返回字符串时 FastMCP 不再做 indent=2 的序列化；返回注解仍为 dict，不生成 structuredContent
+            return verbosity_levels.dumps(verbosity_levels.shape(func(*args, **kwargs)))
+
+    return _extend_signature(wrapper, func, [
+        inspect.Parameter("verbosity", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str),
+    ], _VERBOSITY_DOC)
+
+
 # 添加健康检查端点
 @mcp.tool()
+@multi_cluster
 def health_check() -> dict:
     """
     Check the health of Chaos Mesh MCP server and dependencies
@@ -82,10 +400,12 @@ def health_check() -> dict:
         "timestamp": str(datetime.now())
     }
     
+    if cluster_pool.active():
+        status["cluster"] = cluster_pool.active()
+
     try:
-        from kubernetes import client, config
-        config.load_kube_config()
-        v1 = client.CoreV1Api()
+        # 当前调用所选集群的客户端（默认配置由启动时加载，不在这里重新加载）
+        v1 = cluster_pool.core_v1()
         
         # Test Kubernetes connection
         v1.list_namespace(limit=1)
@@ -93,11 +413,12 @@ def health_check() -> dict:
         
         # Test Chaos Mesh
         v1.read_namespace("chaos-mesh")
-        pods = v1.list_namespaced_pod(
+        pods = pod_records.list_pods(
             namespace="chaos-mesh",
-            label_selector="app.kubernetes.io/name=chaos-mesh"
+            label_selector="app.kubernetes.io/name=chaos-mesh",
+            core_v1=v1
         )
-        running_pods = [pod for pod in pods.items if pod.status.phase == "Running"]
+        running_pods = [pod for pod in pods if pod.phase == "Running"]
         
         if running_pods:
             status["chaos_mesh"] = "healthy"
@@ -107,11 +428,94 @@ def health_check() -> dict:
             
     except Exception as e:
         status["error"] = str(e)
+
+    if admission.installed():
+        status["admission"] = admission.stats()
+    status["rate_limits"] = ratelimit.stats()
+    status["delay_fault_reaper"] = kube.delay_fault_reaper.stats()
+    status["journal"] = journal.path()
     
     return status
 
 
 @mcp.tool()
+def get_slow_traces(limit: int = 10, name: str = None) -> dict:
+    """
+    Return the slowest recent tool call traces with their per-phase timing breakdown
+    (service verification, selector building, chaosmesh client calls, retries, custom object writes).
+
+    Args:
+        limit (int): Maximum number of traces to return. Default is 10.
+        name (str): Only return traces of this operation, e.g., "pod_fault". Default is all.
+
+    Returns:
+        dict: Traces sorted slowest first.
+    """
+    traces = tracing.slowest_traces(limit=limit, name=name)
+    return {
+        "traces": traces,
+        "total_count": len(traces),
+        "buffer_size": tracing.TRACE_BUFFER_SIZE,
+    }
+
+
+@mcp.tool()
+def list_clusters() -> dict:
+    """
+    List the kubeconfig contexts this server can target with the `cluster` / `clusters`
+    arguments of the other tools.
+
+    Returns:
+        dict: Context names, the current (default) context and the contexts with a pooled client.
+    """
+    try:
+        contexts, current = cluster_pool.list_contexts()
+    except Exception as e:
+        logger.error(f"Failed to list kubeconfig contexts: {e}")
+        return {
+            "error": str(e),
+            "suggestion": "Check that KUBECONFIG points to a valid kubeconfig file"
+        }
+    return {
+        "clusters": contexts,
+        "current": current,
+        "pooled": cluster_pool.pooled(),
+        "total_count": len(contexts)
+    }
+
+
+@mcp.tool()
+@multi_cluster
+def blast_radius(service: str, namespace: str = "default") -> dict:
+    """
+    Show which services are affected if a service fails or is partitioned, from the
+    service dependency graph (see the service://all resource).
+
+    Args:
+        service (str): The name of the service, or "namespace/name".
+        namespace (str): The namespace of the service. Default is "default".
+
+    Returns:
+        dict: Direct and transitive callers (upstream, the affected set) and callees
+            (downstream) of the service, and the size of the affected set.
+    """
+    try:
+        return service_graph.blast_radius(service, namespace)
+    except Exception as e:
+        logger.error(f"Failed to compute blast radius of {service}: {e}")
+        return {
+            "error": str(e),
+            "suggestion": "Check that the cluster is reachable and the edge file is valid JSON"
+        }
+
+
+@mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def pod_kill(service: str, duration: str, mode: str, value: str, namespace: str = "default") -> dict:
     """
     Kill pods of a service with improved error handling.
@@ -150,6 +554,12 @@ def pod_kill(service: str, duration: str, mode: str, value: str, namespace: str
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def container_kill(service: str, duration: str, mode: str, value: str, container_names: list[str], namespace: str = "default") -> dict:
     """
     Kill containers within a pod.
@@ -177,6 +587,12 @@ def container_kill(service: str, duration: str, mode: str, value: str, container
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def pod_failure(service: str, duration: str, mode: str, value: str, namespace: str = "default") -> dict:
     """
     Inject a failure into pods of a service.
@@ -202,6 +618,12 @@ def pod_failure(service: str, duration: str, mode: str, value: str, namespace: s
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def pod_cpu_stress(service: str, duration: str, mode: str, value: str, container_names: list[str], workers: int, load: int, namespace: str = "default") -> dict:
     """
     Apply CPU stress on pods.
@@ -233,6 +655,12 @@ def pod_cpu_stress(service: str, duration: str, mode: str, value: str, container
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def pod_memory_stress(service: str, duration: str, mode: str, value: str, container_names: list[str], size: str, namespace: str = "default") -> dict:
     """
     Apply memory stress on pods.
@@ -262,7 +690,12 @@ def pod_memory_stress(service: str, duration: str, mode: str, value: str, contai
 
 
 @mcp.tool()
-def host_cpu_stress(address: list[str], duration: str, workers: int, load: int) -> dict:
+@response_verbosity
+@multi_cluster
+@idempotent
+@host_targets
+def host_cpu_stress(address: list[str], duration: str, workers: int, load: int,
+                    namespace: str = "default", shard_size: int = None) -> dict:
     """
     Apply CPU stress to hosts.
 
@@ -271,6 +704,10 @@ def host_cpu_stress(address: list[str], duration: str, workers: int, load: int)
         duration (str): Stress duration.
         workers (int): Number of CPU stress workers.
         load (int): CPU load percentage per worker.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per PhysicalMachineChaos; longer lists are split into shards
+            created concurrently and the result lists the status of every shard. Default is
+            CHAOSMESH_MCP_HOST_SHARD_SIZE (50).
 
     Returns:
         dict: Stress test resource.
@@ -278,6 +715,8 @@ def host_cpu_stress(address: list[str], duration: str, workers: int, load: int)
     return fault_inject.host_stress_test(
         type="HOST_STRESS_CPU",
         address=address,
+        namespace=namespace,
+        shard_size=shard_size,
         duration=duration,
         workers=workers,
         load=load,
@@ -285,7 +724,12 @@ def host_cpu_stress(address: list[str], duration: str, workers: int, load: int)
 
 
 @mcp.tool()
-def host_memory_stress(address: list[str], duration: str, size: str, time: str) -> dict:
+@response_verbosity
+@multi_cluster
+@idempotent
+@host_targets
+def host_memory_stress(address: list[str], duration: str, size: str, time: str,
+                       namespace: str = "default", shard_size: int = None) -> dict:
     """
     Apply memory stress to hosts.
 
@@ -294,6 +738,10 @@ def host_memory_stress(address: list[str], duration: str, size: str, time: str)
         duration (str): Duration of experiment.
         size (str): Memory size to allocate.
         time (str): Time to gradually consume memory.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per PhysicalMachineChaos; longer lists are split into shards
+            created concurrently and the result lists the status of every shard. Default is
+            CHAOSMESH_MCP_HOST_SHARD_SIZE (50).
 
     Returns:
         dict: Memory stress configuration.
@@ -301,6 +749,8 @@ def host_memory_stress(address: list[str], duration: str, size: str, time: str)
     return fault_inject.host_stress_test(
         type="HOST_STRESS_MEMORY",
         address=address,
+        namespace=namespace,
+        shard_size=shard_size,
         duration=duration,
         size=size,
         time=time,
@@ -308,7 +758,12 @@ def host_memory_stress(address: list[str], duration: str, size: str, time: str)
 
 
 @mcp.tool()
-def host_disk_fill(address: list[str], duration: str, size: str, path: str, payload_process_num: int, fill_by_fallocate: bool) -> dict:
+@response_verbosity
+@multi_cluster
+@idempotent
+@host_targets
+def host_disk_fill(address: list[str], duration: str, size: str, path: str, payload_process_num: int, fill_by_fallocate: bool,
+                   namespace: str = "default", shard_size: int = None) -> dict:
     """
     Fill disk on hosts.
 
@@ -319,6 +774,10 @@ def host_disk_fill(address: list[str], duration: str, size: str, path: str, payl
         path (str): Target path.
         payload_process_num (int): Number of fill processes.
         fill_by_fallocate (bool): Use fallocate or not.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per PhysicalMachineChaos; longer lists are split into shards
+            created concurrently and the result lists the status of every shard. Default is
+            CHAOSMESH_MCP_HOST_SHARD_SIZE (50).
 
     Returns:
         dict: Disk fault resource.
@@ -326,6 +785,8 @@ def host_disk_fill(address: list[str], duration: str, size: str, path: str, payl
     return fault_inject.host_disk_fault(
         type="HOST_DISK_FILL",
         address=address,
+        namespace=namespace,
+        shard_size=shard_size,
         size=size,
         path=path,
         duration=duration,
@@ -336,7 +797,12 @@ def host_disk_fill(address: list[str], duration: str, size: str, path: str, payl
 
 
 @mcp.tool()
-def host_read_payload(address: list[str], duration: str, size: str, path: str, payload_process_num: int) -> dict:
+@response_verbosity
+@multi_cluster
+@idempotent
+@host_targets
+def host_read_payload(address: list[str], duration: str, size: str, path: str, payload_process_num: int,
+                      namespace: str = "default", shard_size: int = None) -> dict:
     """
     Read payload on hosts.
 
@@ -346,6 +812,10 @@ def host_read_payload(address: list[str], duration: str, size: str, path: str, p
         size (str): Disk size to fill.
         path (str): Target path.
         payload_process_num (int): The number of processes to read or write the payload.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per PhysicalMachineChaos; longer lists are split into shards
+            created concurrently and the result lists the status of every shard. Default is
+            CHAOSMESH_MCP_HOST_SHARD_SIZE (50).
 
     Returns:
         dict: Disk fault resource.
@@ -353,6 +823,8 @@ def host_read_payload(address: list[str], duration: str, size: str, path: str, p
     return fault_inject.host_disk_fault(
         type="HOST_READ_PAYLOAD",
         address=address,
+        namespace=namespace,
+        shard_size=shard_size,
         size=size,
         path=path,
         duration=duration,
@@ -362,7 +834,12 @@ def host_read_payload(address: list[str], duration: str, size: str, path: str, p
 
 
 @mcp.tool()
-def host_write_payload(address: list[str], duration: str, size: str, path: str, payload_process_num: int) -> dict:
+@response_verbosity
+@multi_cluster
+@idempotent
+@host_targets
+def host_write_payload(address: list[str], duration: str, size: str, path: str, payload_process_num: int,
+                       namespace: str = "default", shard_size: int = None) -> dict:
     """
     Write payload on hosts.
 
@@ -372,6 +849,10 @@ def host_write_payload(address: list[str], duration: str, size: str, path: str,
         size (str): Disk size to fill.
         path (str): Target path.
         payload_process_num (int): The number of processes to read or write the payload.
+        namespace (str): The namespace of the PhysicalMachineChaos. Default is "default".
+        shard_size (int): Addresses per PhysicalMachineChaos; longer lists are split into shards
+            created concurrently and the result lists the status of every shard. Default is
+            CHAOSMESH_MCP_HOST_SHARD_SIZE (50).
 
     Returns:
         dict: Disk fault resource.
@@ -379,6 +860,8 @@ def host_write_payload(address: list[str], duration: str, size: str, path: str,
     return fault_inject.host_disk_fault(
         type="HOST_WRITE_PAYLOAD",
         address=address,
+        namespace=namespace,
+        shard_size=shard_size,
         size=size,
         path=path,
         duration=duration,
@@ -388,6 +871,12 @@ def host_write_payload(address: list[str], duration: str, size: str, path: str,
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_bandwidth(service: str, mode: str, value: str, direction: str, rate: str, limit: int, buffer: int, external_targets: list[str], namespace: str = "default") -> dict:
     """
     Limit network bandwidth to a pod.
@@ -421,6 +910,12 @@ def network_bandwidth(service: str, mode: str, value: str, direction: str, rate:
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_partition(service: str, mode: str, value: str, direction: str, external_targets: list[str], namespace: str = "default") -> dict:
     """
     Apply a network partition for a pod.
@@ -448,28 +943,120 @@ def network_partition(service: str, mode: str, value: str, direction: str, exter
 
 
 @mcp.tool()
-def get_logs(service_name: str, namespace: str, container_name: str) -> dict:
+@multi_cluster
+def get_logs(service_name: str, namespace: str, container_name: str, experiment: str = None,
+             padding_seconds: int = 30, include_previous: bool = True, max_lines: int = 500,
+             summarize: bool = False, tail_lines: int = 50, max_templates: int = 50) -> dict:
     """
     Retrieve logs for the pods of a specific service in a namespace.
 
+    With `experiment` set, the logs cover that experiment's active window instead of the
+    last 50 lines: every pod the experiment targeted is read in parallel from shortly
+    before the injection to shortly after recovery, logs of containers restarted by the
+    fault are included, and all lines are merged in timestamp order. service_name is
+    ignored in this mode (the targets come from the experiment).
+
+    With `summarize` set, repeated lines that differ only in IDs and numbers are folded
+    into templates (e.g. "request served path=<*> latency=<*>") with a count, sample
+    values for each <*>, first/last-seen times and per-pod counts, largest first. Use it
+    to look at thousands of lines in a small response: raise tail_lines, or in experiment
+    mode the whole window of each log (up to 1 MiB per log) is summarized.
+
     Args:
         service_name (str): Name of the service.
-        namespace (str): Namespace of the service.
-        container_name (str): Name of the container.
+        namespace (str): Namespace of the service (and of the experiment).
+        container_name (str): Name of the container. In experiment mode, empty reads all containers.
+        experiment (str): Name of a Chaos Mesh experiment, e.g., "pod-kill-1a2b3c4d".
+        padding_seconds (int): Experiment mode: seconds of log before the start and after the end. Default 30.
+        include_previous (bool): Experiment mode: include logs of the previous container instance
+            for containers that restarted. Default True.
+        max_lines (int): Experiment mode: maximum number of merged raw lines (not applied when summarizing).
+            Default 500.
+        summarize (bool): Return log templates instead of raw lines. Default False.
+        tail_lines (int): Lines to read from the end of each pod's log (not in experiment mode). Default 50.
+        max_templates (int): Maximum number of templates when summarizing. Default 50.
 
     Returns:
-        dict: Dictionary with pod names as keys and logs as values.
+        dict: Dictionary with pod names as keys and logs as values, or in experiment mode
+            the experiment window, per-pod counts and the merged lines
+            ({"ts", "pod", "container", "line", "previous"}). With summarize, "templates"
+            ({"template", "count", "example", "variables", "first_seen", "last_seen", "sources"})
+            replace the lines.
     """
+    if experiment:
+        return kube.get_experiment_logs(
+            experiment=experiment,
+            namespace=namespace,
+            container_name=container_name or None,
+            padding_seconds=padding_seconds,
+            include_previous=include_previous,
+            max_lines=max_lines,
+            summarize=summarize,
+            max_templates=max_templates
+        )
+    if summarize:
+        return kube.summarize_service_logs(
+            service_name=service_name,
+            namespace=namespace,
+            container_name=container_name or None,
+            tail_lines=tail_lines,
+            max_templates=max_templates
+        )
     return kube.get_service_pod_logs(
         service_name=service_name,
         namespace=namespace,
         container_name=container_name,
         type="all",
-        tail_lines=50
+        tail_lines=tail_lines
     )
 
 
 @mcp.tool()
+@multi_cluster
+def search_logs(service_name: str, namespace: str, pattern: str, container_name: str = None,
+                regex: bool = False, ignore_case: bool = False, context_lines: int = 0,
+                max_matches_per_pod: int = 5, max_bytes_per_pod: int = kube.LOG_SEARCH_MAX_BYTES,
+                tail_lines: int = None, since_seconds: int = None) -> dict:
+    """
+    Search the logs of all pods of a service for a substring or regular expression, e.g.,
+    "connection refused" or a trace ID. Pods are read concurrently and each pod's log stops
+    streaming once it has enough matches or hit the byte limit; only matching lines are returned.
+
+    Args:
+        service_name (str): Name of the service.
+        namespace (str): Namespace of the service.
+        pattern (str): Substring (or regular expression if regex is true) to look for.
+        container_name (str): Name of the container. Default is the pod's only container.
+        regex (bool): Treat pattern as a regular expression. Default is False.
+        ignore_case (bool): Case-insensitive matching. Default is False.
+        context_lines (int): Lines of context to include before and after each match. Default is 0.
+        max_matches_per_pod (int): Stop reading a pod's log after this many matches. Default is 5.
+        max_bytes_per_pod (int): Stop reading a pod's log after this many bytes. Default is 1 MiB.
+        tail_lines (int): Only search the last N lines of each log. Default is the last 4000 lines
+            when since_seconds is not given either.
+        since_seconds (int): Only search lines from the last N seconds. Default is no time bound.
+
+    Returns:
+        dict: Matches per pod (line number, line, context), match counts, the pods that matched
+            and how many bytes were read.
+    """
+    return kube.search_service_logs(
+        service_name=service_name,
+        namespace=namespace,
+        pattern=pattern,
+        container_name=container_name,
+        regex=regex,
+        ignore_case=ignore_case,
+        context_lines=context_lines,
+        max_matches_per_pod=max_matches_per_pod,
+        max_bytes_per_pod=max_bytes_per_pod,
+        tail_lines=tail_lines,
+        since_seconds=since_seconds,
+    )
+
+
+@mcp.tool()
+@multi_cluster
 def get_load_test_results() -> str:
     """
     Retrieve and parse the loadgenerator test output logs. Attention: this result is the aggregated result of the beginning of the test to now.
@@ -492,21 +1079,111 @@ def get_load_test_results() -> str:
 
 
 @mcp.tool()
-def delete_experiment(type: str, name: str, namespace: str = "default") -> dict:
+@response_verbosity
+@multi_cluster
+def delete_experiment(name: str, namespace: str = "default", type: str = None) -> dict:
     """
-    Delete a fault injection experiment
+    Delete a fault injection experiment of any kind (created by any injection tool)
     Args:
-        type (str): The type of fault to delete.
         name (str): The name of the experiment to delete.
         namespace (str): The namespace where the experiment is located. Default is "default".
+        type (str): The fault type (e.g. "POD_KILL"), Chaos Mesh kind (e.g. "NetworkChaos") or plural.
+            Default is to find the experiment by name.
     Returns:
         dict: The result of the deletion.
     """
-    return fault_inject.delete_experiment(
-        type=type,
-        name=name,
-        namespace=namespace,
-    )
+    try:
+        return fault_inject.delete_experiment(
+            name=name,
+            namespace=namespace,
+            type=type,
+        )
+    except Exception as e:
+        logger.error(f"Failed to delete experiment {namespace}/{name}: {e}")
+        return {"error": str(e), "suggestion": "Check the name and namespace with list_experiments"}
+
+
+def _experiment_targets(obj: dict) -> int:
+    return len(((obj.get("status") or {}).get("experiment") or {}).get("containerRecords") or [])
+
+
+# list_experiments 可投影字段
+EXPERIMENT_FIELDS = {
+    "name": lambda o: o["metadata"]["name"],
+    "kind": lambda o: o.get("kind"),
+    "namespace": lambda o: o["metadata"].get("namespace"),
+    "action": lambda o: (o.get("spec") or {}).get("action"),
+    "duration": lambda o: (o.get("spec") or {}).get("duration"),
+    "phase": lambda o: ((o.get("status") or {}).get("experiment") or {}).get("desiredPhase"),
+    "targets": _experiment_targets,
+    "creation_timestamp": lambda o: _timestamp(o["metadata"].get("creationTimestamp")),
+}
+
+
+@mcp.tool()
+@response_verbosity
+@multi_cluster
+def get_experiment(name: str, namespace: str = "default", kind: str = None) -> dict:
+    """
+    Get a Chaos Mesh experiment of any kind by name
+    Args:
+        name (str): The name of the experiment.
+        namespace (str): The namespace where the experiment is located. Default is "default".
+        kind (str): The Chaos Mesh kind (e.g. "NetworkChaos") or plural. Default is to probe every kind.
+    Returns:
+        dict: The experiment resource.
+    """
+    try:
+        if kind:
+            resolved = experiments.resolve_kind(kind)
+            if resolved is None:
+                return {"error": f"Unknown Chaos Mesh kind: {kind}",
+                        "suggestion": f"Use one of {sorted(experiments.kinds())} or omit kind"}
+            obj = experiments.get(resolved[1], name, namespace)
+        else:
+            obj = experiments.find(name, namespace)
+        if obj is None:
+            return {"error": f"No Chaos Mesh experiment named '{name}' in namespace '{namespace}'",
+                    "suggestion": "Check the name and namespace with list_experiments"}
+        return obj
+    except Exception as e:
+        logger.error(f"Failed to get experiment {namespace}/{name}: {e}")
+        return {"error": str(e), "suggestion": "Check that Chaos Mesh is installed and the cluster is reachable"}
+
+
+@mcp.tool()
+@response_verbosity
+@multi_cluster
+def list_experiments(namespace: str = "default", kind: str = None, label_selector: str = None,
+                     fields: list[str] = None) -> dict:
+    """
+    List Chaos Mesh experiments of every kind (or one kind) in a namespace
+    Args:
+        namespace (str): The namespace to list. Default is "default".
+        kind (str): Only list this Chaos Mesh kind (e.g. "NetworkChaos") or plural. Default is every kind.
+        label_selector (str): Only return experiments matching this label selector.
+        fields (list[str]): Fields to return for each experiment, out of "name", "kind", "namespace",
+            "action", "duration", "phase", "targets" and "creation_timestamp". Default is all of them,
+            or name, kind, namespace, targets and phase at minimal verbosity.
+    Returns:
+        dict: The experiments, oldest first.
+    """
+    selected = fields or verbosity_levels.default_fields(
+        EXPERIMENT_FIELDS, minimal=["name", "kind", "namespace", "targets", "phase"])
+    unknown = [f for f in selected if f not in EXPERIMENT_FIELDS]
+    if unknown:
+        return {"error": f"Unknown fields {unknown}; valid fields are {list(EXPERIMENT_FIELDS)}",
+                "suggestion": "Pass only valid field names in fields"}
+    try:
+        objects = experiments.list_experiments(namespace, kind=kind, label_selector=label_selector)
+    except ValueError as e:
+        return {"error": str(e), "suggestion": f"Use one of {sorted(experiments.kinds())} or omit kind"}
+    except Exception as e:
+        logger.error(f"Failed to list experiments in namespace {namespace}: {e}")
+        return {"error": str(e), "suggestion": f"Check if namespace '{namespace}' exists and you have permissions to access it"}
+    objects.sort(key=lambda o: (o["metadata"].get("creationTimestamp") or "", o["metadata"]["name"]))
+    items = [{f: EXPERIMENT_FIELDS[f](obj) for f in selected} for obj in objects]
+    return {"namespace": namespace, "experiments": items, "total_count": len(items)}
 
 
 @mcp.tool()
@@ -522,13 +1199,28 @@ def load_generate(rate: int) -> list[str]:
 
 
 @mcp.tool()
-def inject_delay_fault(service: str, delay: int, namespace: str = "default") -> dict:
+@response_verbosity
+@multi_cluster
+@blast_radius_limit
+def inject_delay_fault(service: str, delay: int, namespace: str = "default", duration: str = None,
+                       percentage: float = 100.0, abort_code: int = None, abort_percentage: float = 100.0,
+                       headers: dict[str, str] = None, path: str = None) -> dict:
     """
     Inject a delay fault into a service. Attention: this fault affects the request to the service, not the service itself.
+    If the application already has VirtualServices for the service, the fault is patched into their routes
+    (routing is kept) and remove_delay_fault restores them.
     Args:
         service (str): The name of the service to inject the fault into.
-        delay (int): The delay time in seconds.
+        delay (int): The delay time in seconds. 0 for an abort-only fault.
         namespace (str): The namespace where the service is located. Default is "default".
+        duration (str): How long the fault stays, e.g., "10m". It is removed automatically afterwards,
+            even if remove_delay_fault is never called. Default is until removed.
+        percentage (float): Percentage of requests delayed, e.g., 1 for tail-latency tests. Default is 100.
+        abort_code (int): Also abort requests with this HTTP status, e.g., 503. Default is no abort.
+        abort_percentage (float): Percentage of requests aborted. Default is 100.
+        headers (dict[str, str]): Only affect requests with these header values (exact, or "regex:<re>"),
+            e.g., {"x-chaos": "true"}. Default is all requests.
+        path (str): Only affect requests to this path; a trailing "*" matches a prefix, e.g., "/api/*".
     Returns:
         dict: The result of the fault injection.
     """
@@ -536,10 +1228,18 @@ def inject_delay_fault(service: str, delay: int, namespace: str = "default") ->
         service_name=service,
         delay_seconds=delay,
         namespace=namespace,
+        duration=duration,
+        percentage=percentage,
+        abort_http_status=abort_code,
+        abort_percentage=abort_percentage,
+        headers=headers,
+        path=path,
     )
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
 def remove_delay_fault(service: str, namespace: str = "default") -> dict:
     """
     Remove a delay fault from a service
@@ -553,101 +1253,397 @@ def remove_delay_fault(service: str, namespace: str = "default") -> dict:
 
 
 @mcp.tool()
-def list_namespaces() -> dict:
+def experiment_history(service: str = None, kind: str = None, namespace: str = None, since: str = None,
+                       until: str = None, group_by: str = "kind", recent: int = 10) -> dict:
     """
-    List all available namespaces in the cluster
-    
+    Aggregate the local journal of past experiments, e.g. what was injected into a service last
+    week, how long injection and removal took and the p99 deltas of the attached load tests.
+
+    Args:
+        service (str): Only experiments targeting this service.
+        kind (str): Only this kind, e.g., "NetworkChaos" or "VirtualService" (Istio faults).
+        namespace (str): Only experiments in this namespace.
+        since (str): Only experiments injected after this: a duration ago ("168h", "7d") or an RFC 3339 time.
+        until (str): Only experiments injected before this, in the same format.
+        group_by (str): "kind", "service", "namespace", "cluster", "action" or "day". Default is "kind".
+        recent (int): How many of the newest matching experiments to list. Default is 10.
+
     Returns:
-        dict: List of namespaces with their status
+        dict: Per group the experiment, error and replay counts, average / max injection latency,
+            removals and their latency, load tests and their p99 deltas; plus the recent experiments.
     """
+    if journal.path() is None:
+        return {"error": "The experiment journal is off", "suggestion": "Unset CHAOSMESH_MCP_JOURNAL=off"}
     try:
-        from kubernetes import client
-        v1 = client.CoreV1Api()
-        
-        namespaces = v1.list_namespace()
-        namespace_list = []
-        
-        for ns in namespaces.items:
-            namespace_info = {
-                "name": ns.metadata.name,
-                "status": ns.status.phase,
-                "creation_timestamp": str(ns.metadata.creation_timestamp),
-                "labels": ns.metadata.labels or {}
-            }
-            namespace_list.append(namespace_info)
-        
-        return {
-            "namespaces": namespace_list,
-            "total_count": len(namespace_list)
-        }
-        
+        return journal.aggregate(service=service, kind=kind, namespace=namespace, since=since, until=until,
+                                 group_by=group_by, recent=recent)
+    except ValueError as e:
+        return {"error": str(e), "suggestion": "Use a duration such as '168h' or '7d', or an RFC 3339 time, "
+                                               f"and group_by one of {list(journal.GROUP_BY)}"}
     except Exception as e:
-        logger.error(f"Failed to list namespaces: {e}")
+        logger.error(f"Failed to query the experiment journal: {e}")
+        return {"error": str(e), "suggestion": f"Check that {journal.path()} is a readable SQLite database"}
+
+
+@mcp.tool()
+@multi_cluster
+def attach_load_test(experiment: str, namespace: str = "default", p50_ms: float = None, p99_ms: float = None,
+                     baseline_p99_ms: float = None, error_rate: float = None, summary: dict = None) -> dict:
+    """
+    Attach a load-test summary to an experiment in the journal, so experiment_history can report
+    its p99 delta.
+
+    Args:
+        experiment (str): The experiment name (for Istio faults "<service>-delay").
+        namespace (str): The namespace of the experiment. Default is "default".
+        p50_ms (float): Median latency during the experiment.
+        p99_ms (float): p99 latency during the experiment.
+        baseline_p99_ms (float): p99 latency without the fault; the delta is p99_ms - baseline_p99_ms.
+        error_rate (float): Share of failed requests during the experiment, e.g., 0.02.
+        summary (dict): Any other results to keep, e.g., the parsed get_load_test_results output.
+
+    Returns:
+        dict: The experiment and the recorded p99 delta.
+    """
+    try:
+        return journal.record_load_test(namespace, experiment, p50_ms=p50_ms, p99_ms=p99_ms,
+                                        baseline_p99_ms=baseline_p99_ms, error_rate=error_rate, summary=summary)
+    except LookupError as e:
+        return {"error": str(e), "suggestion": "Check the name with experiment_history or list_experiments"}
+
+
+def _preview(service: Union[str, list[str]], namespace: str, mode: str, value: str) -> dict:
+    try:
+        return pod_index.preview(service, namespace, mode, value)
+    except ValueError as e:
+        return {"error": str(e), "suggestion": "Use mode one or all, or a positive integer value "
+                                               "(a percentage of at most 100 for the percent modes)"}
+    except Exception as e:
+        logger.error(f"Failed to preview targets of {namespace}/{service}: {e}")
+        return {"error": str(e), "suggestion": "Check if you have permissions to list and watch pods in all namespaces"}
+
+
+@mcp.tool()
+async def sweep_fault(fault: str, service: str, values: list[float], namespace: str = "default",
+                      settle: float = 5, hold: float = 30, probe: str = "http", probe_url: str = None,
+                      probe_concurrency: int = 4, parameters: dict = None, services: list[str] = None,
+                      parallel: bool = True, max_blast_radius: int = None, cluster: str = None) -> dict:
+    """
+    Measure how a service responds to increasing fault strength, e.g., p99 at 0, 50, 100, 200
+    and 500 ms of network delay. For every value the fault is applied, held while the service
+    is probed, then removed; the result is a curve table (one row per value). A value of 0
+    injects nothing and is the baseline the p99 deltas refer to. The sweep runs in a worker
+    thread, so other tool calls are served meanwhile.
+
+    Args:
+        fault (str): network_delay (values in ms), network_loss, network_corrupt or network_duplicate (values in %).
+        service (str): The service to sweep, e.g., "cartservice".
+        values (list[float]): Parameter values in order, e.g., [0, 50, 100, 200, 500].
+        namespace (str): The namespace of the service. Default is "default".
+        settle (float): Seconds to wait after applying each step before probing. Default is 5.
+        hold (float): Seconds to probe at each step. Default is 30.
+        probe (str): "http" (requests to probe_url) or "load_test" (the loadgenerator's Locust
+            percentiles, cumulative since the test started). Default is "http".
+        probe_url (str): URL for the http probe; {service} and {namespace} are replaced.
+            Default is CHAOSMESH_MCP_PROBE_URL or http://{service}.{namespace}.svc.cluster.local/.
+        probe_concurrency (int): Concurrent probe requests. Default is 4.
+        parameters (dict): Other arguments of the fault, e.g., {"direction": "both", "mode": "fixed-percent", "value": "50"};
+            service, namespace and duration are set by the sweep and rejected here.
+        services (list[str]): More services to sweep, each with its own experiments and curve.
+        parallel (bool): Sweep the services at the same time when none of them calls another
+            (per the service graph); otherwise they are swept one after another. Default is True.
+        max_blast_radius (int): Refuse the sweep when more than this many upstream services (the
+            union over all swept services, see blast_radius) would be affected. Default is the
+            server setting (CHAOSMESH_MCP_MAX_BLAST_RADIUS).
+        cluster (str): The kubeconfig context to use. Default is the active context.
+
+    Returns:
+        dict: columns and rows (value, p50_ms, p99_ms, p99_delta_ms, error_rate, requests, experiment)
+            of the curve, the baseline p99 and, if the sweep stopped early, the failing step;
+            with `services`, one curve per service under "curves".
+    """
+    targets = fault_inject.services_of([service, *(services or [])])
+    options = dict(settle=settle, hold=hold, probe=probe, probe_url=probe_url,
+                   probe_concurrency=probe_concurrency, parameters=parameters)
+
+    limit = max_blast_radius if max_blast_radius is not None else MAX_BLAST_RADIUS
+
+    def sweep_in_cluster():
+        with cluster_pool.use(cluster):
+            # 与单次注入工具相同的爆炸半径检查，在第一步之前
+            refusal = _check_blast_radius("sweep_fault", targets, namespace, limit) if limit is not None else None
+            if refusal:
+                return refusal
+            if len(targets) == 1:
+                return sweep.run(fault, targets[0], values, namespace, **options)
+            return sweep.run_many(fault, targets, values, namespace, parallel=parallel, **options)
+
+    try:
+        result = await anyio.to_thread.run_sync(contextvars.copy_context().run, sweep_in_cluster)
+    except ValueError as e:
+        return verbosity_levels.dumps({"error": str(e), "suggestion": f"Sweep one of {list(sweep.FAULTS)} over "
+                                       "non-negative values with probe http or load_test, and leave service, "
+                                       "namespace and duration out of parameters"})
+    except Exception as e:
+        logger.error(f"Sweep of {fault} on {targets} failed: {e}")
+        return verbosity_levels.dumps({"error": str(e), "suggestion": "Check the fault parameters and that "
+                                       "Chaos Mesh is installed; leftover steps expire on their own"})
+    # 曲线表用紧凑 JSON 返回
+    return verbosity_levels.dumps(result)
+
+
+@mcp.tool()
+@multi_cluster
+@multi_service
+def preview_targets(service: str, namespace: str = "default", mode: str = "all", value: str = "") -> dict:
+    """
+    Resolve which pods an experiment on a service would select, without creating anything.
+    The selector and mode are evaluated against a cached, watch-updated pod index.
+
+    Args:
+        service (str): The name of the service, e.g., "adservice".
+        namespace (str): The namespace where the service is located. Default is "default".
+        mode (str): one, all, fixed, fixed-percent or random-max-percent, as in the injection tools.
+        value (str): The value for the mode, e.g., the number of pods for fixed or the percentage for fixed-percent.
+
+    Returns:
+        dict: The candidate pods, their count, and min_count / max_count of the pods the mode
+            selects; random is true when Chaos Mesh picks the pods (or their number) at random
+            and whole_service when every candidate is always hit.
+    """
+    return _preview(service, namespace, mode, value)
+
+
+@mcp.tool()
+@multi_cluster
+def find_hosts(zone: str = None, node_labels: dict[str, str] = None, instance_type: str = None,
+               nodes: list[str] = None, ready_only: bool = True, include_labels: bool = False) -> dict:
+    """
+    List cluster nodes with their zone, instance type and chaosd address, from a cached,
+    watch-updated node inventory. The same filters can be passed to the host tools
+    (host_cpu_stress, host_disk_fill, ...) instead of an address list.
+
+    Args:
+        zone (str): Only nodes in this zone (topology.kubernetes.io/zone), e.g., "us-east-2a".
+        node_labels (dict[str, str]): Only nodes carrying all these labels.
+        instance_type (str): Only nodes of this instance type, e.g., "m5.large".
+        nodes (list[str]): Only these nodes.
+        ready_only (bool): Skip nodes that are not Ready or are cordoned. Default is True.
+        include_labels (bool): Include every node's labels. Default is False.
+
+    Returns:
+        dict: The matching nodes with node, zone, instance_type, internal_ip, address and source
+            ("physical_machine" or "node_ip"), the count per zone and the resolved addresses.
+    """
+    try:
+        inventory = node_inventory.get()
+        matched = inventory.select(zone=zone, labels=node_labels, instance_type=instance_type,
+                                   nodes=nodes, ready_only=ready_only)
+    except Exception as e:
+        logger.error(f"Failed to list hosts: {e}")
+        return {"error": str(e), "suggestion": "Check if you have permissions to list and watch nodes"}
+    zones = {}
+    for entry in matched:
+        zones[entry["zone"]] = zones.get(entry["zone"], 0) + 1
+        if not include_labels:
+            del entry["labels"]
+    return {
+        "hosts": matched,
+        "count": len(matched),
+        "zones": zones,
+        "addresses": [entry["address"] for entry in matched if entry["address"]],
+        "snapshot_version": inventory.source.version,
+    }
+
+
+@mcp.tool()
+@multi_cluster
+def find_services(query: str, namespace: str = None, limit: int = 10) -> dict:
+    """
+    Find services across all namespaces by name in one call. Matches are ranked exact,
+    prefix, then substring, e.g., "checkout" finds "checkoutservice"; when nothing matches
+    literally, close (fuzzy) matches are returned to catch typos.
+
+    Args:
+        query (str): Full or partial service name.
+        namespace (str): Only return services in this namespace. Default is all namespaces.
+        limit (int): Maximum number of matches to return. Default is 10.
+
+    Returns:
+        dict: Matches with namespace, service name, selector labels, match type and score.
+    """
+    try:
+        return service_index.find(query, namespace=namespace, limit=limit)
+    except Exception as e:
+        logger.error(f"Failed to find services matching '{query}': {e}")
         return {
             "error": str(e),
-            "suggestion": "Check if you have permissions to list namespaces"
+            "suggestion": "Check if you have permissions to list and watch services in all namespaces"
         }
 
 
+def _timestamp(value) -> str:
+    """Render an API timestamp the way the kubernetes models print it, e.g. '2024-05-01 10:00:00+00:00'."""
+    if not value:
+        return "None"
+    return str(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+# 可投影字段 -> 从原始 JSON 对象取值的函数
+NAMESPACE_FIELDS = {
+    "name": lambda o: o["metadata"]["name"],
+    "status": lambda o: (o.get("status") or {}).get("phase"),
+    "creation_timestamp": lambda o: _timestamp(o["metadata"].get("creationTimestamp")),
+    "labels": lambda o: o["metadata"].get("labels") or {},
+}
+
+SERVICE_FIELDS = {
+    "name": lambda o: o["metadata"]["name"],
+    "type": lambda o: o["spec"].get("type"),
+    "cluster_ip": lambda o: o["spec"].get("clusterIP"),
+    "ports": lambda o: [{"port": p.get("port"), "target_port": p.get("targetPort"), "protocol": p.get("protocol")}
+                        for p in o["spec"].get("ports") or []],
+    "labels": lambda o: o["metadata"].get("labels") or {},
+    "creation_timestamp": lambda o: _timestamp(o["metadata"].get("creationTimestamp")),
+}
+
+
+def _list_page(list_func, projections: dict, fields: list[str] = None, limit: int = None,
+               continue_token: str = None, label_selector: str = None, field_selector: str = None,
+               **kwargs) -> dict:
+    """
+    Fetch one page from a kubernetes list call as raw JSON and project each item onto
+    the requested fields. Raises ValueError for unknown fields.
+    """
+    selected = fields or list(projections)
+    unknown = [f for f in selected if f not in projections]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; valid fields are {list(projections)}")
+    params = {k: v for k, v in {
+        "limit": limit,
+        "_continue": continue_token,
+        "label_selector": label_selector,
+        "field_selector": field_selector,
+    }.items() if v}
+    response = list_func(_preload_content=False, **params, **kwargs)
+    data = json.loads(response.data)
+    extractors = [(f, projections[f]) for f in selected]
+    items = [{f: extract(obj) for f, extract in extractors} for obj in data.get("items") or []]
+    meta = data.get("metadata") or {}
+    page = {"items": items, "continue": meta.get("continue") or None}
+    if meta.get("remainingItemCount") is not None:
+        page["remaining_item_count"] = meta["remainingItemCount"]
+    return page
+
+
+def _list_error(e: Exception, suggestion: str) -> dict:
+    if isinstance(e, ValueError):
+        return {"error": str(e), "suggestion": "Pass only valid field names in fields"}
+    if getattr(e, "status", None) == 410:
+        return {"error": str(e), "suggestion": "The continue token expired; start again without continue_token"}
+    return {"error": str(e), "suggestion": suggestion}
+
+
 @mcp.tool()
-def list_services_in_namespace(namespace: str = "default") -> dict:
+@response_verbosity
+@multi_cluster
+def list_namespaces(limit: int = None, continue_token: str = None, label_selector: str = None,
+                    field_selector: str = None, fields: list[str] = None) -> dict:
+    """
+    List all available namespaces in the cluster
+
+    Args:
+        limit (int): Maximum number of namespaces to return. Default is all of them.
+        continue_token (str): The "continue" value of the previous page to fetch the next one.
+        label_selector (str): Only return namespaces matching this label selector, e.g., "team=shop".
+        field_selector (str): Only return namespaces matching this field selector, e.g., "status.phase=Active".
+        fields (list[str]): Fields to return for each namespace, out of "name", "status",
+            "creation_timestamp" and "labels". Default is name and status; name only at minimal
+            verbosity and all of them at full.
+
+    Returns:
+        dict: List of namespaces with their status, and "continue" when more pages are available
+    """
+    try:
+        v1 = cluster_pool.core_v1()
+        fields = fields or verbosity_levels.default_fields(NAMESPACE_FIELDS, minimal=["name"],
+                                                            normal=["name", "status"])
+        page = _list_page(v1.list_namespace, NAMESPACE_FIELDS, fields, limit, continue_token,
+                          label_selector, field_selector)
+        result = {
+            "namespaces": page.pop("items"),
+        }
+        result["total_count"] = len(result["namespaces"])
+        result.update(page)
+        return result
+
+    except Exception as e:
+        logger.error(f"Failed to list namespaces: {e}")
+        return _list_error(e, "Check if you have permissions to list namespaces")
+
+
+@mcp.tool()
+@response_verbosity
+@multi_cluster
+def list_services_in_namespace(namespace: str = "default", limit: int = None, continue_token: str = None,
+                               label_selector: str = None, field_selector: str = None,
+                               fields: list[str] = None) -> dict:
     """
     List all services in a specific namespace
-    
+
     Args:
         namespace (str): The namespace to list services from. Default is "default".
-    
+        limit (int): Maximum number of services to return. Default is all of them.
+        continue_token (str): The "continue" value of the previous page to fetch the next one.
+        label_selector (str): Only return services matching this label selector, e.g., "app=cartservice".
+        field_selector (str): Only return services matching this field selector, e.g., "metadata.name=redis".
+        fields (list[str]): Fields to return for each service, out of "name", "type", "cluster_ip",
+            "ports", "labels" and "creation_timestamp". Default is name, type, cluster_ip and ports;
+            name only at minimal verbosity and all of them at full.
+
     Returns:
-        dict: List of services in the namespace
+        dict: List of services in the namespace, and "continue" when more pages are available
     """
     try:
-        from kubernetes import client
-        v1 = client.CoreV1Api()
-        
-        services = v1.list_namespaced_service(namespace=namespace)
-        service_list = []
-        
-        for svc in services.items:
-            service_info = {
-                "name": svc.metadata.name,
-                "type": svc.spec.type,
-                "cluster_ip": svc.spec.cluster_ip,
-                "ports": [{"port": port.port, "target_port": port.target_port, "protocol": port.protocol} 
-                         for port in svc.spec.ports] if svc.spec.ports else [],
-                "labels": svc.metadata.labels or {},
-                "creation_timestamp": str(svc.metadata.creation_timestamp)
-            }
-            service_list.append(service_info)
-        
-        return {
+        v1 = cluster_pool.core_v1()
+        fields = fields or verbosity_levels.default_fields(SERVICE_FIELDS, minimal=["name"],
+                                                            normal=["name", "type", "cluster_ip", "ports"])
+        page = _list_page(v1.list_namespaced_service, SERVICE_FIELDS, fields, limit, continue_token,
+                          label_selector, field_selector, namespace=namespace)
+        result = {
             "namespace": namespace,
-            "services": service_list,
-            "total_count": len(service_list)
+            "services": page.pop("items"),
         }
-        
+        result["total_count"] = len(result["services"])
+        result.update(page)
+        return result
+
     except Exception as e:
         logger.error(f"Failed to list services in namespace {namespace}: {e}")
-        return {
-            "error": str(e),
-            "namespace": namespace,
-            "suggestion": f"Check if namespace '{namespace}' exists and you have permissions to access it"
-        }
+        result = _list_error(e, f"Check if namespace '{namespace}' exists and you have permissions to access it")
+        result["namespace"] = namespace
+        return result
 
 
 @mcp.resource(
     uri="service://all",
     name="all_services",
     description="All services in the cluster and their call relationships.",
+    mime_type="application/json",
 )
-def all_services() -> list[dict]:
+def all_services() -> str:
     """
-    Get all services in the cluster
+    Get all services in the cluster and their call relationships as a compact adjacency list:
+    nodes[i] is "namespace/name", endpoints[i] its ready endpoint count (null when the
+    service only appears in the edge file) and edges[i] the indexes of the services it calls.
     Returns:
-        list[dict]: A list of all services in the cluster.
+        str: The service graph as JSON.
     """
-    with open("services.json", "r") as f:
-        data = json.load(f)
-    return data
+    try:
+        return service_graph.get_json()
+    except Exception as e:
+        logger.error(f"Failed to build service graph: {e}")
+        return json.dumps({"error": str(e)})
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -655,6 +1651,12 @@ def all_services() -> list[dict]:
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_delay(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                   latency: str = "100ms", jitter: str = "0ms", correlation: str = "0",
                   direction: str = "to", external_targets: list[str] = None,
@@ -667,6 +1669,12 @@ def network_delay(service: str, duration: str = "1m", mode: str = "all", value:
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_loss(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                  loss: str = "50", correlation: str = "0",
                  direction: str = "to", external_targets: list[str] = None,
@@ -678,6 +1686,12 @@ def network_loss(service: str, duration: str = "1m", mode: str = "all", value: s
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_corrupt(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                     corrupt: str = "50", correlation: str = "0",
                     direction: str = "to", external_targets: list[str] = None,
@@ -690,6 +1704,12 @@ def network_corrupt(service: str, duration: str = "1m", mode: str = "all", value
 
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def network_duplicate(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                       duplicate: str = "50", correlation: str = "0",
                       direction: str = "to", external_targets: list[str] = None,
@@ -706,6 +1726,12 @@ def network_duplicate(service: str, duration: str = "1m", mode: str = "all", val
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def dns_chaos(service: str, duration: str = "1m", mode: str = "all", value: str = "",
               action: str = "error", scope: str = "outer",
               patterns: list[str] = None,
@@ -721,6 +1747,12 @@ def dns_chaos(service: str, duration: str = "1m", mode: str = "all", value: str
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def http_chaos(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                target: str = "Request", port: int = 80,
                action: str = "delay", delay: str = "1s",
@@ -739,6 +1771,12 @@ def http_chaos(service: str, duration: str = "1m", mode: str = "all", value: str
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def io_chaos(service: str, duration: str = "1m", mode: str = "all", value: str = "",
              action: str = "latency", volume_path: str = "/",
              path: str = "**/*", delay: str = "100ms", errno: int = None,
@@ -756,6 +1794,12 @@ def io_chaos(service: str, duration: str = "1m", mode: str = "all", value: str =
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def time_chaos(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                time_offset: str = "-5m", container_names: list[str] = None,
                namespace: str = "default") -> dict:
@@ -770,6 +1814,12 @@ def time_chaos(service: str, duration: str = "1m", mode: str = "all", value: str
 # ─────────────────────────────────────────────────────────────────────────────
 
 @mcp.tool()
+@response_verbosity
+@multi_cluster
+@idempotent
+@multi_service
+@target_preview
+@blast_radius_limit
 def kernel_chaos(service: str, duration: str = "1m", mode: str = "all", value: str = "",
                  fail_kern_request: dict = None,
                  namespace: str = "default") -> dict:
@@ -779,6 +1829,51 @@ def kernel_chaos(service: str, duration: str = "1m", mode: str = "all", value: s
                                      fail_kern_request=fail_kern_request)
 
 
+# HTTP 模式下按工具类别限制并发（未列出的工具属于 "read"）
+TOOL_CLASSES = {
+    **{name: "inject" for name in (
+        "pod_kill", "container_kill", "pod_failure", "pod_cpu_stress", "pod_memory_stress",
+        "host_cpu_stress", "host_memory_stress", "host_disk_fill", "host_read_payload", "host_write_payload",
+        "network_bandwidth", "network_partition", "network_delay", "network_loss", "network_corrupt",
+        "network_duplicate", "dns_chaos", "http_chaos", "io_chaos", "time_chaos", "kernel_chaos",
+        "inject_delay_fault", "remove_delay_fault", "delete_experiment", "sweep_fault")},
+    **{name: "logs" for name in ("get_logs", "search_logs", "get_load_test_results")},
+    "load_generate": "load",
+}
+
+
+def serve_http(transport: str, host: str, port: int, max_connections: int = None):
+    """
+    Run the SSE or streamable HTTP transport with uvicorn, optionally capping open
+    connections (uvicorn answers 503 beyond the cap).
+    """
+    import uvicorn
+
+    mcp.settings.host, mcp.settings.port = host, port
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        # FastMCP 只为回环地址开启 DNS rebinding 保护（Host 头白名单），与 mcp.run 保持一致
+        mcp.settings.transport_security = None
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning",
+                            limit_concurrency=max_connections, timeout_graceful_shutdown=5)
+    anyio.run(uvicorn.Server(config).serve)
+
+
+def _reaper_contexts() -> list:
+    """
+    The clusters whose delay faults are rescheduled at startup: the default context (None)
+    and every other kubeconfig context, since faults injected with `cluster=` carry their
+    expiry in that cluster only.
+    """
+    try:
+        contexts, current = cluster_pool.list_contexts()
+    except Exception as e:
+        # 集群内运行（ServiceAccount）时没有 kubeconfig，只有默认集群
+        logger.info(f"No kubeconfig contexts to reschedule delay faults in ({e}); using the default cluster only")
+        return [None]
+    return [None] + [context for context in contexts if context != current]
+
+
 def main():
     """
     Main function to run the Chaos Mesh MCP server
@@ -791,6 +1886,24 @@ def main():
                         help="Skip environment check on startup.")
     parser.add_argument('--kubeconfig', type=str,
                         help="Path to kubeconfig file (overrides KUBECONFIG env var).")
+    parser.add_argument('--host', type=str, default=os.environ.get("FASTMCP_HOST", "127.0.0.1"),
+                        help="Address to listen on (sse / streamable-http).")
+    parser.add_argument('--port', type=int, default=int(os.environ.get("FASTMCP_PORT", "8000")),
+                        help="Port to listen on (sse / streamable-http).")
+    parser.add_argument('--max-in-flight', type=str,
+                        help="Concurrent tool calls per class, e.g. 'inject=4,logs=8,read=16,load=1' "
+                             "(sse / streamable-http; default CHAOSMESH_MCP_MAX_IN_FLIGHT).")
+    parser.add_argument('--queue-size', type=str,
+                        help="Calls allowed to wait per class before new ones are rejected "
+                             "(default CHAOSMESH_MCP_QUEUE_SIZE or 32).")
+    parser.add_argument('--call-timeout', type=str,
+                        help="Seconds per tool call including queueing, per class, e.g. 'inject=180,read=60' "
+                             "(default CHAOSMESH_MCP_CALL_TIMEOUT or 120).")
+    parser.add_argument('--max-connections', type=int,
+                        help="Maximum open HTTP connections; further requests get 503.")
+    parser.add_argument('--verbosity', choices=verbosity_levels.LEVELS,
+                        help="Default response verbosity of the injection and list tools "
+                             "(default CHAOSMESH_MCP_VERBOSITY or normal).")
     
     args = parser.parse_args()
     
@@ -799,13 +1912,26 @@ def main():
         os.environ['KUBECONFIG'] = args.kubeconfig
         logger.info(f"Using kubeconfig: {args.kubeconfig}")
     
-    # 环境检查
-    if not args.skip_env_check:
+    # 环境检查（回放录制的流量时不需要集群）
+    if not args.skip_env_check and not recorder.replaying():
         if not check_environment():
             logger.error("Environment check failed. Use --skip-env-check to bypass.")
             exit(1)
     
+    if args.verbosity:
+        verbosity_levels.DEFAULT_LEVEL = args.verbosity
+
     logger.info("Starting Chaos Mesh MCP server...")
+    # 重建 Istio 延迟故障的到期计划，服务停机期间到期的故障会立即删除
+    if not recorder.replaying():
+        kube.start_fault_reaper(_reaper_contexts())
+    if args.transport in ("sse", "streamable-http"):
+        # 多个会话共享一个进程：工具调用放到工作线程中，并按类别限流
+        admission.install(mcp, TOOL_CLASSES, max_in_flight=args.max_in_flight,
+                          queue_size=args.queue_size, timeout=args.call_timeout)
+        logger.info(f"Listening on http://{args.host}:{args.port} ({args.transport})")
+        serve_http(args.transport, args.host, args.port, max_connections=args.max_connections)
+        return
     mcp.run(transport=args.transport)
 
 
@@ -0,0 +1,372 @@
+"""
+Live service-dependency graph served by the service://all resource.
+
+Nodes are the cluster's Services ("namespace/name") with their ready endpoint counts,
+taken from the shared Services/Endpoints informers. Call edges cannot be read from the
+API server, so they come from an optional static edge file named by
+CHAOSMESH_MCP_SERVICE_EDGES:
+
+    {
+      "namespace": "shop",                      # namespace for bare service names
+      "edges": {
+        "frontend": ["cartservice", "productcatalogservice"],
+        "checkoutservice": ["cartservice", "payments/paymentservice"]
+      }
+    }
+
+"edges" may also be a list of [caller, callee] pairs. Services that only appear in the
+edge file are kept as nodes with endpoints = null.
+
+The built graph and its JSON are cached per kubeconfig context and rebuilt only when
+the informer versions or the edge file's mtime change.
+
+Transitive upstream/downstream closures (for blast_radius) are kept separately as
+bitsets over the services that have edges. Node and endpoint churn does not touch them;
+new edges are folded in incrementally and only removed edges force a recomputation.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import cluster_pool
+import informer
+
+logger = logging.getLogger(__name__)
+
+EDGE_FILE_ENV = "CHAOSMESH_MCP_SERVICE_EDGES"
+
+_edge_cache = {}
+_graphs = {}
+_reachability = {}
+_lock = threading.Lock()
+
+
+def _bits(x: int):
+    """Yield the indexes of the set bits of x."""
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+def _components(n: int, out: list) -> list[list[int]]:
+    """Strongly connected components (iterative Tarjan), sinks first."""
+    index, low, on_stack = [None] * n, [0] * n, [False] * n
+    stack, components, counter = [], [], 0
+    for root in range(n):
+        if index[root] is not None:
+            continue
+        work = [(root, iter(out[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, children = work[-1]
+            for w in children:
+                if index[w] is None:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(out[w])))
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[v])
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+    return components
+
+
+def _closures(n: int, out: list) -> list[int]:
+    """For every node, the bitset of nodes reachable from it (itself only if on a cycle)."""
+    components = _components(n, out)
+    component_of = [0] * n
+    for c, members in enumerate(components):
+        for v in members:
+            component_of[v] = c
+    reach, member_bits = [], []
+    for c, members in enumerate(components):
+        bits = 0
+        mask = 0
+        for v in members:
+            mask |= 1 << v
+        cyclic = len(members) > 1
+        for v in members:
+            for w in out[v]:
+                target = component_of[w]
+                if target == c:
+                    cyclic = True
+                else:
+                    bits |= reach[target] | member_bits[target]
+        if cyclic:
+            bits |= mask
+        reach.append(bits)
+        member_bits.append(mask)
+    return [reach[component_of[v]] for v in range(n)]
+
+
+class Reachability:
+    """
+    Transitive closures over the edge set: down[i] holds the services node i calls
+    directly or indirectly, up[i] the services that (transitively) call node i.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.out = []
+        self.into = []
+        self.down = []
+        self.up = []
+        self.edges = set()
+        self.rebuilds = 0
+        self.incremental_updates = 0
+
+    def _node(self, name: str) -> int:
+        i = self.index.get(name)
+        if i is None:
+            i = len(self.names)
+            self.names.append(name)
+            self.index[name] = i
+            self.out.append(set())
+            self.into.append(set())
+            self.down.append(0)
+            self.up.append(0)
+        return i
+
+    def update(self, edges) -> None:
+        """Bring the closures in line with a new edge list."""
+        edges = set(edges)
+        if self.edges - edges:
+            self._rebuild(edges)
+            return
+        for caller, callee in sorted(edges - self.edges):
+            self._add_edge(caller, callee)
+            self.incremental_updates += 1
+
+    def _rebuild(self, edges: set) -> None:
+        self.names, self.index, self.out, self.into = [], {}, [], []
+        for caller, callee in sorted(edges):
+            u, v = self._node(caller), self._node(callee)
+            self.out[u].add(v)
+            self.into[v].add(u)
+        self.edges = edges
+        n = len(self.names)
+        self.down = _closures(n, self.out)
+        self.up = _closures(n, self.into)
+        self.rebuilds += 1
+
+    def _add_edge(self, caller: str, callee: str) -> None:
+        u, v = self._node(caller), self._node(callee)
+        self.out[u].add(v)
+        self.into[v].add(u)
+        self.edges.add((caller, callee))
+        # u 及其所有上游现在都能到达 v 及其所有下游，反之亦然
+        downstream = self.down[v] | (1 << v)
+        upstream = self.up[u] | (1 << u)
+        for a in _bits(upstream):
+            self.down[a] |= downstream
+        for d in _bits(downstream):
+            self.up[d] |= upstream
+
+    def _names(self, bits: int, exclude: int) -> list[str]:
+        return sorted(self.names[i] for i in _bits(bits & ~(1 << exclude)))
+
+    def upstream(self, name: str) -> list[str]:
+        i = self.index.get(name)
+        return [] if i is None else self._names(self.up[i], i)
+
+    def downstream(self, name: str) -> list[str]:
+        i = self.index.get(name)
+        return [] if i is None else self._names(self.down[i], i)
+
+    def callers(self, name: str) -> list[str]:
+        i = self.index.get(name)
+        return [] if i is None else sorted(self.names[j] for j in self.into[i])
+
+    def callees(self, name: str) -> list[str]:
+        i = self.index.get(name)
+        return [] if i is None else sorted(self.names[j] for j in self.out[i])
+
+
+class ServiceGraph:
+    """
+    Immutable adjacency-list graph. Node i is nodes[i]; out[i] and into[i] are sorted
+    tuples of callee and caller indexes.
+    """
+
+    def __init__(self, nodes: list[str], endpoints: list, out: list[tuple], version: int, edge_file: str = None):
+        self.nodes = nodes
+        self.index = {name: i for i, name in enumerate(nodes)}
+        self.endpoints = endpoints
+        self.out = out
+        into = [[] for _ in nodes]
+        for caller, callees in enumerate(out):
+            for callee in callees:
+                into[callee].append(caller)
+        self.into = [tuple(sorted(callers)) for callers in into]
+        self.version = version
+        self.edge_file = edge_file
+        self.built_at = time.time()
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(callees) for callees in self.out)
+
+    def node_id(self, service: str, namespace: str = "default"):
+        """Index of a service given as "name" (in `namespace`) or "namespace/name", or None."""
+        return self.index.get(service if "/" in service else f"{namespace}/{service}")
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "nodes": self.nodes,
+            "endpoints": self.endpoints,
+            "edges": [list(callees) for callees in self.out],
+            "node_count": len(self.nodes),
+            "edge_count": self.edge_count,
+            "edge_file": self.edge_file,
+            "built_at": self.built_at,
+        }
+
+
+def _qualify(name: str, namespace: str) -> str:
+    return name if "/" in name else f"{namespace}/{name}"
+
+
+def load_edges(path: str) -> list[tuple[str, str]]:
+    """Read (caller, callee) pairs from an edge file, re-reading only when its mtime changes."""
+    mtime = os.stat(path).st_mtime
+    cached = _edge_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r") as f:
+        data = json.load(f)
+    namespace = data.get("namespace", "default") if isinstance(data, dict) else "default"
+    raw = data.get("edges", data) if isinstance(data, dict) else data
+    if isinstance(raw, dict):
+        pairs = [(caller, callee) for caller, callees in raw.items() if caller != "namespace"
+                 for callee in callees]
+    else:
+        pairs = [tuple(pair) for pair in raw]
+    edges = sorted({(_qualify(a, namespace), _qualify(b, namespace)) for a, b in pairs})
+    _edge_cache[path] = (mtime, edges)
+    logger.info(f"Loaded {len(edges)} service edges from {path}")
+    return edges
+
+
+def _edge_file_state():
+    path = os.environ.get(EDGE_FILE_ENV)
+    if not path:
+        return None, None
+    try:
+        return path, os.stat(path).st_mtime
+    except OSError as e:
+        logger.warning(f"Service edge file {path} is not readable: {e}")
+        return path, None
+
+
+def _build(services: dict, endpoints: dict, edges: list, version: int, edge_file: str) -> ServiceGraph:
+    names = {f"{ns}/{name}" for ns, name in services}
+    for caller, callee in edges:
+        names.add(caller)
+        names.add(callee)
+    nodes = sorted(names)
+    index = {name: i for i, name in enumerate(nodes)}
+
+    counts = []
+    for node in nodes:
+        namespace, name = node.split("/", 1)
+        if (namespace, name) not in services:
+            counts.append(None)
+        else:
+            ep = endpoints.get((namespace, name))
+            counts.append(ep["ready"] if ep else 0)
+
+    out = [set() for _ in nodes]
+    for caller, callee in edges:
+        out[index[caller]].add(index[callee])
+    return ServiceGraph(nodes, counts, [tuple(sorted(s)) for s in out], version, edge_file)
+
+
+def _state() -> dict:
+    """Return the cache entry for the active context, rebuilding the graph when inputs changed."""
+    services_inf, endpoints_inf = informer.services(), informer.endpoints()
+    services_inf.ensure_fresh()
+    endpoints_inf.ensure_fresh()
+    edge_file, mtime = _edge_file_state()
+    fingerprint = (services_inf.version, endpoints_inf.version, edge_file, mtime)
+
+    context = cluster_pool.active()
+    with _lock:
+        entry = _graphs.get(context)
+        if entry and entry["fingerprint"] == fingerprint:
+            return entry
+
+        edges = load_edges(edge_file) if edge_file and mtime is not None else []
+        reach = _reachability.setdefault(context, Reachability())
+        reach.update(edges)
+        version = entry["graph"].version + 1 if entry else 1
+        graph = _build(services_inf.snapshot(), endpoints_inf.snapshot(), edges, version, edge_file)
+        entry = {"fingerprint": fingerprint, "graph": graph, "json": None}
+        _graphs[context] = entry
+        logger.info(f"Built service graph v{version}: {len(graph.nodes)} services, {graph.edge_count} edges")
+        return entry
+
+
+def get_graph() -> ServiceGraph:
+    return _state()["graph"]
+
+
+def get_json() -> str:
+    """The graph as compact JSON, serialised once per graph version."""
+    entry = _state()
+    if entry["json"] is None:
+        entry["json"] = json.dumps(entry["graph"].to_dict(), separators=(",", ":"))
+    return entry["json"]
+
+
+def blast_radius(service: str, namespace: str = "default") -> dict:
+    """
+    Services affected when `service` fails: every transitive caller (upstream), plus
+    what the service itself depends on (downstream) for context.
+    """
+    graph = get_graph()
+    name = service if "/" in service else f"{namespace}/{service}"
+    node = graph.index.get(name)
+    if node is None:
+        return {
+            "error": f"Service '{name}' is not in the service graph",
+            "suggestion": "Check the service name and namespace, or add it to the edge file"
+        }
+    with _lock:
+        reach = _reachability.get(cluster_pool.active()) or Reachability()
+        upstream = reach.upstream(name)
+        result = {
+            "service": name,
+            "endpoints": graph.endpoints[node],
+            "direct_callers": reach.callers(name),
+            "direct_callees": reach.callees(name),
+            "upstream": upstream,
+            "downstream": reach.downstream(name),
+            "affected_count": len(upstream),
+            "graph_version": graph.version,
+        }
+    if not graph.edge_file:
+        result["note"] = f"No call edges are configured; set {EDGE_FILE_ENV} to an edge file"
+    return result
@@ -0,0 +1,125 @@
+"""
+Cluster-wide service lookup by name.
+
+The index sits on the shared Services informer (one list_service_for_all_namespaces
+snapshot kept fresh by a watch) and is updated from its change events, so resolving
+"checkout" to (namespace, service, selector) never touches the API server. Lookups
+rank exact names first, then prefixes and substrings; fuzzy matching (for typos) is used
+only when nothing matches literally.
+"""
+import bisect
+import difflib
+import threading
+
+import cluster_pool
+import informer
+
+FUZZY_CUTOFF = 0.6
+
+_indexes = {}
+_registry_lock = threading.Lock()
+
+
+class ServiceIndex:
+    """Lower-cased service name -> {(namespace, name)}, plus a sorted name list for prefix search."""
+
+    def __init__(self, source: informer.Informer):
+        self.source = source
+        self._by_name = {}
+        self._names = []
+        self._lock = threading.Lock()
+        source.add_listener(self._on_event)
+
+    def _on_event(self, event_type, key, old, new):
+        name = key[1].lower()
+        with self._lock:
+            if event_type == "DELETED":
+                keys = self._by_name.get(name)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._by_name[name]
+                        del self._names[bisect.bisect_left(self._names, name)]
+            elif event_type == "ADDED":
+                keys = self._by_name.get(name)
+                if keys is None:
+                    self._by_name[name] = {key}
+                    bisect.insort(self._names, name)
+                else:
+                    keys.add(key)
+
+    def _prefixed(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self._names, prefix)
+        end = bisect.bisect_left(self._names, prefix + "\uffff")
+        return self._names[start:end]
+
+    def search(self, query: str, namespace: str = None, limit: int = 10) -> list[dict]:
+        """Return up to `limit` matches for `query`, best first."""
+        self.source.ensure_fresh()
+        query = query.strip().lower()
+        with self._lock:
+            ranked = []
+            if query in self._by_name:
+                ranked.append((query, "exact", 1.0))
+            seen = {query}
+            for name in self._prefixed(query):
+                if name not in seen:
+                    ranked.append((name, "prefix", round(0.9 * len(query) / len(name) + 0.05, 3)))
+                    seen.add(name)
+            if len(ranked) < limit:
+                for name in self._names:
+                    if query in name and name not in seen:
+                        ranked.append((name, "substring", round(0.8 * len(query) / len(name), 3)))
+                        seen.add(name)
+            if not ranked:
+                # 只有在没有字面匹配时才做模糊匹配（纠正拼写错误）
+                for name in difflib.get_close_matches(query, self._names, n=limit, cutoff=FUZZY_CUTOFF):
+                    if name not in seen:
+                        ratio = difflib.SequenceMatcher(None, query, name).ratio()
+                        ranked.append((name, "fuzzy", round(0.7 * ratio, 3)))
+                        seen.add(name)
+            candidates = [(key, match, score) for name, match, score in ranked
+                          for key in sorted(self._by_name[name])
+                          if namespace is None or key[0] == namespace]
+
+        order = {"exact": 0, "prefix": 1, "substring": 2, "fuzzy": 3}
+        candidates.sort(key=lambda c: (order[c[1]], -c[2], c[0]))
+        results = []
+        for (ns, name), match, score in candidates[:limit]:
+            service = self.source.get(ns, name) or {}
+            results.append({
+                "namespace": ns,
+                "service": name,
+                "selector": service.get("selector") or {},
+                "match": match,
+                "score": score,
+            })
+        return results
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(keys) for keys in self._by_name.values())
+
+
+def get() -> ServiceIndex:
+    """The service index of the active kubeconfig context."""
+    context = cluster_pool.active()
+    with _registry_lock:
+        index = _indexes.get(context)
+        if index is None:
+            index = ServiceIndex(informer.services())
+            _indexes[context] = index
+        return index
+
+
+def find(query: str, namespace: str = None, limit: int = 10) -> dict:
+    index = get()
+    matches = index.search(query, namespace=namespace, limit=limit)
+    return {
+        "query": query,
+        "matches": matches,
+        "total_count": len(matches),
+        "indexed_services": index.size,
+        "snapshot_version": index.source.version,
+    }
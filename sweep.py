@@ -0,0 +1,310 @@
+"""
+Fault parameter sweeps.
+
+How a service's p99 responds to 0, 50, 100, 200 and 500 ms of network delay (or 1-20 %
+packet loss) used to take one inject / wait / measure / delete round per value. run()
+walks the values itself; for every step it
+
+    1. applies the fault with the parameter set to the value (a value of 0 applies nothing
+       and measures the baseline),
+    2. waits `settle` seconds for Chaos Mesh to inject it into the pods,
+    3. probes for `hold` seconds,
+    4. deletes the experiment and attaches the probe result to it in the experiment journal,
+
+and returns the curve as a compact table: one row per value with p50 / p99, the p99 delta
+against the baseline (the 0 step, otherwise the first step) and the error rate.
+
+Probes:
+
+    http       requests against probe_url ({service} and {namespace} are filled in) from
+               `probe_concurrency` threads sharing one requests.Session, kept for the whole
+               sweep so steps reuse its connections
+    load_test  the percentile table of the loadgenerator's Locust output at the end of the
+               step; Locust aggregates from the start of the test, so later steps are damped
+
+Each experiment carries a duration of settle + hold + CLEANUP_MARGIN_SECONDS, so a sweep that
+dies midway leaves no fault behind for long. run_many() sweeps several services, in parallel
+when none of them calls another (per the service graph).
+"""
+import contextvars
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fault_inject
+import journal
+import kube
+import service_graph
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# 可扫描的故障：被扫描的参数名、取值格式、注入函数
+FAULTS = {
+    "network_delay": ("latency", lambda v: f"{_number(v)}ms", fault_inject.network_delay),
+    "network_loss": ("loss", lambda v: _number(v), fault_inject.network_loss),
+    "network_corrupt": ("corrupt", lambda v: _number(v), fault_inject.network_corrupt),
+    "network_duplicate": ("duplicate", lambda v: _number(v), fault_inject.network_duplicate),
+}
+PROBES = ("http", "load_test")
+
+PROBE_URL = os.environ.get("CHAOSMESH_MCP_PROBE_URL", "http://{service}.{namespace}.svc.cluster.local/")
+PROBE_TIMEOUT_SECONDS = float(os.environ.get("CHAOSMESH_MCP_PROBE_TIMEOUT", "5"))
+# 实验的持续时间比 settle + hold 多出的余量：扫描中途失败时故障也会自行结束
+CLEANUP_MARGIN_SECONDS = 30
+SWEEP_WORKERS = int(os.environ.get("CHAOSMESH_MCP_SWEEP_WORKERS", "4"))
+
+# 由扫描本身决定、不能通过 parameters 覆盖的故障参数
+RESERVED_PARAMETERS = ("service", "namespace", "duration")
+
+COLUMNS = ("value", "p50_ms", "p99_ms", "p99_delta_ms", "error_rate", "requests", "experiment")
+
+_LOCUST_ROW = re.compile(r"^\s*Aggregated\s+(.*)$")
+
+
+def _number(value) -> str:
+    """"50" for 50.0, "0.5" for 0.5: the string form Chaos Mesh expects."""
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _percentile(ordered: list, q: float):
+    """Nearest-rank percentile of an ascending list; None when it is empty."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def http_probe(session: requests.Session, url: str, seconds: float, concurrency: int = 4) -> dict:
+    """
+    Send requests to `url` from `concurrency` threads for `seconds`. Status codes of 500 and
+    above, timeouts and connection errors count as errors; only successful requests enter
+    the latency percentiles.
+    """
+    deadline = time.monotonic() + seconds
+    samples = [[] for _ in range(max(1, concurrency))]
+    errors = [0] * len(samples)
+
+    def worker(slot: int):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=PROBE_TIMEOUT_SECONDS).status_code < 500
+            except requests.RequestException:
+                ok = False
+            if ok:
+                samples[slot].append((time.perf_counter() - started) * 1000)
+            else:
+                errors[slot] += 1
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker, slot), daemon=True)
+               for slot in range(len(samples))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(latency for slot in samples for latency in slot)
+    total = len(latencies) + sum(errors)
+    return {
+        "requests": total,
+        "error_rate": round(sum(errors) / total, 4) if total else None,
+        "p50_ms": round(_percentile(latencies, 50), 3) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99), 3) if latencies else None,
+    }
+
+
+def parse_locust(text: str) -> dict:
+    """p50 / p99 and request count of the last Aggregated row of a Locust percentile table."""
+    header, result = None, {}
+    for line in (text or "").splitlines():
+        tokens = line.split()
+        if "50%" in tokens and "99%" in tokens:
+            header = [t for t in tokens if t.endswith("%")]
+            continue
+        match = _LOCUST_ROW.match(line)
+        if header and match:
+            values = match.group(1).replace("|", " ").split()
+            if len(values) < len(header):
+                continue
+            row = dict(zip(header, values))
+            try:
+                result = {"p50_ms": float(row["50%"]), "p99_ms": float(row["99%"]),
+                          "requests": int(values[len(header)]) if len(values) > len(header) else None}
+            except ValueError:
+                continue
+    return result
+
+
+def load_test_probe(seconds: float) -> dict:
+    """Wait `seconds`, then read the loadgenerator's percentile table."""
+    time.sleep(seconds)
+    logs = kube.get_service_pod_logs(service_name="loadgenerator", namespace="default",
+                                     container_name="main", type="one", tail_lines=40)
+    parsed = parse_locust(next(iter(logs.values()), ""))
+    if not parsed:
+        return {"error": "No Locust percentile table in the loadgenerator output"}
+    return {**parsed, "error_rate": None}
+
+
+def _validate(fault: str, values: list, probe: str, settle: float, hold: float, parameters: dict = None) -> None:
+    if fault not in FAULTS:
+        raise ValueError(f"Cannot sweep '{fault}'; valid faults are {list(FAULTS)}")
+    reserved = sorted(set(parameters or {}) & set(RESERVED_PARAMETERS))
+    if reserved:
+        raise ValueError(f"parameters cannot set {reserved}; the sweep sets them itself "
+                         "(service, namespace and the step duration from settle and hold)")
+    if probe not in PROBES:
+        raise ValueError(f"Unknown probe '{probe}'; valid probes are {list(PROBES)}")
+    if not values:
+        raise ValueError("Give at least one value to sweep")
+    if any(not isinstance(v, (int, float)) or v < 0 for v in values):
+        raise ValueError(f"Sweep values must be non-negative numbers, got {values}")
+    if settle < 0 or hold <= 0:
+        raise ValueError("settle must be >= 0 and hold > 0 seconds")
+
+
+def _probe(probe: str, session, url: str, hold: float, concurrency: int) -> dict:
+    with tracing.span("sweep_probe", probe=probe):
+        if probe == "http":
+            return http_probe(session, url, hold, concurrency)
+        return load_test_probe(hold)
+
+
+def run(fault: str, service, values: list, namespace: str = "default", settle: float = 5, hold: float = 30,
+        probe: str = "http", probe_url: str = None, probe_concurrency: int = 4, parameters: dict = None) -> dict:
+    """
+    Sweep one fault parameter over `values` for `service` (one name, or a list targeted by
+    one experiment) and return the curve. `parameters` are passed to the fault as is
+    (mode, value, direction, jitter, ...). Stops at the first step whose injection fails.
+    Raises ValueError for an unknown fault or probe, or invalid values or times.
+    """
+    _validate(fault, values, probe, settle, hold, parameters)
+    parameter, render, inject = FAULTS[fault]
+    parameters = dict(parameters or {})
+    parameters.pop(parameter, None)
+    label = service if isinstance(service, str) else ",".join(fault_inject.services_of(service))
+    url = (probe_url or PROBE_URL).format(service=fault_inject.services_of(service)[0], namespace=namespace)
+    duration = f"{math.ceil(settle + hold + CLEANUP_MARGIN_SECONDS)}s"
+
+    rows, baseline, stopped = [], None, None
+    started = time.perf_counter()
+    # 一个 Session 用到扫描结束，各步复用已建立的连接
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(1, probe_concurrency))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        # 取值为 0 的一步不注入故障，作为基线，先测
+        for value in sorted(values, key=lambda v: v != 0):
+            name = None
+            with tracing.span("sweep_step", fault=fault, value=value):
+                if value != 0:
+                    experiment = inject(service=service, namespace=namespace, duration=duration,
+                                        **{parameter: render(value)}, **parameters)
+                    if not isinstance(experiment, dict) or "error" in experiment:
+                        stopped = {"value": value, "error": experiment.get("error") if isinstance(experiment, dict)
+                                   else str(experiment)}
+                        logger.error(f"Sweep of {fault} on {label} stopped at {value}: {stopped['error']}")
+                        break
+                    name = experiment["metadata"]["name"]
+                try:
+                    if name:
+                        time.sleep(settle)
+                    result = _probe(probe, session, url, hold, probe_concurrency)
+                finally:
+                    if name:
+                        removed = fault_inject.delete_experiment(name, namespace, type=experiment.get("kind"))
+                        if "error" in removed:
+                            logger.warning(f"Could not remove sweep step {namespace}/{name}: {removed['error']}")
+            if baseline is None and result.get("p99_ms") is not None:
+                baseline = result["p99_ms"]
+            delta = round(result["p99_ms"] - baseline, 3) if result.get("p99_ms") is not None else None
+            if name:
+                try:
+                    journal.record_load_test(namespace, name, p50_ms=result.get("p50_ms"), p99_ms=result.get("p99_ms"),
+                                             baseline_p99_ms=baseline, error_rate=result.get("error_rate"),
+                                             summary={"sweep": fault, parameter: render(value), "probe": probe})
+                except LookupError:
+                    pass
+            rows.append([value, result.get("p50_ms"), result.get("p99_ms"), delta, result.get("error_rate"),
+                         result.get("requests"), name])
+            if "error" in result:
+                stopped = {"value": value, "error": result["error"]}
+                break
+
+    curve = {
+        "service": label,
+        "namespace": namespace,
+        "fault": fault,
+        "parameter": parameter,
+        "probe": probe,
+        "baseline_p99_ms": baseline,
+        "columns": list(COLUMNS),
+        "rows": rows,
+        "elapsed_s": round(time.perf_counter() - started, 1),
+    }
+    if probe == "http":
+        curve["probe_url"] = url
+    if stopped:
+        curve["stopped"] = stopped
+    return curve
+
+
+def dependent_pairs(services: list[str], namespace: str) -> list:
+    """Pairs of services where one (transitively) calls the other, per the service graph."""
+    pairs = []
+    for service in services:
+        try:
+            radius = service_graph.blast_radius(service, namespace)
+        except Exception as e:
+            logger.warning(f"Cannot check the dependencies of {service}: {e}")
+            continue
+        related = set(radius.get("upstream") or []) | set(radius.get("downstream") or [])
+        for other in services:
+            if other != service and f"{namespace}/{other}" in related and (other, service) not in pairs:
+                pairs.append((service, other))
+    return pairs
+
+
+def run_many(fault: str, services: list[str], values: list, namespace: str = "default", parallel: bool = True,
+             **kwargs) -> dict:
+    """
+    Sweep each of `services` separately, in parallel when `parallel` and no service calls
+    another (their faults would distort each other's curves); otherwise one after another.
+    Raises ValueError like run().
+    """
+    _validate(fault, values, kwargs.get("probe", "http"), kwargs.get("settle", 5), kwargs.get("hold", 30),
+              kwargs.get("parameters"))
+    services = list(dict.fromkeys(services))
+    dependent = dependent_pairs(services, namespace) if parallel and len(services) > 1 else []
+    concurrent = parallel and len(services) > 1 and not dependent
+    started = time.perf_counter()
+
+    def sweep_one(service: str) -> dict:
+        try:
+            return run(fault, service, values, namespace, **kwargs)
+        except Exception as e:
+            logger.error(f"Sweep of {fault} on {service} failed: {e}")
+            return {"service": service, "error": str(e)}
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=min(SWEEP_WORKERS, len(services))) as executor:
+            futures = {service: executor.submit(contextvars.copy_context().run, sweep_one, service)
+                       for service in services}
+            curves = {service: future.result() for service, future in futures.items()}
+    else:
+        curves = {service: sweep_one(service) for service in services}
+    result = {
+        "fault": fault,
+        "parallel": concurrent,
+        "curves": curves,
+        "elapsed_s": round(time.perf_counter() - started, 1),
+    }
+    if dependent:
+        result["note"] = ("Swept one after another because these services call each other: "
+                          + ", ".join(f"{a} <-> {b}" for a, b in dependent))
+    return result
@@ -0,0 +1,160 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+# OpenTelemetry 是可选依赖：只有安装了 opentelemetry-api 并设置 CHAOSMESH_MCP_OTEL=1 时才导出
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_BUFFER_SIZE = int(os.environ.get("CHAOSMESH_MCP_TRACE_BUFFER", "256"))
+
+_otel_tracer = None
+if otel_trace is not None and os.environ.get("CHAOSMESH_MCP_OTEL", "").lower() in ("1", "true", "yes"):
+    _otel_tracer = otel_trace.get_tracer("chaosmesh-mcp")
+    logger.info("OpenTelemetry span export enabled")
+
+_current_span = contextvars.ContextVar("chaosmesh_mcp_current_span", default=None)
+_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_lock = threading.Lock()
+
+
+class Span:
+    """
+    A single timed phase. Root spans (no parent) are kept in the ring buffer as traces.
+    """
+    __slots__ = ("name", "attributes", "started_at", "start", "end", "children", "error")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return round((end - self.start) * 1000, 3)
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def phases(self, prefix: str = "") -> list[dict]:
+        """Flatten child spans into a list of {phase, duration_ms} entries, depth first."""
+        result = []
+        for child in list(self.children):
+            path = f"{prefix}{child.name}"
+            entry = {"phase": path, "duration_ms": child.duration_ms}
+            if child.attributes:
+                entry["attributes"] = child.attributes
+            if child.error:
+                entry["error"] = child.error
+            result.append(entry)
+            result.extend(child.phases(prefix=f"{path}/"))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "phases": self.phases(),
+        }
+
+
+def _otel_value(value):
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a phase. Nested spans are attached to the enclosing span; a span without
+    a parent becomes a new trace and is stored in the ring buffer when it ends.
+    """
+    parent = _current_span.get()
+    current = Span(name, attributes)
+    if parent is not None:
+        with _lock:
+            parent.children.append(current)
+    token = _current_span.set(current)
+
+    with ExitStack() as stack:
+        otel_span = None
+        if _otel_tracer is not None:
+            otel_span = stack.enter_context(_otel_tracer.start_as_current_span(
+                name, attributes={k: _otel_value(v) for k, v in attributes.items()}))
+        try:
+            yield current
+        except Exception as e:
+            current.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.end = time.perf_counter()
+            _current_span.reset(token)
+            if otel_span is not None:
+                for key, value in current.attributes.items():
+                    otel_span.set_attribute(key, _otel_value(value))
+                if current.error:
+                    otel_span.set_attribute("error", current.error)
+            if parent is None:
+                with _lock:
+                    _traces.append(current)
+
+
+def traced(name: str = None):
+    """
+    Decorator that wraps a function call in a span. Results shaped like
+    {"error": ...} are recorded as span errors, matching how this server reports failures.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as s:
+                result = func(*args, **kwargs)
+                if isinstance(result, dict) and "error" in result:
+                    s.error = str(result["error"])
+                return result
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """Return the active span, or None outside of a traced call."""
+    return _current_span.get()
+
+
+def slowest_traces(limit: int = 10, name: str = None) -> list[dict]:
+    """
+    Return the slowest traces currently held in the ring buffer, slowest first.
+
+    Args:
+        limit (int): Maximum number of traces to return.
+        name (str): Only include traces whose root span has this name.
+    """
+    with _lock:
+        traces = list(_traces)
+    if name:
+        traces = [t for t in traces if t.name == name]
+    traces.sort(key=lambda t: t.duration_ms, reverse=True)
+    return [t.to_dict() for t in traces[:limit]]
+
+
+def clear() -> None:
+    with _lock:
+        _traces.clear()
@@ -0,0 +1,78 @@
+"""
+Single interception point for Kubernetes API traffic.
+
+Every request made through the kubernetes python client — by kube, fault_inject,
+the chaosmesh client and the server tools — goes through
+RESTClientObject.request. install() wraps that method once and runs the registered
+middlewares around it, outermost first.
+
+A middleware has the signature:
+
+    def middleware(call_next, method: str, url: str, **kwargs):
+        ...
+        return call_next(method, url, **kwargs)
+
+kwargs are the remaining RESTClientObject.request arguments (query_params, headers,
+body, post_params, _preload_content, _request_timeout).
+"""
+import functools
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from kubernetes.client import rest
+
+logger = logging.getLogger(__name__)
+
+_middlewares = []
+_lock = threading.Lock()
+_original_request = None
+
+
+def install() -> None:
+    """Wrap RESTClientObject.request. Safe to call more than once."""
+    global _original_request
+    with _lock:
+        if _original_request is not None:
+            return
+        _original_request = rest.RESTClientObject.request
+
+        @functools.wraps(_original_request)
+        def request(self, method, url, **kwargs):
+            call = functools.partial(_original_request, self)
+            for middleware in reversed(_middlewares):
+                call = functools.partial(middleware, call)
+            return call(method, url, **kwargs)
+
+        rest.RESTClientObject.request = request
+
+
+def add_middleware(middleware) -> None:
+    """Register a middleware. Middlewares added later run closer to the network."""
+    install()
+    with _lock:
+        if middleware not in _middlewares:
+            _middlewares.append(middleware)
+
+
+def remove_middleware(middleware) -> None:
+    with _lock:
+        if middleware in _middlewares:
+            _middlewares.remove(middleware)
+
+
+def request_path(url: str) -> str:
+    """Strip scheme and host from a request URL, e.g. 'https://x:443/api/v1/pods' -> '/api/v1/pods'."""
+    return urlsplit(url).path or "/"
+
+
+def query_dict(query_params) -> dict:
+    """Normalise the client's query_params (list of tuples or dict) into a dict."""
+    if not query_params:
+        return {}
+    items = query_params.items() if isinstance(query_params, dict) else query_params
+    return {str(k): v if isinstance(v, (str, int, float, bool)) else str(v) for k, v in items}
+
+
+def is_watch(query_params) -> bool:
+    return str(query_dict(query_params).get("watch", "")).lower() in ("true", "1")
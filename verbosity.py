@@ -0,0 +1,139 @@
+"""
+Response verbosity levels.
+
+Injection tools used to echo the whole experiment resource back to the agent, with
+managedFields, status and bookkeeping metadata, and the list tools returned labels and
+timestamps for every item. Three levels trade detail for payload size:
+
+    minimal  name, kind, namespace, target count and status of an experiment;
+             list tools return only the identifying fields
+    normal   the experiment resource without server bookkeeping (managedFields, uid,
+             resourceVersion, last-applied annotation) and without status
+    full     everything, as the API server returned it
+
+CHAOSMESH_MCP_VERBOSITY sets the server-wide level (default "normal"); a tool call can
+override it inside use(). Results are serialized with dumps(), which writes compact JSON
+instead of the indented form FastMCP produces for dicts.
+"""
+import contextvars
+import json
+import os
+from contextlib import contextmanager
+
+LEVELS = ("minimal", "normal", "full")
+DEFAULT_LEVEL = os.environ.get("CHAOSMESH_MCP_VERBOSITY", "normal").lower()
+
+# normal 级别去掉的 metadata 字段（由 API server 维护，对调用方没有用处）
+BOOKKEEPING_METADATA = ("managedFields", "uid", "resourceVersion", "generation", "selfLink", "finalizers")
+LAST_APPLIED_ANNOTATION = "kubectl.kubernetes.io/last-applied-configuration"
+
+_active = contextvars.ContextVar("chaosmesh_mcp_verbosity", default=None)
+
+
+def resolve(value: str = None) -> str:
+    """Validate a level name; None means the server default. Raises ValueError."""
+    level = (value or DEFAULT_LEVEL).lower()
+    if level not in LEVELS:
+        raise ValueError(f"Unknown verbosity '{value}'; valid levels are {list(LEVELS)}")
+    return level
+
+
+@contextmanager
+def use(value: str = None):
+    """Run the block with a verbosity level (None for the server default)."""
+    token = _active.set(resolve(value))
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def level() -> str:
+    """The level of the current call."""
+    return _active.get() or resolve()
+
+
+def default_fields(projections: dict, minimal: list, normal: list = None) -> list:
+    """Default projection fields of a list tool for the current level (full selects all of them)."""
+    current = level()
+    if current == "minimal":
+        return list(minimal)
+    if current == "normal" and normal is not None:
+        return list(normal)
+    return list(projections)
+
+
+def _is_resource(value) -> bool:
+    return isinstance(value, dict) and isinstance(value.get("metadata"), dict) and "kind" in value
+
+
+def target_count(obj: dict):
+    """
+    Pods or hosts an experiment targets: the records Chaos Mesh wrote to its status, the
+    address list of a host experiment, or what mode/value pin down. None when unknown.
+    """
+    records = ((obj.get("status") or {}).get("experiment") or {}).get("containerRecords")
+    if records:
+        return len(records)
+    spec = obj.get("spec") or {}
+    if spec.get("address"):
+        return len(spec["address"])
+    if spec.get("mode") == "one":
+        return 1
+    if spec.get("mode") == "fixed":
+        try:
+            return int(spec.get("value"))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _summary(obj: dict) -> dict:
+    metadata = obj["metadata"]
+    phase = ((obj.get("status") or {}).get("experiment") or {}).get("desiredPhase")
+    if phase is None:
+        phase = "existing" if (obj.get("idempotency") or {}).get("replayed") else "created"
+    summary = {
+        "name": metadata.get("name"),
+        "kind": obj.get("kind"),
+        "namespace": metadata.get("namespace"),
+        "targets": target_count(obj),
+        "status": phase,
+    }
+    # 多服务实验保留每个服务的 Pod 数
+    if obj.get("services"):
+        summary["services"] = obj["services"]
+    return summary
+
+
+def _trimmed(obj: dict) -> dict:
+    metadata = {k: v for k, v in obj["metadata"].items() if k not in BOOKKEEPING_METADATA}
+    annotations = {k: v for k, v in (metadata.get("annotations") or {}).items() if k != LAST_APPLIED_ANNOTATION}
+    if annotations:
+        metadata["annotations"] = annotations
+    else:
+        metadata.pop("annotations", None)
+    return {**{k: v for k, v in obj.items() if k != "status"}, "metadata": metadata}
+
+
+def shape(result, value: str = None):
+    """
+    Reduce a tool result to a level (default: the level of the current call). Kubernetes
+    resources are summarized or trimmed, fan-out results are shaped per cluster, and
+    anything else (errors included) is returned unchanged.
+    """
+    current = resolve(value) if value else level()
+    if current == "full" or not isinstance(result, dict):
+        return result
+    if "clusters" in result and isinstance(result["clusters"], dict):
+        return {**result, "clusters": {
+            name: {**entry, "result": shape(entry["result"], current)} if "result" in entry else entry
+            for name, entry in result["clusters"].items()}}
+    if "error" in result or not _is_resource(result):
+        return result
+    return _summary(result) if current == "minimal" else _trimmed(result)
+
+
+def dumps(result) -> str:
+    """Compact JSON text of a tool result."""
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False, default=str)